@@ -0,0 +1,39 @@
+"""
+Customer directory for client-side pickers
+
+The directory (every non-deleted BasicInformation) is served as one JSON
+document whose version token changes whenever a customer is added, edited
+or soft-deleted, so browsers can cache it and revalidate with a single
+aggregate query.
+"""
+import hashlib
+from django.db.models import Count, Max, Q
+
+from admin_module.models import BasicInformation
+
+DIRECTORY_FIELDS = ('id', 'companyId', 'companyName', 'contact')
+
+
+def directory_version():
+    """
+    Version token of the customer directory.
+
+    Derived from the latest updated_at over all rows (soft deletes bump it)
+    and the row counts, so hard deletes change it too.
+    """
+    stats = BasicInformation.all_objects.aggregate(
+        latest=Max('updated_at'),
+        total=Count('id'),
+        deleted=Count('id', filter=Q(is_deleted=True))
+    )
+    raw = f"{stats['latest'].isoformat() if stats['latest'] else ''}:{stats['total']}:{stats['deleted']}"
+    return hashlib.md5(raw.encode()).hexdigest()[:16]
+
+
+def directory_rows():
+    """List of customer dicts in display order."""
+    return list(
+        BasicInformation.objects.filter(is_deleted=False)
+        .order_by('companyName')
+        .values(*DIRECTORY_FIELDS)
+    )
@@ -20,8 +20,12 @@ from django.contrib import messages
 from django.db.models import Q
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
 
 from admin_module.models import BasicInformation
+from .directory import directory_version, directory_rows
 from .forms import BasicInformationForm, CustomerFilterForm
 
 
@@ -120,3 +124,33 @@ def delete(request, pk):
         'customer': customer
     }
     return render(request, 'admin_module/customer/confirm_delete.html', context)
+
+
+def _directory_etag(request):
+    # 同一個請求只計算一次版本號
+    if not hasattr(request, '_directory_version'):
+        request._directory_version = directory_version()
+    return request._directory_version
+
+
+@require_GET
+@gzip_page
+@condition(etag_func=_directory_etag)
+def directory(request):
+    """
+    API: 客戶目錄 (供收文等表單的客戶選單使用)
+
+    以版本號作為 ETag，未變更時回傳 304；網址帶有目前版本號 (?v=) 時
+    可由瀏覽器長期快取，客戶資料變更後頁面會帶新的版本號。
+    """
+    version = _directory_etag(request)
+    response = JsonResponse({
+        'version': version,
+        'customers': directory_rows(),
+    })
+
+    if request.GET.get('v') == version:
+        patch_cache_control(response, private=True, max_age=365 * 24 * 3600, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -4,13 +4,54 @@ Incoming Mail Views with Soft Delete
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.db import transaction
 from django.utils.safestring import mark_safe
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
-from admin_module.models import IncomingMail, IncomingMailItem, BasicInformation
+from admin_module.models import IncomingMail, IncomingMailItem
+from admin_module.customer.directory import directory_version
+from core.bulk import posted_item_rows, sync_ordered_items
+from core.line import line_target, queue_line_messages
 from .forms import IncomingMailForm, IncomingMailItemForm
 
 
+def _item_values(item_data):
+    """明細 JSON 對應到 IncomingMailItem 欄位"""
+    return {
+        'sender': item_data.get('sender', ''),
+        'company': item_data.get('company_id') or None,
+        'customer_name': item_data.get('customer_name', ''),
+        'content_type': item_data.get('content_type', ''),
+        'notify_customer': item_data.get('notify_customer', False),
+        'message_content': item_data.get('message_content', ''),
+    }
+
+
+def _line_item_source(item):
+    """LINE 通知的來源鍵（明細 + 公司）"""
+    return f'incoming_mail_item:{item.pk}:{item.company_id}'
+
+
+def _queue_line_notifications(incoming_mail):
+    """
+    勾選「通知客戶」的明細排入 LINE 通知佇列
+
+    來源鍵包含明細與公司，同一明細對同一公司只通知一次；明細改為其他公司時會通知新公司。
+    """
+    items = incoming_mail.items.filter(notify_customer=True).select_related('company')
+    notifications = []
+    for item in items:
+        target = line_target(item.company)
+        if not target:
+            continue
+        text = item.message_content or (
+            f'{item.customer_name} 您好，本所已收到您的{item.get_content_type_display()}'
+            f'（寄件人：{item.sender}，收文日期：{incoming_mail.date:%Y-%m-%d}）。'
+        )
+        notifications.append((target, text, _line_item_source(item)))
+    queue_line_messages(notifications)
+
+
 def list(request):
     """收文列表頁面"""
     mails = IncomingMail.objects.filter(is_deleted=False).prefetch_related('items')
@@ -40,40 +81,28 @@ def create(request):
     if request.method == 'POST':
         form = IncomingMailForm(request.POST)
         if form.is_valid():
-            incoming_mail = form.save()
-            
-            # 處理明細項目
-            items_data = request.POST.getlist('items')
-            for idx, item_json in enumerate(items_data):
-                if item_json:
-                    item_data = json.loads(item_json)
-                    IncomingMailItem.objects.create(
-                        incoming_mail=incoming_mail,
-                        sender=item_data.get('sender', ''),
-                        company_id=item_data.get('company_id'),
-                        customer_name=item_data.get('customer_name', ''),
-                        content_type=item_data.get('content_type', ''),
-                        notify_customer=item_data.get('notify_customer', False),
-                        message_content=item_data.get('message_content', ''),
-                        order=idx
-                    )
+            with transaction.atomic():
+                incoming_mail = form.save()
+                
+                # 處理明細項目
+                rows = posted_item_rows(request.POST.getlist('items'), _item_values)
+                sync_ordered_items(IncomingMailItem, 'incoming_mail', incoming_mail, rows)
+                _queue_line_notifications(incoming_mail)
             
             messages.success(request, f'收文「{incoming_mail.serial_number}」已成功新增！')
             return redirect('admin_module:incoming_mail:list')
     else:
         form = IncomingMailForm()
     
-    # 取得所有客戶列表供選擇
-    customers = BasicInformation.objects.filter(is_deleted=False).order_by('companyName')
+    # 客戶清單改由客戶目錄 API 載入，頁面只帶版本號
+    customers_version = directory_version()
     
     # 序列化為 JSON 供 JavaScript 使用
-    customers_json = mark_safe(json.dumps(list(customers.values('id', 'companyId', 'companyName', 'contact'))))
     content_types_json = mark_safe(json.dumps([{'value': ct[0], 'display': ct[1]} for ct in IncomingMailItem.CONTENT_TYPE_CHOICES]))
     
     context = {
         'form': form,
-        'customers': customers,
-        'customers_json': customers_json,
+        'customers_version': customers_version,
         'content_types_json': content_types_json,
         'action': '新增收文',
         'content_type_choices': IncomingMailItem.CONTENT_TYPE_CHOICES,
@@ -90,44 +119,29 @@ def update(request, pk):
     if request.method == 'POST':
         form = IncomingMailForm(request.POST, instance=incoming_mail)
         if form.is_valid():
-            incoming_mail = form.save()
-            
-            # 刪除舊的明細項目
-            incoming_mail.items.all().delete()
-            
-            # 重新建立明細項目
-            items_data = request.POST.getlist('items')
-            for idx, item_json in enumerate(items_data):
-                if item_json:
-                    item_data = json.loads(item_json)
-                    IncomingMailItem.objects.create(
-                        incoming_mail=incoming_mail,
-                        sender=item_data.get('sender', ''),
-                        company_id=item_data.get('company_id'),
-                        customer_name=item_data.get('customer_name', ''),
-                        content_type=item_data.get('content_type', ''),
-                        notify_customer=item_data.get('notify_customer', False),
-                        message_content=item_data.get('message_content', ''),
-                        order=idx
-                    )
+            with transaction.atomic():
+                incoming_mail = form.save()
+                
+                # 比對並同步明細項目
+                rows = posted_item_rows(request.POST.getlist('items'), _item_values)
+                sync_ordered_items(IncomingMailItem, 'incoming_mail', incoming_mail, rows)
+                _queue_line_notifications(incoming_mail)
             
             messages.success(request, f'收文「{incoming_mail.serial_number}」已成功更新！')
             return redirect('admin_module:incoming_mail:list')
     else:
         form = IncomingMailForm(instance=incoming_mail)
     
-    # 取得所有客戶列表供選擇
-    customers = BasicInformation.objects.filter(is_deleted=False).order_by('companyName')
+    # 客戶清單改由客戶目錄 API 載入，頁面只帶版本號
+    customers_version = directory_version()
     
     # 序列化為 JSON 供 JavaScript 使用
-    customers_json = mark_safe(json.dumps(list(customers.values('id', 'companyId', 'companyName', 'contact'))))
     content_types_json = mark_safe(json.dumps([{'value': ct[0], 'display': ct[1]} for ct in IncomingMailItem.CONTENT_TYPE_CHOICES]))
     
     context = {
         'form': form,
         'incoming_mail': incoming_mail,
-        'customers': customers,
-        'customers_json': customers_json,
+        'customers_version': customers_version,
         'content_types_json': content_types_json,
         'action': '編輯收文',
         'content_type_choices': IncomingMailItem.CONTENT_TYPE_CHOICES,
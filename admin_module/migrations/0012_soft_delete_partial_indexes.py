@@ -0,0 +1,78 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:03
+
+import django.db.models.manager
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_module', '0011_basicinformation_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='basicinformation',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='bookkeepingchecklist',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='contact',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='customerchange',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='incomingmail',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='vatcheck',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='basicinformation',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['companyName'], name='basic_info_live_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='basicinformation',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at'], name='basic_info_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookkeepingchecklist',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at'], name='bk_checklist_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at'], name='contact_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerchange',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at'], name='customer_change_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incomingmail',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-date', '-serial_number'], name='incoming_mail_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vatcheck',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-date', '-created_at'], name='vat_check_live_idx'),
+        ),
+    ]
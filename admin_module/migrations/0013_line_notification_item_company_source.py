@@ -0,0 +1,44 @@
+from django.db import migrations
+
+PREFIX = 'incoming_mail_item:'
+
+
+def add_company_to_sources(apps, schema_editor):
+    """既有的收文明細通知來源鍵補上公司，避免上線後同一明細再通知一次"""
+    LineNotification = apps.get_model('core', 'LineNotification')
+    IncomingMailItem = apps.get_model('admin_module', 'IncomingMailItem')
+
+    notifications = []
+    for notification in LineNotification.objects.filter(source__startswith=PREFIX).only('pk', 'source'):
+        item_pk = notification.source[len(PREFIX):]
+        if item_pk.isdigit():
+            notifications.append((notification, int(item_pk)))
+
+    companies = dict(
+        IncomingMailItem.objects.filter(pk__in=[item_pk for _, item_pk in notifications]).values_list('pk', 'company_id')
+    )
+    sources = {
+        notification.pk: f'{PREFIX}{item_pk}:{companies[item_pk]}'
+        for notification, item_pk in notifications
+        if item_pk in companies
+    }
+    taken = set(LineNotification.objects.filter(source__in=sources.values()).values_list('source', flat=True))
+    changed = []
+    for notification, _ in notifications:
+        source = sources.get(notification.pk)
+        if source and source not in taken:
+            notification.source = source
+            changed.append(notification)
+    LineNotification.objects.bulk_update(changed, ['source'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_module', '0012_soft_delete_partial_indexes'),
+        ('core', '0003_linenotification'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_company_to_sources, migrations.RunPython.noop),
+    ]
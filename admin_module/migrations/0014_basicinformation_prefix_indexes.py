@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# btree text_pattern_ops 索引，對應 istartswith 產生的 UPPER("欄位"::text) LIKE 'xx%' 前綴查詢；
+# 自動完成的前綴層以範圍掃描取得，不需 trigram 比對。非 PostgreSQL 略過
+INDEXES = [
+    ('basic_info_name_prefix_idx', 'companyName'),
+    ('basic_info_company_id_prefix_idx', 'companyId'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON basic_information '
+            f'(UPPER("{column}"::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_module', '0013_line_notification_item_company_source'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from core.managers import SoftDeleteManager
+from core.sequences import next_value
 
 
 class BasicInformation(models.Model):
@@ -98,11 +100,20 @@ class BasicInformation(models.Model):
         verbose_name='更新時間'
     )
 
+    # all_objects 需宣告在前，作為預設 manager（admin、唯一值檢查可看到已刪除資料）
+    all_objects = SoftDeleteManager(include_deleted=True)
+    objects = SoftDeleteManager()
+
     class Meta:
         db_table = 'basic_information'
         verbose_name = '客戶基本資料'
         verbose_name_plural = '客戶基本資料'
         ordering = ['-created_at']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['companyName'], name='basic_info_live_name_idx', condition=models.Q(is_deleted=False)),
+            models.Index(fields=['-created_at'], name='basic_info_live_created_idx', condition=models.Q(is_deleted=False)),
+        ]
 
     def __str__(self):
         return f"{self.companyName} ({self.companyId})"
@@ -182,11 +193,19 @@ class Contact(models.Model):
         verbose_name='更新時間'
     )
 
+    # all_objects 需宣告在前，作為預設 manager（admin、唯一值檢查可看到已刪除資料）
+    all_objects = SoftDeleteManager(include_deleted=True)
+    objects = SoftDeleteManager()
+
     class Meta:
         db_table = 'contact'
         verbose_name = '聯絡人'
         verbose_name_plural = '聯絡人'
         ordering = ['-created_at']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['-created_at'], name='contact_live_created_idx', condition=models.Q(is_deleted=False)),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.company_name}"
@@ -216,30 +235,36 @@ class IncomingMail(models.Model):
         verbose_name='更新時間'
     )
 
+    # all_objects 需宣告在前，作為預設 manager（admin、唯一值檢查可看到已刪除資料）
+    all_objects = SoftDeleteManager(include_deleted=True)
+    objects = SoftDeleteManager()
+
     class Meta:
         db_table = 'incoming_mail'
         verbose_name = '收文主記錄'
         verbose_name_plural = '收文主記錄'
         ordering = ['-date', '-serial_number']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['-date', '-serial_number'], name='incoming_mail_live_idx', condition=models.Q(is_deleted=False)),
+        ]
 
     def __str__(self):
         return f"{self.serial_number}"
 
+    @staticmethod
+    def _max_serial_number(date_prefix):
+        """查詢當天已有的最大序號（流水號計數器建立前的既有收文，含已刪除者以免序號重複）"""
+        existing = IncomingMail.all_objects.filter(
+            serial_number__startswith=date_prefix
+        ).order_by('-serial_number').first()
+        return int(existing.serial_number[-3:]) if existing else 0
+
     def save(self, *args, **kwargs):
         """自動生成序號，格式：YYYYMMDD-XXX"""
         if not self.serial_number:
             date_prefix = self.date.strftime('%Y%m%d')
-            # 查詢當天已有的最大序號
-            existing = IncomingMail.objects.filter(
-                serial_number__startswith=date_prefix
-            ).order_by('-serial_number').first()
-            
-            if existing:
-                # 取得最後三位數字並加1
-                last_num = int(existing.serial_number[-3:])
-                new_num = last_num + 1
-            else:
-                new_num = 1
+            new_num = next_value(f"{date_prefix}-", seed=lambda: self._max_serial_number(date_prefix))
             
             self.serial_number = f"{date_prefix}-{new_num:03d}"
         
@@ -368,11 +393,19 @@ class CustomerChange(models.Model):
         verbose_name='更新時間'
     )
     
+    # all_objects 需宣告在前，作為預設 manager（admin、唯一值檢查可看到已刪除資料）
+    all_objects = SoftDeleteManager(include_deleted=True)
+    objects = SoftDeleteManager()
+
     class Meta:
         db_table = 'customer_change'
         verbose_name = '客戶增減'
         verbose_name_plural = '客戶增減'
         ordering = ['-created_at']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['-created_at'], name='customer_change_live_idx', condition=models.Q(is_deleted=False)),
+        ]
     
     def __str__(self):
         return f"{self.company_name} ({self.company_id}) - {self.get_change_type_display()}"
@@ -420,11 +453,19 @@ class VATCheck(models.Model):
         verbose_name='更新時間'
     )
     
+    # all_objects 需宣告在前，作為預設 manager（admin、唯一值檢查可看到已刪除資料）
+    all_objects = SoftDeleteManager(include_deleted=True)
+    objects = SoftDeleteManager()
+
     class Meta:
         db_table = 'vat_check'
         verbose_name = '營業稅檢查'
         verbose_name_plural = '營業稅檢查'
         ordering = ['-date', '-created_at']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['-date', '-created_at'], name='vat_check_live_idx', condition=models.Q(is_deleted=False)),
+        ]
     
     def __str__(self):
         return f"{self.check_period} - {self.inspector}"
@@ -591,11 +632,19 @@ class BookkeepingChecklist(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
     
+    # all_objects 需宣告在前，作為預設 manager（admin、唯一值檢查可看到已刪除資料）
+    all_objects = SoftDeleteManager(include_deleted=True)
+    objects = SoftDeleteManager()
+
     class Meta:
         db_table = 'bookkeeping_checklist'
         verbose_name = '記帳進度檢查'
         verbose_name_plural = '記帳進度檢查'
         ordering = ['-created_at']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['-created_at'], name='bk_checklist_live_idx', condition=models.Q(is_deleted=False)),
+        ]
     
     def __str__(self):
         return f"{self.check_period} - {self.company_name}"
@@ -1,3 +1,126 @@
+import json
+from datetime import date
 from django.test import TestCase
+from django.urls import reverse
+from core.models import LineNotification, Sequence
+from .models import BasicInformation, IncomingMail
+
+
+class IncomingMailSerialNumberTests(TestCase):
+    """收文序號：計數器建立前的既有收文（含已刪除）不可被重複使用"""
+
+    def test_seed_counts_soft_deleted_mail(self):
+        mail = IncomingMail.objects.create(date=date(2025, 1, 2))
+        self.assertEqual(mail.serial_number, '20250102-001')
+        mail.is_deleted = True
+        mail.save()
+        # 模擬計數器建立前已存在的收文
+        Sequence.objects.all().delete()
+
+        self.assertEqual(IncomingMail.objects.create(date=date(2025, 1, 2)).serial_number, '20250102-002')
+
+
+class IncomingMailNotificationTests(TestCase):
+    """收文明細的 LINE 通知：同一明細對同一公司只通知一次，改為其他公司時通知新公司"""
+
+    def setUp(self):
+        self.first = BasicInformation.objects.create(
+            companyId='10000001', companyName='甲公司', contact='甲', registration_address='台北市', LineId='U-first'
+        )
+        self.second = BasicInformation.objects.create(
+            companyId='10000002', companyName='乙公司', contact='乙', registration_address='台北市', LineId='U-second'
+        )
+
+    def post(self, url, company):
+        item = {
+            'sender': '國稅局',
+            'company_id': company.pk,
+            'customer_name': company.companyName,
+            'content_type': 'nta_chinese',
+            'notify_customer': True,
+        }
+        return self.client.post(url, {'date': '2025-01-02', 'items': [json.dumps(item)]})
+
+    def targets(self):
+        return list(LineNotification.objects.order_by('pk').values_list('target', flat=True))
+
+    def test_company_change_notifies_new_company(self):
+        self.post(reverse('admin_module:incoming_mail:create'), self.first)
+        mail = IncomingMail.objects.get()
+        update_url = reverse('admin_module:incoming_mail:update', args=[mail.pk])
+
+        self.post(update_url, self.first)
+        self.assertEqual(self.targets(), ['U-first'])
+
+        self.post(update_url, self.second)
+        self.assertEqual(self.targets(), ['U-first', 'U-second'])
+        self.assertEqual(mail.items.get().company, self.second)
+
+
+class CustomerDirectoryTests(TestCase):
+    """客戶目錄以版本號作為 ETag：未變更時回傳 304，新增、修改、刪除後 ETag 改變"""
+
+    def setUp(self):
+        self.customers = [
+            BasicInformation.objects.create(
+                companyId=f'1000000{index}', companyName=f'公司{index}', contact='聯絡人', registration_address='台北市'
+            )
+            for index in range(1, 6)
+        ]
+        self.url = reverse('admin_module:customer:directory')
+
+    def get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def test_revalidation_returns_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{response.json()["version"]}"')
+        self.assertEqual(len(response.json()['customers']), 5)
+
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_revalidation_with_gzip_etag(self):
+        # 壓縮後 ETag 改為弱 ETag，重新驗證仍回傳 304
+        response = self.get(accept_encoding='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(self.get(accept_encoding='gzip', if_none_match=response['ETag']).status_code, 304)
+
+    def test_writes_change_etag(self):
+        customer = self.customers[0]
+
+        def edit():
+            customer.companyName = '公司1（更名）'
+            customer.save()
+
+        writes = [
+            ('修改', edit),
+            ('軟刪除', lambda: BasicInformation.objects.filter(pk=customer.pk).delete()),
+            ('還原', lambda: BasicInformation.all_objects.filter(pk=customer.pk).restore()),
+            ('實際刪除', lambda: BasicInformation.all_objects.filter(pk=self.customers[1].pk).hard_delete()),
+            ('新增', lambda: BasicInformation.objects.create(
+                companyId='10000009', companyName='新公司', contact='聯絡人', registration_address='台北市'
+            )),
+        ]
+        etag = self.get()['ETag']
+        for label, write in writes:
+            with self.subTest(write=label):
+                write()
+                response = self.get(if_none_match=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                etag = response['ETag']
+                self.assertEqual(self.get(if_none_match=etag).status_code, 304)
+
+        names = [row['companyName'] for row in self.get().json()['customers']]
+        self.assertIn('公司1（更名）', names)
+        self.assertNotIn('公司2', names)
+
+    def test_versioned_url_is_cached_long_term(self):
+        version = self.get().json()['version']
+        self.assertIn('immutable', self.client.get(self.url, {'v': version})['Cache-Control'])
+        self.assertIn('no-cache', self.client.get(self.url, {'v': 'stale'})['Cache-Control'])
 
-# Create your tests here.
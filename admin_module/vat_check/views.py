@@ -4,13 +4,32 @@ VAT Check Views with Soft Delete
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 from admin_module.models import VATCheck, VATCheckItem
+from core.bulk import posted_item_rows, sync_ordered_items
 from .forms import VATCheckForm, VATCheckItemForm, VATCheckFilterForm
 
 
+def _item_values(item_data):
+    """明細 JSON 對應到 VATCheckItem 欄位"""
+    return {
+        'company_id': item_data.get('company_id', ''),
+        'company_name': item_data.get('company_name', ''),
+        'input_buyer': item_data.get('input_buyer', ''),
+        'check_input_amount': item_data.get('check_input_amount') or None,
+        'input_duplicate': item_data.get('input_duplicate', ''),
+        'output_e_invoice': item_data.get('output_e_invoice', ''),
+        'form401_output_amount': item_data.get('form401_output_amount') or None,
+        'form401_input_amount': item_data.get('form401_input_amount') or None,
+        'tax_credit_carried_forward': item_data.get('tax_credit_carried_forward') or None,
+        'tax_payable': item_data.get('tax_payable') or None,
+        'tax_refundable': item_data.get('tax_refundable') or None,
+    }
+
+
 def list(request):
     """營業稅檢查列表頁面"""
     vat_checks = VATCheck.objects.filter(is_deleted=False)
@@ -56,33 +75,15 @@ def list(request):
 
 def create(request):
     """新增營業稅檢查"""
-    import json
-    
     if request.method == 'POST':
         form = VATCheckForm(request.POST)
         if form.is_valid():
-            vat_check = form.save()
-            
-            # 處理明細項目
-            items_data = request.POST.getlist('items')
-            for idx, item_json in enumerate(items_data):
-                if item_json:
-                    item_data = json.loads(item_json)
-                    VATCheckItem.objects.create(
-                        vat_check=vat_check,
-                        company_id=item_data.get('company_id', ''),
-                        company_name=item_data.get('company_name', ''),
-                        input_buyer=item_data.get('input_buyer', ''),
-                        check_input_amount=item_data.get('check_input_amount') or None,
-                        input_duplicate=item_data.get('input_duplicate', ''),
-                        output_e_invoice=item_data.get('output_e_invoice', ''),
-                        form401_output_amount=item_data.get('form401_output_amount') or None,
-                        form401_input_amount=item_data.get('form401_input_amount') or None,
-                        tax_credit_carried_forward=item_data.get('tax_credit_carried_forward') or None,
-                        tax_payable=item_data.get('tax_payable') or None,
-                        tax_refundable=item_data.get('tax_refundable') or None,
-                        order=idx
-                    )
+            with transaction.atomic():
+                vat_check = form.save()
+                
+                # 處理明細項目
+                rows = posted_item_rows(request.POST.getlist('items'), _item_values)
+                sync_ordered_items(VATCheckItem, 'vat_check', vat_check, rows)
             
             messages.success(request, f'營業稅檢查「{vat_check.check_period}」已成功新增！')
             return redirect('admin_module:vat_check:list')
@@ -98,38 +99,17 @@ def create(request):
 
 def update(request, pk):
     """編輯營業稅檢查"""
-    import json
-    
     vat_check = get_object_or_404(VATCheck, pk=pk, is_deleted=False)
     
     if request.method == 'POST':
         form = VATCheckForm(request.POST, instance=vat_check)
         if form.is_valid():
-            vat_check = form.save()
-            
-            # 刪除舊的明細項目
-            vat_check.items.all().delete()
-            
-            # 重新建立明細項目
-            items_data = request.POST.getlist('items')
-            for idx, item_json in enumerate(items_data):
-                if item_json:
-                    item_data = json.loads(item_json)
-                    VATCheckItem.objects.create(
-                        vat_check=vat_check,
-                        company_id=item_data.get('company_id', ''),
-                        company_name=item_data.get('company_name', ''),
-                        input_buyer=item_data.get('input_buyer', ''),
-                        check_input_amount=item_data.get('check_input_amount') or None,
-                        input_duplicate=item_data.get('input_duplicate', ''),
-                        output_e_invoice=item_data.get('output_e_invoice', ''),
-                        form401_output_amount=item_data.get('form401_output_amount') or None,
-                        form401_input_amount=item_data.get('form401_input_amount') or None,
-                        tax_credit_carried_forward=item_data.get('tax_credit_carried_forward') or None,
-                        tax_payable=item_data.get('tax_payable') or None,
-                        tax_refundable=item_data.get('tax_refundable') or None,
-                        order=idx
-                    )
+            with transaction.atomic():
+                vat_check = form.save()
+                
+                # 比對並同步明細項目
+                rows = posted_item_rows(request.POST.getlist('items'), _item_values)
+                sync_ordered_items(VATCheckItem, 'vat_check', vat_check, rows)
             
             messages.success(request, f'營業稅檢查「{vat_check.check_period}」已成功更新！')
             return redirect('admin_module:vat_check:list')
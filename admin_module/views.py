@@ -26,7 +26,7 @@ contact_delete = contact_views.delete
 # API endpoints (still in old structure, will keep here)
 from django.http import JsonResponse
 from .models import Contact, BasicInformation
-from django.db.models import Q
+from core.search import exact_match, ranked_search
 
 def api_contacts(request):
     """API: 根據公司統編取得聯絡人列表"""
@@ -49,16 +49,16 @@ def api_customer_info(request):
     if not company_id:
         return JsonResponse({'error': 'Missing company_id'}, status=400)
     
-    try:
-        customer = BasicInformation.objects.get(companyId=company_id, is_deleted=False)
-        return JsonResponse({
-            'id': customer.id,
-            'companyName': customer.companyName,
-            'contact': customer.contact,
-        })
-    except BasicInformation.DoesNotExist:
+    customer = exact_match(BasicInformation.objects.filter(is_deleted=False), 'companyId', company_id)
+    if customer is None:
         return JsonResponse({'error': 'Customer not found'}, status=404)
 
+    return JsonResponse({
+        'id': customer.id,
+        'companyName': customer.companyName,
+        'contact': customer.contact,
+    })
+
 
 def search_companies_api(request):
     """API: 搜尋公司"""
@@ -67,11 +67,10 @@ def search_companies_api(request):
     if not query:
         return JsonResponse({'companies': []})
     
-    # Search by company name or company ID
-    companies = BasicInformation.objects.filter(
-        Q(companyName__icontains=query) | Q(companyId__icontains=query),
-        is_deleted=False
-    )[:20]  # Limit to 20 results
+    # Search by company name or company ID (exact company ID first)
+    companies = ranked_search(
+        BasicInformation.objects.filter(is_deleted=False), query, 'companyName', 'companyId'
+    )
     
     data = {
         'companies': [
@@ -81,7 +80,9 @@ def search_companies_api(request):
                 'companyId': c.companyId,
             }
             for c in companies
-        ]
+        ],
+        # 包含比對逾時，只有統編與前綴相符的結果
+        'partial': companies.partial,
     }
     
     return JsonResponse(data)
@@ -498,6 +498,21 @@ class VATRecordFilterForm(forms.Form):
             'class': 'form-select'
         })
     )
+    filing_year = forms.CharField(
+        required=False,
+        max_length=4,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': '例如: 113'
+        })
+    )
+    filing_period = forms.ChoiceField(
+        required=False,
+        choices=[('', '最新期別')] + VATRecord.FILING_PERIOD_CHOICES,
+        widget=forms.Select(attrs={
+            'class': 'form-select'
+        })
+    )
 
 
 class IncomeTaxRecordForm(forms.ModelForm):
@@ -636,3 +651,22 @@ class DownloadDataForm(forms.ModelForm):
             'tax_deadline': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}, format='%Y-%m-%d'),
             'status': forms.Select(attrs={'class': 'form-select'}),
         }
+
+
+class SpreadsheetImportForm(forms.Form):
+    """CSV / XLSX 批次匯入表單"""
+    
+    file = forms.FileField(
+        label='匯入檔案',
+        help_text='支援 CSV（UTF-8 或 Big5）與 XLSX，第一列為欄位標題',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.xlsx'
+        })
+    )
+    
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError('僅支援 CSV 或 XLSX 檔案')
+        return file
@@ -0,0 +1,90 @@
+import csv
+import io
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.http import HttpResponse
+from booking.models import BookingCustomer
+from booking.views import CUSTOMER_EXPORT_COLUMNS
+from core.export import export_response
+
+
+def _in_memory_csv(queryset, columns):
+    """原本的做法：list() 取出全部資料列，整份 CSV 寫入記憶體後回應"""
+    rows = list(queryset.values_list(*[column.lookup for column in columns]))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.header for column in columns])
+    writer.writerows(rows)
+    return HttpResponse(('﻿' + buffer.getvalue()).encode('utf-8'), content_type='text/csv; charset=utf-8')
+
+
+class Command(BaseCommand):
+    help = (
+        '量測客戶匯出的時間與尖峰記憶體：串流 CSV、串流 XLSX 與原本整份寫入記憶體的 CSV。'
+        '記憶體以 tracemalloc 量測各做法執行期間 Python 配置的尖峰；資料於交易中產生，結束時回滾'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='產生的客戶數（預設 100000）')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError('--rows 至少為 1')
+
+        with transaction.atomic():
+            self.generate(options['rows'])
+            customers = BookingCustomer.objects.filter(company_id__startswith='X').order_by('company_name', 'pk')
+            self.stdout.write(f'{len(CUSTOMER_EXPORT_COLUMNS)} 個欄位')
+
+            for label, build in (
+                ('串流 CSV', lambda: export_response(customers, CUSTOMER_EXPORT_COLUMNS, 'bench', 'csv')),
+                ('串流 XLSX', lambda: export_response(customers, CUSTOMER_EXPORT_COLUMNS, 'bench', 'xlsx')),
+                ('整份寫入記憶體的 CSV', lambda: _in_memory_csv(customers, CUSTOMER_EXPORT_COLUMNS)),
+            ):
+                self.measure(label, build)
+            # 回滾產生的資料
+            transaction.set_rollback(True)
+
+    def generate(self, count):
+        started = time.perf_counter()
+        for batch_start in range(0, count, 5000):
+            BookingCustomer.objects.bulk_create([self.customer(index) for index in range(
+                batch_start, min(batch_start + 5000, count)
+            )])
+        self.stdout.write(f'產生 {count} 位客戶：{time.perf_counter() - started:.1f} 秒')
+
+    def customer(self, index):
+        return BookingCustomer(
+            company_id=f'X{index:07d}',
+            company_name=f'匯出測試客戶{index:07d}',
+            registration_address='台北市信義區信義路五段 7 號',
+            contact_person='聯絡人',
+            phone='02-12345678',
+            email=f'customer{index}@example.invalid',
+        )
+
+    def consume(self, build):
+        """Build the response and read it to the end like a client; return the byte count."""
+        response = build()
+        if not response.streaming:
+            return len(response.content)
+        return sum(len(chunk) for chunk in response.streaming_content)
+
+    def measure(self, label, build):
+        started = time.perf_counter()
+        size = self.consume(build)
+        elapsed = time.perf_counter() - started
+
+        # 第二次執行量測記憶體（tracemalloc 會拖慢執行，不計入時間）
+        tracemalloc.start()
+        try:
+            self.consume(build)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.stdout.write(
+            f'{label}：{elapsed:.1f} 秒，輸出 {size / 1024 / 1024:.1f} MB，尖峰配置 {peak / 1024 / 1024:.1f} MB'
+        )
@@ -0,0 +1,111 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from booking.forms import VATRecordFilterForm
+from booking.models import BookingCustomer, VATRecord
+from booking.views import _resolve_vat_period, _vat_status_counts
+
+VAT_PERIODS = ['01', '03', '05', '07', '09', '11']
+COMPLETION_STATUSES = [None, 'completed', 'not_started']
+TAX_PAYMENT_STATUSES = [None, 'customer_paid', 'office_paid', 'not_replied']
+
+
+def _legacy_counts():
+    """原本的做法：五個跨全部申報歷史的 distinct().count()"""
+    customers = BookingCustomer.objects.exclude(business_type='non_business')
+    return {
+        'completed_count': customers.filter(vatrecord__completion_status='completed').distinct().count(),
+        'not_started_count': customers.filter(vatrecord__completion_status='not_started').distinct().count(),
+        'customer_paid_count': customers.filter(vatrecord__tax_payment_completed='customer_paid').distinct().count(),
+        'office_paid_count': customers.filter(vatrecord__tax_payment_completed='office_paid').distinct().count(),
+        'not_replied_count': customers.filter(vatrecord__tax_payment_completed='not_replied').distinct().count(),
+    }
+
+
+def _period_counts():
+    """目前的做法：決定申報期別後以單一條件彙總查詢計算"""
+    filing_year, filing_period = _resolve_vat_period(VATRecordFilterForm({}))
+    return _vat_status_counts(filing_year, filing_period)
+
+
+class Command(BaseCommand):
+    help = (
+        '量測營業稅列表狀態統計：原本五個 distinct().count() 與單一期別彙總查詢的比較。'
+        '資料於交易中產生，結束時回滾'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=5000, help='產生的客戶數（預設 5000）')
+        parser.add_argument('--years', type=int, default=10, help='每位客戶的申報年數，每年 6 期（預設 10）')
+        parser.add_argument('--repeat', type=int, default=5, help='每種做法執行次數（預設 5）')
+
+    def handle(self, *args, **options):
+        if min(options['customers'], options['years'], options['repeat']) < 1:
+            raise CommandError('--customers、--years 與 --repeat 至少為 1')
+
+        with transaction.atomic():
+            self.generate(options['customers'], options['years'])
+            for label, func in (('五個 distinct().count()（全部歷史）', _legacy_counts), ('單一期別彙總', _period_counts)):
+                self.measure(label, func, options['repeat'])
+            # 回滾產生的資料
+            transaction.set_rollback(True)
+
+    def generate(self, customer_count, years):
+        rng = random.Random(20260127)
+        started = time.perf_counter()
+        customers = BookingCustomer.objects.bulk_create([
+            BookingCustomer(
+                company_id=f'B{index:07d}',
+                company_name=f'測試客戶{index}',
+                registration_address='台北市',
+                contact_person='聯絡人',
+                business_type='non_business' if rng.random() < 0.05 else 'exclusive',
+            )
+            for index in range(customer_count)
+        ], batch_size=5000)
+
+        # 使用不與既有資料重疊的年度
+        first_year = 900
+        records = [
+            VATRecord(
+                customer=customer,
+                filing_year=str(first_year + offset),
+                filing_period=period,
+                completion_status=rng.choice(COMPLETION_STATUSES),
+                tax_payment_completed=rng.choice(TAX_PAYMENT_STATUSES),
+            )
+            for customer in customers
+            for offset in range(years)
+            for period in VAT_PERIODS
+        ]
+        VATRecord.objects.bulk_create(records, batch_size=5000)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {BookingCustomer._meta.db_table}')
+                cursor.execute(f'ANALYZE {VATRecord._meta.db_table}')
+        self.stdout.write(
+            f'產生 {len(customers)} 位客戶、{len(records)} 筆申報記錄：{time.perf_counter() - started:.1f} 秒'
+        )
+
+    def measure(self, label, func, repeat):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        timings = []
+        with connection.execute_wrapper(count):
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = func()
+                timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'{label}：中位數 {statistics.median(timings):.1f} ms，最慢 {max(timings):.1f} ms，'
+            f'每次 {queries // repeat} 個查詢'
+        )
+        self.stdout.write(f'  {result}')
@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from booking.utils import import_booking_customers, import_vat_records
+
+IMPORTERS = {
+    'vat': import_vat_records,
+    'customer': import_booking_customers,
+}
+
+
+class Command(BaseCommand):
+    help = '批次匯入營業稅申報記錄或記帳客戶資料（CSV / XLSX）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'record_type',
+            choices=sorted(IMPORTERS),
+            help='vat 或 customer'
+        )
+        parser.add_argument(
+            'path',
+            help='CSV 或 XLSX 檔案路徑'
+        )
+        parser.add_argument(
+            '--show-errors',
+            type=int,
+            default=20,
+            help='最多列出幾筆錯誤（預設 20）'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as file:
+                result = IMPORTERS[options['record_type']](file, options['path'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for row_number, message in result['errors'][:options['show_errors']]:
+            self.stdout.write(self.style.WARNING(f'第 {row_number} 列：{message}'))
+        if result['ignored_columns']:
+            self.stdout.write(f"未使用的欄位：{'、'.join(result['ignored_columns'])}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"匯入完成：新增 {result['created']} 筆，更新 {result['updated']} 筆，"
+            f"錯誤 {len(result['errors'])} 筆，耗時 {elapsed:.2f} 秒"
+        ))
@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from booking.utils import publish_period
+
+
+class Command(BaseCommand):
+    help = '整期發佈：將營業稅或所得稅申報期別的所有記錄批次寫入下載資料'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'record_type',
+            choices=['vat', 'income_tax'],
+            help='vat 或 income_tax'
+        )
+        parser.add_argument(
+            'filing_year',
+            help='申報年度，例如 114'
+        )
+        parser.add_argument(
+            '--period',
+            help='申報期別（營業稅必填），例如 01'
+        )
+
+    def handle(self, *args, **options):
+        record_type = options['record_type']
+        filing_period = options.get('period')
+        if record_type == 'vat' and not filing_period:
+            raise CommandError('營業稅需指定 --period')
+
+        def report(done, total):
+            self.stdout.write(f'已處理 {done}/{total}')
+
+        started = time.perf_counter()
+        result = publish_period(record_type, options['filing_year'], filing_period, progress=report)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"發佈完成：共 {result['total']} 筆，新增 {result['created']} 筆，"
+            f"更新 {result['updated']} 筆，耗時 {elapsed:.2f} 秒"
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from booking.models import DownloadData
+from booking.utils import rollover_period, DOWNLOAD_DATA_KEEP_PERIODS
+
+
+class Command(BaseCommand):
+    help = (
+        '下載資料期別輪替：當期 → 上期，超過保留期數者封存。'
+        '未指定期別時以各種類最新期別為當期，可由排程定期執行'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--category',
+            choices=[c[0] for c in DownloadData.CATEGORY_CHOICES],
+            help='只處理指定種類；未指定時處理所有種類'
+        )
+        parser.add_argument(
+            '--year',
+            type=int,
+            help='當期年度（需同時指定 --category 與 --period）'
+        )
+        parser.add_argument(
+            '--period',
+            help='當期期別，例如 01；所得稅為年度'
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=DOWNLOAD_DATA_KEEP_PERIODS,
+            help=f'保留的期數，含當期（預設 {DOWNLOAD_DATA_KEEP_PERIODS}）'
+        )
+
+    def handle(self, *args, **options):
+        year = options.get('year')
+        period = options.get('period')
+        if (year is None) != (period is None):
+            raise CommandError('--year 與 --period 需同時指定')
+        if year is not None and not options.get('category'):
+            raise CommandError('指定期別時需同時指定 --category')
+        if options['keep'] < 1:
+            raise CommandError('--keep 至少為 1')
+
+        categories = [options['category']] if options.get('category') else [
+            c[0] for c in DownloadData.CATEGORY_CHOICES
+        ]
+
+        with transaction.atomic():
+            for category in categories:
+                result = rollover_period(category, year, period, options['keep'])
+                if result is None:
+                    self.stdout.write(f'{category}: 沒有下載資料')
+                    continue
+                self.stdout.write(
+                    f"{category}: 當期 {result['year']} / {result['period']}，更新 {result['updated']} 筆"
+                )
+
+        self.stdout.write(self.style.SUCCESS('期別輪替完成'))
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0013_alter_vatrecord_filing_period_alter_vatrecord_source'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vatrecord',
+            index=models.Index(fields=['filing_year', 'filing_period'], name='vat_record_period_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:57
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_file_numbers(apps, schema_editor):
+    """
+    同一檔案編號保留最後更新的一筆，其空白欄位以其他重複列（由新到舊）的值補上，
+    其餘重複列刪除，並逐筆列出刪除的資料以供核對
+    """
+    DownloadData = apps.get_model('booking', 'DownloadData')
+    merge_fields = [
+        field.name for field in DownloadData._meta.concrete_fields
+        if field.name not in ('id', 'file_number', 'created_at', 'updated_at')
+    ]
+
+    duplicated = DownloadData.objects.values('file_number').annotate(
+        n=Count('id')
+    ).filter(n__gt=1).values_list('file_number', flat=True)
+
+    for file_number in list(duplicated):
+        keep, *others = DownloadData.objects.filter(file_number=file_number).order_by('-updated_at', '-id')
+
+        merged = {}
+        for field in merge_fields:
+            if getattr(keep, field) not in (None, ''):
+                continue
+            value = next((getattr(row, field) for row in others if getattr(row, field) not in (None, '')), None)
+            if value is not None:
+                merged[field] = value
+        if merged:
+            DownloadData.objects.filter(pk=keep.pk).update(**merged)
+
+        for row in others:
+            values = {field: getattr(row, field) for field in merge_fields}
+            print(f'\n  下載資料檔案編號 {file_number} 重複：保留 id={keep.pk}，刪除 id={row.pk} {values}')
+        DownloadData.objects.filter(pk__in=[row.pk for row in others]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0014_vatrecord_period_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_file_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='downloaddata',
+            name='file_number',
+            field=models.CharField(help_text='資料檔案編號', max_length=50, unique=True, verbose_name='檔案編號'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0015_downloaddata_unique_file_number'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='downloaddata',
+            name='status',
+            field=models.CharField(choices=[('current', '當期'), ('previous', '上期'), ('archived', '封存')], default='current', max_length=20, verbose_name='狀態'),
+        ),
+    ]
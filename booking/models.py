@@ -719,6 +719,10 @@ class VATRecord(models.Model):
         ordering = ['-filing_year', '-filing_period', '-created_at']
         # 確保同一客戶的同一年度同一期別只有一筆記錄
         unique_together = [['customer', 'filing_year', 'filing_period']]
+        indexes = [
+            # 依申報期別彙總統計、查詢最新期別
+            models.Index(fields=['filing_year', 'filing_period'], name='vat_record_period_idx'),
+        ]
     
     def __str__(self):
         return f"{self.customer.company_name} - {self.filing_year}年{self.get_filing_period_display()}"
@@ -1044,6 +1048,7 @@ class DownloadData(models.Model):
     STATUS_CHOICES = [
         ('current', '當期'),
         ('previous', '上期'),
+        ('archived', '封存'),
     ]
     
     CATEGORY_CHOICES = [
@@ -1055,6 +1060,7 @@ class DownloadData(models.Model):
     # ==================== 資料欄位 ====================
     file_number = models.CharField(
         max_length=50,
+        unique=True,
         verbose_name='檔案編號',
         help_text='資料檔案編號'
     )
@@ -1,3 +1,307 @@
+import csv
+import io
+import zipfile
+from unittest import mock
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import BookingCustomer, DownloadData, VATRecord
+from .utils import create_or_update_download_data, publish_period, rollover_period
+from .views import _vat_status_counts
 
-# Create your tests here.
+
+def create_customer(company_id, name, **kwargs):
+    return BookingCustomer.objects.create(
+        company_id=company_id,
+        company_name=name,
+        registration_address='台北市',
+        contact_person='聯絡人',
+        **kwargs
+    )
+
+
+def create_vat_record(customer, filing_year, filing_period, **kwargs):
+    return VATRecord.objects.create(
+        customer=customer,
+        filing_year=filing_year,
+        filing_period=filing_period,
+        **kwargs
+    )
+
+
+class VATStatusCountTests(TestCase):
+    """營業稅列表的狀態統計：單一彙總查詢、限定申報期別、排除非營業人"""
+
+    def setUp(self):
+        first = create_customer('10000001', '甲公司')
+        second = create_customer('10000002', '乙公司')
+        non_business = create_customer('10000003', '丙協會', business_type='non_business')
+
+        create_vat_record(first, '113', '12', completion_status='completed', tax_payment_completed='office_paid')
+        create_vat_record(second, '113', '12', completion_status='completed', tax_payment_completed='office_paid')
+        create_vat_record(first, '114', '02', completion_status='completed', tax_payment_completed='customer_paid')
+        create_vat_record(second, '114', '02', completion_status='not_started', tax_payment_completed='not_replied')
+        create_vat_record(non_business, '114', '02', completion_status='completed')
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = _vat_status_counts('114', '02')
+
+        self.assertEqual(counts, {
+            'completed_count': 1,
+            'not_started_count': 1,
+            'customer_paid_count': 1,
+            'office_paid_count': 0,
+            'not_replied_count': 1,
+        })
+
+    def test_list_defaults_to_latest_period(self):
+        response = self.client.get(reverse('booking:vat_record_list'))
+
+        self.assertEqual((response.context['filing_year'], response.context['filing_period']), ('114', '02'))
+        self.assertEqual(response.context['completed_count'], 1)
+        self.assertEqual(response.context['not_started_count'], 1)
+
+    def test_list_scoped_to_chosen_period(self):
+        response = self.client.get(
+            reverse('booking:vat_record_list'), {'filing_year': '113', 'filing_period': '12'}
+        )
+
+        self.assertEqual(response.context['completed_count'], 2)
+        self.assertEqual(response.context['not_started_count'], 0)
+        self.assertEqual(response.context['office_paid_count'], 2)
+        self.assertEqual(response.context['customer_paid_count'], 0)
+
+
+class DataTablesListTests(TestCase):
+    """列表的 DataTables 伺服器端分頁：篩選、搜尋、排序白名單與每頁筆數上限"""
+
+    def setUp(self):
+        create_customer('10000001', '甲公司', phone='02-1111')
+        create_customer('10000002', '乙公司', charge_status='not_charging')
+        create_customer('10000003', '丙企業社')
+        create_customer('20000004', '丁公司')
+
+    def get(self, **params):
+        response = self.client.get(reverse('booking:customer_list_data'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def company_ids(self, data):
+        return [row['company_id'] for row in data['data']]
+
+    def test_draw_is_echoed_as_integer(self):
+        self.assertEqual(self.get(draw='7')['draw'], 7)
+        self.assertEqual(self.get(draw='<script>')['draw'], 0)
+
+    def test_total_counts_filter_form_and_filtered_counts_search(self):
+        data = self.get(**{'charge_status': 'charging', 'search[value]': '公司'})
+        self.assertEqual(data['recordsTotal'], 3)
+        self.assertEqual(data['recordsFiltered'], 2)
+        self.assertEqual(self.company_ids(data), ['20000004', '10000001'])
+
+        data = self.get()
+        self.assertEqual((data['recordsTotal'], data['recordsFiltered']), (4, 4))
+
+    def test_default_ordering_and_paging(self):
+        self.assertEqual(self.company_ids(self.get()), ['20000004', '10000003', '10000002', '10000001'])
+        self.assertEqual(self.company_ids(self.get(start='1', length='2')), ['10000003', '10000002'])
+
+    def test_ordering_by_whitelisted_column(self):
+        data = self.get(**{'order[0][column]': '0', 'order[0][dir]': 'desc'})
+        self.assertEqual(self.company_ids(data), ['20000004', '10000003', '10000002', '10000001'])
+        data = self.get(**{'order[0][column]': '0', 'order[0][dir]': 'asc'})
+        self.assertEqual(self.company_ids(data), ['10000001', '10000002', '10000003', '20000004'])
+
+    def test_rejected_order_column_falls_back_to_default(self):
+        default = self.company_ids(self.get())
+        # 操作欄不可排序；超出範圍或非數字的欄位索引一律忽略
+        for column in ('7', '99', '-1', 'company_id'):
+            with self.subTest(column=column):
+                data = self.get(**{'order[0][column]': column, 'order[0][dir]': 'desc'})
+                self.assertEqual(self.company_ids(data), default)
+
+    def test_rejected_length_is_capped(self):
+        for length in ('0', '-1', '100000', 'all'):
+            with self.subTest(length=length):
+                data = self.get(length=length)
+                self.assertEqual(len(data['data']), 4)
+        with mock.patch('core.datatables.MAX_PAGE_LENGTH', 2):
+            self.assertEqual(len(self.get(length='100000')['data']), 2)
+
+    def test_vat_list_filters_by_period_status(self):
+        first = BookingCustomer.objects.get(company_id='10000001')
+        second = BookingCustomer.objects.get(company_id='10000002')
+        create_vat_record(first, '114', '02', completion_status='completed')
+        create_vat_record(second, '114', '02', completion_status='not_started')
+        create_vat_record(second, '113', '12', completion_status='completed')
+        create_customer('30000005', '戊協會', business_type='non_business')
+
+        response = self.client.get(reverse('booking:vat_record_list_data'))
+        # 非營業人不列入
+        self.assertEqual(response.json()['recordsTotal'], 4)
+
+        # 完成狀態只比對最新一期（乙公司 113 年已完成，但 114 年未開始）
+        response = self.client.get(reverse('booking:vat_record_list_data'), {'completion_status': 'completed'})
+        self.assertEqual(self.company_ids(response.json()), ['10000001'])
+
+
+class PublishPeriodTests(TestCase):
+    """整期發佈：依檔案編號 upsert 下載資料，分批回報進度"""
+
+    def setUp(self):
+        self.customers = [create_customer(f'1000000{index}', f'公司{index}') for index in range(1, 6)]
+        self.records = [
+            create_vat_record(customer, '114', '02', tax_payment_completed='office_paid')
+            for customer in self.customers
+        ]
+        create_vat_record(self.customers[0], '114', '04')
+
+    def test_creates_then_updates_by_file_number(self):
+        # 已以逐筆傳送建立的下載資料，整期發佈時更新同一列
+        create_or_update_download_data(self.records[0])
+
+        result = publish_period('vat', '114', '02')
+        self.assertEqual(result, {'total': 5, 'created': 4, 'updated': 1})
+        self.assertEqual(DownloadData.objects.count(), 5)
+        row = DownloadData.objects.get(file_number='10000001V11402')
+        self.assertEqual((row.year, row.category, row.payment_method), (114, 'vat', 'office'))
+
+        self.customers[1].company_name = '公司二（更名）'
+        self.customers[1].save()
+        result = publish_period('vat', '114', '02')
+        self.assertEqual(result, {'total': 5, 'created': 0, 'updated': 5})
+        self.assertEqual(DownloadData.objects.count(), 5)
+        self.assertEqual(DownloadData.objects.get(file_number='10000002V11402').company_name, '公司二（更名）')
+
+    def test_progress_reported_per_batch(self):
+        calls = []
+        with mock.patch('booking.utils.PUBLISH_BATCH_SIZE', 2):
+            result = publish_period('vat', '114', '02', progress=lambda done, total: calls.append((done, total)))
+        self.assertEqual(result['created'], 5)
+        self.assertEqual(calls, [(2, 5), (4, 5), (5, 5)])
+
+    def test_empty_period_and_invalid_type(self):
+        self.assertEqual(publish_period('vat', '113', '12'), {'total': 0, 'created': 0, 'updated': 0})
+        with self.assertRaises(ValueError):
+            publish_period('provisional', '114')
+
+
+class RolloverPeriodTests(TestCase):
+    """期別輪替：每個種類單一 UPDATE，重複執行不再變動任何列"""
+
+    def setUp(self):
+        # 營業稅 113 年 5 期、114 年 2 期，每期兩家公司；另有一筆所得稅
+        self.periods = [(113, period) for period in ('01', '02', '03', '04', '05')] + [(114, '01'), (114, '02')]
+        for year, period in self.periods:
+            for company_id in ('10000001', '10000002'):
+                DownloadData.objects.create(
+                    file_number=f'{company_id}V{year}{period}', year=year, period=period, category='vat',
+                    company_id=company_id, company_name='公司', status='current'
+                )
+        DownloadData.objects.create(
+            file_number='10000001T113', year=113, period='113', category='income_tax',
+            company_id='10000001', company_name='公司', status='current'
+        )
+
+    def statuses(self, category='vat'):
+        rows = DownloadData.objects.filter(category=category).values_list('year', 'period', 'status')
+        return {(year, period): status for year, period, status in rows}
+
+    def test_latest_period_becomes_current_in_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = rollover_period('vat', keep_periods=3)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('CASE', updates[0])
+
+        self.assertEqual(result, {'year': 114, 'period': '02', 'updated': 12})
+        self.assertEqual(self.statuses(), {
+            (113, '01'): 'archived', (113, '02'): 'archived', (113, '03'): 'archived', (113, '04'): 'archived',
+            (113, '05'): 'previous', (114, '01'): 'previous', (114, '02'): 'current',
+        })
+        # 其他種類不受影響
+        self.assertEqual(self.statuses('income_tax'), {(113, '113'): 'current'})
+
+    def test_second_run_changes_nothing(self):
+        rollover_period('vat', keep_periods=3)
+        before = list(DownloadData.objects.order_by('pk').values_list('pk', 'status', 'updated_at'))
+
+        result = rollover_period('vat', keep_periods=3)
+        self.assertEqual(result['updated'], 0)
+        self.assertEqual(list(DownloadData.objects.order_by('pk').values_list('pk', 'status', 'updated_at')), before)
+
+    def test_explicit_period_moves_current_back(self):
+        rollover_period('vat', keep_periods=3)
+        result = rollover_period('vat', 113, '05', keep_periods=3)
+        statuses = self.statuses()
+        self.assertEqual(result['updated'], 4)
+        self.assertEqual(statuses[(113, '05')], 'current')
+        self.assertEqual(statuses[(114, '02')], 'previous')
+        # 已封存的期別不會恢復
+        self.assertEqual(statuses[(113, '03')], 'archived')
+
+    def test_empty_category(self):
+        self.assertIsNone(rollover_period('provisional'))
+
+
+class ExportTests(TestCase):
+    """匯出以串流回應輸出，沿用列表的篩選、搜尋與申報期別"""
+
+    def setUp(self):
+        self.first = create_customer('10000001', '甲公司', business_password='secret')
+        self.second = create_customer('10000002', '乙公司', charge_status='not_charging')
+        create_vat_record(self.first, '113', '12', sales_amount=1000)
+        create_vat_record(self.first, '114', '02', sales_amount=2000, completion_status='completed')
+        create_vat_record(self.second, '114', '02', sales_amount=3000)
+
+    def csv_rows(self, response):
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        return list(csv.reader(io.StringIO(content[1:])))
+
+    def test_customer_csv(self):
+        rows = self.csv_rows(self.client.get(reverse('booking:customer_export')))
+        header = rows[0]
+
+        self.assertIn('公司名稱', header)
+        self.assertNotIn('營業人密碼', header)
+        self.assertNotIn('電子發票密碼', header)
+        # 依公司名稱排序
+        self.assertEqual([row[header.index('統一編號')] for row in rows[1:]], ['10000002', '10000001'])
+        self.assertEqual([row[header.index('收費狀態')] for row in rows[1:]], ['未收費', '收費中'])
+        self.assertNotIn('secret', sum(rows, []))
+
+    def test_customer_csv_uses_search(self):
+        rows = self.csv_rows(self.client.get(reverse('booking:customer_export'), {'search': '乙'}))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][rows[0].index('公司名稱')], '乙公司')
+
+    def test_vat_csv_scoped_to_period(self):
+        rows = self.csv_rows(self.client.get(reverse('booking:vat_record_export')))
+        header = rows[0]
+
+        self.assertEqual(
+            [(row[header.index('申報年度')], row[header.index('銷項金額')]) for row in rows[1:]],
+            [('114', '3000'), ('114', '2000')]
+        )
+        self.assertEqual([row[header.index('完成狀態')] for row in rows[1:]], ['', '已完成'])
+
+    def test_vat_xlsx(self):
+        response = self.client.get(reverse('booking:vat_record_export'), {
+            'format': 'xlsx', 'filing_year': '113', 'filing_period': '12'
+        })
+        self.assertTrue(response.streaming)
+        workbook = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode('utf-8')
+
+        self.assertEqual(sheet.count('<row>'), 2)
+        self.assertIn('<c><v>1000</v></c>', sheet)
+        self.assertIn('甲公司', sheet)
+        self.assertNotIn('乙公司', sheet)
+
+    def test_unsupported_format(self):
+        response = self.client.get(reverse('booking:customer_export'), {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
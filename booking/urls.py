@@ -6,6 +6,9 @@ app_name = 'booking'
 urlpatterns = [
     # 客戶管理
     path('customers/', views.customer_list, name='customer_list'),
+    path('customers/data/', views.customer_list_data, name='customer_list_data'),
+    path('customers/export/', views.customer_export, name='customer_export'),
+    path('customers/import/', views.customer_import, name='customer_import'),
     path('customers/create/', views.customer_create, name='customer_create'),
     path('customers/<int:pk>/update/', views.customer_update, name='customer_update'),
     path('customers/<int:pk>/delete/', views.customer_delete, name='customer_delete'),
@@ -22,12 +25,17 @@ urlpatterns = [
     
     # VAT 申報記錄管理
     path('vat/', views.vat_record_list, name='vat_record_list'),
+    path('vat/data/', views.vat_record_list_data, name='vat_record_list_data'),
+    path('vat/export/', views.vat_record_export, name='vat_record_export'),
+    path('vat/import/', views.vat_record_import, name='vat_record_import'),
     path('vat/customer/<int:customer_id>/edit/', views.vat_record_edit, name='vat_record_edit_by_customer'),
     path('vat/<int:pk>/edit/', views.vat_record_edit, name='vat_record_edit'),
     path('vat/<int:pk>/delete/', views.vat_record_delete, name='vat_record_delete'),
     
     # 所得稅申報記錄管理
     path('income-tax/', views.income_tax_list, name='income_tax_list'),
+    path('income-tax/data/', views.income_tax_list_data, name='income_tax_list_data'),
+    path('income-tax/export/', views.income_tax_export, name='income_tax_export'),
     path('income-tax/customer/<int:customer_id>/edit/', views.income_tax_edit_by_customer, name='income_tax_edit_by_customer'),
     
     # 下載資料管理
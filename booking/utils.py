@@ -2,20 +2,38 @@
 """
 Utility functions for booking app
 """
-from .models import DownloadData, VATRecord, IncomeTaxRecord
-from django.utils import timezone
+from .models import BookingCustomer, DownloadData, VATRecord, IncomeTaxRecord
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+from core.imports import bulk_import
+from core.line import line_target, queue_line_message
 
 
-def create_or_update_download_data(record, record_type='vat'):
+# VAT 繳稅方式 -> 下載資料繳稅方式
+# VAT: customer_paid, office_paid, not_replied
+# Download: customer, office, no_reply
+PAYMENT_METHOD_MAP = {
+    'customer_paid': 'customer',
+    'office_paid': 'office',
+    'not_replied': 'no_reply'
+}
+
+PUBLISH_BATCH_SIZE = 1000
+
+# 期別輪替時保留（不封存）的期數，含當期
+DOWNLOAD_DATA_KEEP_PERIODS = 6
+
+
+def build_download_data_values(record, record_type='vat'):
     """
-    建立或更新下載資料
+    組出記錄對應的下載資料檔案編號及欄位值
     
     Args:
-        record: VATRecord 或 IncomeTaxRecord 實例
+        record: VATRecord 或 IncomeTaxRecord 實例（customer 應已 select_related）
         record_type: 'vat' 或 'income_tax'
     
     Returns:
-        DownloadData 實例
+        tuple: (file_number, 欄位值 dict)
     """
     # 決定種類代碼
     category_code = 'V' if record_type == 'vat' else 'T'
@@ -30,24 +48,15 @@ def create_or_update_download_data(record, record_type='vat'):
         category = 'vat'
     else:  # income_tax
         file_number = f"{customer.company_id}{category_code}{record.filing_year}"
-        period = f"{record.filing_year}年度"
+        period = str(record.filing_year)
         category = 'income_tax'
     
-    # 對應 Payment Method
-    # VAT: customer_paid, office_paid, not_replied
-    # Download: customer, office, no_reply
-    payment_map = {
-        'customer_paid': 'customer',
-        'office_paid': 'office',
-        'not_replied': 'no_reply'
-    }
-    
     payment_method = None
     if record_type == 'vat' and hasattr(record, 'tax_payment_completed'):
         # 嘗試直接對應
-        payment_method = payment_map.get(record.tax_payment_completed)
+        payment_method = PAYMENT_METHOD_MAP.get(record.tax_payment_completed)
         # 如果對應不到，可能是已經相同的代碼（使用者修改過），嘗試直接賦值
-        if not payment_method and record.tax_payment_completed in payment_map.values():
+        if not payment_method and record.tax_payment_completed in PAYMENT_METHOD_MAP.values():
             payment_method = record.tax_payment_completed
 
     # 對應 Source
@@ -56,44 +65,152 @@ def create_or_update_download_data(record, record_type='vat'):
     source = 'manual'
     if hasattr(record, 'source') and record.source:
         source = record.source
+
+    values = {
+        'year': record.filing_year,
+        'period': period,
+        'category': category,
+        'company_id': customer.company_id,
+        'company_name': customer.company_name,
+        'email': customer.email if hasattr(customer, 'email') else None,
+        'status': 'current',
+        'source': source,
+        # 日期欄位
+        'invoice_received_date': record.invoice_received_date if hasattr(record, 'invoice_received_date') else None,
+        'reply_time': record.reply_time if hasattr(record, 'reply_time') else None,
+        'tax_deadline': record.tax_deadline if hasattr(record, 'tax_deadline') else None,
+        # 其他資訊欄位
+        'payment_method': payment_method,
+        'declaration_url': record.declaration_url if hasattr(record, 'declaration_url') else None,
+        'payment_slip_url': record.payment_slip_url if hasattr(record, 'payment_slip_url') else None,
+    }
+    return file_number, values
+
+
+def create_or_update_download_data(record, record_type='vat'):
+    """
+    建立或更新下載資料
     
-    # 為了調試日期問題，我們打印日誌
-    print(f"Transferring Data for {file_number}:")
-    print(f"Source: {source}")
-    print(f"Payment Method: {payment_method}")
-    if hasattr(record, 'invoice_received_date'):
-        print(f"Invoice Date: {record.invoice_received_date}")
-    if hasattr(record, 'reply_time'):
-        print(f"Reply Time: {record.reply_time}")
-    if hasattr(record, 'tax_deadline'):
-        print(f"Tax Deadline: {record.tax_deadline}")
+    Args:
+        record: VATRecord 或 IncomeTaxRecord 實例
+        record_type: 'vat' 或 'income_tax'
+    
+    Returns:
+        DownloadData 實例
+    """
+    file_number, values = build_download_data_values(record, record_type)
 
     # 檢查是否已存在
     download_data, created = DownloadData.objects.update_or_create(
         file_number=file_number,
-        defaults={
-            'year': record.filing_year,
-            'period': period if record_type == 'vat' else str(record.filing_year),
-            'category': category,
-            'company_id': customer.company_id,
-            'company_name': customer.company_name,
-            'email': customer.email if hasattr(customer, 'email') else None,
-            'status': 'current',
-            'source': source,
-            # 日期欄位
-            'invoice_received_date': record.invoice_received_date if hasattr(record, 'invoice_received_date') else None,
-            'reply_time': record.reply_time if hasattr(record, 'reply_time') else None,
-            'tax_deadline': record.tax_deadline if hasattr(record, 'tax_deadline') else None,
-            # 其他資訊欄位
-            'payment_method': payment_method,
-            'declaration_url': record.declaration_url if hasattr(record, 'declaration_url') else None,
-            'payment_slip_url': record.payment_slip_url if hasattr(record, 'payment_slip_url') else None,
-        }
+        defaults=values
     )
     
     return download_data, created
 
 
+def publish_period(record_type, filing_year, filing_period=None, progress=None):
+    """
+    整期發佈：將一個申報期別的所有記錄批次寫入下載資料
+    
+    以檔案編號做批次 upsert（INSERT ... ON CONFLICT），
+    全部在同一個交易中完成。
+    
+    Args:
+        record_type: 'vat' 或 'income_tax'
+        filing_year: 申報年度
+        filing_period: 申報期別（營業稅用，所得稅為 None）
+        progress: 選用的回呼 progress(已處理筆數, 總筆數)
+    
+    Returns:
+        dict: {'total': int, 'created': int, 'updated': int}
+    """
+    if record_type == 'vat':
+        records = VATRecord.objects.filter(filing_year=filing_year, filing_period=filing_period)
+    elif record_type == 'income_tax':
+        records = IncomeTaxRecord.objects.filter(filing_year=filing_year)
+    else:
+        raise ValueError(f'無效的記錄類型：{record_type}')
+
+    # 同一客戶同期若有多筆記錄，以最後一筆為準（與逐筆傳送的結果相同）
+    rows = {}
+    for record in records.select_related('customer').order_by('pk').iterator(chunk_size=PUBLISH_BATCH_SIZE):
+        file_number, values = build_download_data_values(record, record_type)
+        rows[file_number] = values
+
+    total = len(rows)
+    update_fields = list(next(iter(rows.values()), {})) + ['updated_at']
+    file_numbers = list(rows)
+    created = done = 0
+
+    with transaction.atomic():
+        for start in range(0, total, PUBLISH_BATCH_SIZE):
+            chunk = file_numbers[start:start + PUBLISH_BATCH_SIZE]
+            existing = set(
+                DownloadData.objects.filter(file_number__in=chunk).values_list('file_number', flat=True)
+            )
+
+            # INSERT ... ON CONFLICT (file_number) DO UPDATE
+            DownloadData.objects.bulk_create(
+                [DownloadData(file_number=file_number, **rows[file_number]) for file_number in chunk],
+                update_conflicts=True,
+                unique_fields=['file_number'],
+                update_fields=update_fields
+            )
+
+            created += len(chunk) - len(existing)
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+
+    return {'total': total, 'created': created, 'updated': total - created}
+
+
+def rollover_period(category, year=None, period=None, keep_periods=DOWNLOAD_DATA_KEEP_PERIODS):
+    """
+    期別輪替：指定期別設為當期，其餘當期改為上期，超過保留期數者封存
+    
+    每個種類只執行一次 UPDATE，且只更新狀態需要變動的列，重複執行不會有影響。
+    
+    Args:
+        category: 下載資料種類（vat / income_tax / provisional）
+        year: 當期年度；未指定時取該種類最新的期別
+        period: 當期期別
+        keep_periods: 保留的期數（含當期），更早的期別封存
+    
+    Returns:
+        dict: {'year', 'period', 'updated'}；該種類沒有資料時回傳 None
+    """
+    rows = DownloadData.objects.filter(category=category)
+    periods = rows.values_list('year', 'period').distinct().order_by('-year', '-period')
+
+    if year is None:
+        latest = periods.first()
+        if latest is None:
+            return None
+        year, period = latest
+
+    target = Q(year=year, period=period)
+
+    # 第 keep_periods 個期別（含）以前保留，更早者封存
+    older = Q(pk__in=[])
+    cutoff = periods.filter(Q(year__lt=year) | Q(year=year, period__lte=period))[keep_periods - 1:keep_periods].first()
+    if cutoff:
+        older = Q(year__lt=cutoff[0]) | Q(year=cutoff[0], period__lt=cutoff[1])
+
+    updated = rows.filter(
+        (target & ~Q(status='current'))
+        | (~target & Q(status='current'))
+        | (older & Q(status='previous'))
+    ).update(status=Case(
+        When(target, then=Value('current')),
+        When(older, then=Value('archived')),
+        default=Value('previous'),
+    ))
+
+    return {'year': year, 'period': period, 'updated': updated}
+
+
 def notify_customer_and_save(record, record_type='vat'):
     """
     通知客戶並儲存到下載資料
@@ -113,7 +230,68 @@ def notify_customer_and_save(record, record_type='vat'):
         
         message = f"{customer_name} 本期資料已傳送（下載資料{action}）"
         
+        # 客戶有 LINE ID 時排入 LINE 通知佇列，由背景程序發送
+        target = line_target(record.customer)
+        if target:
+            queue_line_message(
+                target,
+                f"{customer_name} 您好，{download_data.year}年{download_data.period}期資料已更新，請至下載專區查看。"
+            )
+            message += "，已排入 LINE 通知"
+        
         return True, message, download_data
     
     except Exception as e:
         return False, f"傳送失敗：{str(e)}", None
+
+
+def _customers_by_company_id(company_ids):
+    """以統一編號整批查詢客戶（匯入時每批一次）"""
+    customers = BookingCustomer.objects.filter(company_id__in=company_ids).only('pk', 'company_id', 'business_type')
+    return {customer.company_id: customer for customer in customers}
+
+
+def _check_vat_record(record):
+    if record.customer.business_type == 'non_business':
+        return '非營業人不需要申報營業稅'
+    return None
+
+
+def import_vat_records(file, filename):
+    """
+    批次匯入營業稅申報記錄（CSV / XLSX）
+    
+    以「統一編號」對應客戶，依（客戶、申報年度、申報期別）新增或更新；
+    欄位標題可用營業稅匯出檔的中文名稱，未出現在檔案中的欄位不會被覆寫。
+    
+    Args:
+        file: 上傳的檔案
+        filename: 原始檔名（依副檔名判斷格式）
+    
+    Returns:
+        dict: {'created', 'updated', 'errors', 'ignored_columns'}，見 core.imports.bulk_import
+    """
+    return bulk_import(
+        VATRecord, file, filename,
+        unique_fields=['customer', 'filing_year', 'filing_period'],
+        lookups={
+            '統一編號': ('customer', _customers_by_company_id),
+            'company_id': ('customer', _customers_by_company_id),
+        },
+        validate=_check_vat_record,
+        exclude=('customer',),
+    )
+
+
+def import_booking_customers(file, filename):
+    """
+    批次匯入記帳客戶資料（CSV / XLSX），依統一編號新增或更新
+    
+    Args:
+        file: 上傳的檔案
+        filename: 原始檔名（依副檔名判斷格式）
+    
+    Returns:
+        dict: {'created', 'updated', 'errors', 'ignored_columns'}，見 core.imports.bulk_import
+    """
+    return bulk_import(BookingCustomer, file, filename, unique_fields=['company_id'])
@@ -3,9 +3,17 @@ from django.contrib import messages
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.forms import inlineformset_factory
-from django.db.models import Q
+from django.db.models import Q, Count
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.html import format_html
+from django.utils import timezone
+from core.datatables import DataTableColumn, apply_search, datatables_response
+from core.export import EXPORT_FORMATS, ExportColumn, export_response, model_export_columns
+from core.search import ranked_search
 from .models import BookingCustomer, TaxAuditRecord, TaxAuditHistory, VATRecord, IncomeTaxRecord, DownloadData
-from .forms import BookingCustomerForm, BookingCustomerFilterForm, TaxAuditRecordForm, TaxAuditHistoryForm, VATRecordForm, VATRecordFilterForm, IncomeTaxRecordForm, DownloadDataForm
+from .forms import BookingCustomerForm, BookingCustomerFilterForm, TaxAuditRecordForm, TaxAuditHistoryForm, VATRecordForm, VATRecordFilterForm, IncomeTaxRecordForm, DownloadDataForm, SpreadsheetImportForm
+from .utils import import_booking_customers, import_vat_records
 from admin_module.models import BasicInformation
 
 
@@ -15,10 +23,7 @@ def search_customers(request):
     if len(term) < 1:
         return JsonResponse({'config': {}, 'data': []})
     
-    customers = BasicInformation.objects.filter(
-        Q(companyName__icontains=term) |
-        Q(companyId__icontains=term)
-    )[:20]
+    customers = ranked_search(BasicInformation.objects.all(), term, 'companyName', 'companyId')
     
     results = []
     for c in customers:
@@ -42,20 +47,17 @@ def search_customers(request):
                 {'title': '負責人', 'data': 'contact_person'},
             ]
         },
-        'data': results
+        'data': results,
+        # 包含比對逾時，只有統編與前綴相符的結果
+        'partial': customers.partial,
     }
     return JsonResponse(response_data)
 
 
-def customer_list(request):
-    """客戶列表視圖"""
-    # 獲取篩選條件
-    filter_form = BookingCustomerFilterForm(request.GET)
-    
-    # 查詢所有客戶
+def _filter_customers(filter_form):
+    """依客戶篩選表單過濾記帳客戶"""
     customers = BookingCustomer.objects.all()
     
-    # 應用篩選條件
     if filter_form.is_valid():
         company_name = filter_form.cleaned_data.get('company_name')
         company_id = filter_form.cleaned_data.get('company_id')
@@ -74,15 +76,134 @@ def customer_list(request):
         if undertaking_status:
             customers = customers.filter(undertaking_status=undertaking_status)
     
+    return customers
+
+
+def _charge_status_badge(customer):
+    css = 'bg-success' if customer.charge_status == 'charging' else 'bg-secondary'
+    return format_html('<span class="badge {}">{}</span>', css, customer.get_charge_status_display())
+
+
+def _undertaking_status_badge(customer):
+    if customer.undertaking_status == 'undertaking':
+        css = 'bg-primary'
+    elif customer.undertaking_status == 'suspended':
+        css = 'bg-warning'
+    else:
+        css = 'bg-danger'
+    return format_html('<span class="badge {}">{}</span>', css, customer.get_undertaking_status_display())
+
+
+def _edit_button(url):
+    return format_html(
+        '<a href="{}" class="btn btn-sm btn-warning"><i class="bi bi-pencil"></i> 編輯</a>', url
+    )
+
+
+CUSTOMER_TABLE_COLUMNS = [
+    DataTableColumn('company_id', 'company_id'),
+    DataTableColumn('company_name', 'company_name'),
+    DataTableColumn('contact_person', 'contact_person'),
+    DataTableColumn('phone', 'phone', lambda c: c.phone or '—'),
+    DataTableColumn('charge_status', 'charge_status', _charge_status_badge),
+    DataTableColumn('undertaking_status', 'undertaking_status', _undertaking_status_badge),
+    DataTableColumn('industry_name', 'industry_name', lambda c: c.industry_name or '—'),
+    DataTableColumn('actions', render=lambda c: format_html(
+        '<a href="{}" class="btn btn-sm btn-warning me-1">編輯</a>'
+        '<a href="{}" class="btn btn-sm btn-danger">刪除</a>',
+        reverse('booking:customer_update', args=[c.pk]),
+        reverse('booking:customer_delete', args=[c.pk]),
+    )),
+]
+
+CUSTOMER_SEARCH_FIELDS = ['company_id', 'company_name', 'contact_person', 'phone', 'industry_name']
+
+
+def customer_list(request):
+    """客戶列表視圖（資料由 customer_list_data 分頁載入）"""
+    filter_form = BookingCustomerFilterForm(request.GET)
     
-    # 不使用 Django 分頁，讓 DataTables 處理
     context = {
-        'customers': customers,  # 傳遞所有篩選後的客戶，不分頁
         'filter_form': filter_form,
     }
     return render(request, 'booking/customer_list.html', context)
 
 
+def customer_list_data(request):
+    """API: 客戶列表 DataTables 伺服器端分頁資料"""
+    filter_form = BookingCustomerFilterForm(request.GET)
+    customers = _filter_customers(filter_form)
+    
+    return datatables_response(
+        request, customers, CUSTOMER_TABLE_COLUMNS,
+        search_fields=CUSTOMER_SEARCH_FIELDS,
+        default_ordering=['company_name']
+    )
+
+
+def _export_format(request):
+    export_format = request.GET.get('format', 'csv')
+    return export_format if export_format in EXPORT_FORMATS else None
+
+
+def _unsupported_export_format():
+    return JsonResponse({'success': False, 'error': '不支援的匯出格式'}, status=400)
+
+
+# 密碼欄位不匯出
+CUSTOMER_EXPORT_COLUMNS = model_export_columns(
+    BookingCustomer, exclude=('business_password', 'e_invoice_password')
+)
+
+
+def customer_export(request):
+    """匯出客戶資料（CSV / XLSX 串流下載，沿用列表的篩選與搜尋條件）"""
+    export_format = _export_format(request)
+    if not export_format:
+        return _unsupported_export_format()
+    
+    filter_form = BookingCustomerFilterForm(request.GET)
+    customers = apply_search(
+        _filter_customers(filter_form), request.GET.get('search'), CUSTOMER_SEARCH_FIELDS
+    ).order_by('company_name', 'pk')
+    
+    filename = f"記帳客戶_{timezone.localdate():%Y%m%d}"
+    return export_response(customers, CUSTOMER_EXPORT_COLUMNS, filename, export_format)
+
+
+def _import_view(request, importer, action, list_url_name):
+    """批次匯入共用流程：上傳檔案、逐批驗證寫入，並列出每列的錯誤"""
+    result = None
+    if request.method == 'POST':
+        form = SpreadsheetImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = importer(upload, upload.name)
+            except ValueError as e:
+                form.add_error('file', str(e))
+            else:
+                messages.success(
+                    request,
+                    f"匯入完成：新增 {result['created']} 筆，更新 {result['updated']} 筆，"
+                    f"錯誤 {len(result['errors'])} 筆"
+                )
+    else:
+        form = SpreadsheetImportForm()
+    
+    context = {
+        'form': form,
+        'action': action,
+        'list_url_name': list_url_name,
+        'result': result,
+    }
+    return render(request, 'booking/import_form.html', context)
+
+
+def customer_import(request):
+    """批次匯入客戶資料（依統一編號新增或更新）"""
+    return _import_view(request, import_booking_customers, '匯入記帳客戶資料', 'booking:customer_list')
+
 
 def customer_create(request):
     """新增客戶視圖"""
@@ -256,27 +377,69 @@ def tax_audit_delete(request, pk):
 
 # ==================== VAT 申報記錄相關視圖 ====================
 
-def vat_record_list(request):
-    """營業稅申報記錄列表視圖"""
-    # 獲取篩選條件
-    filter_form = VATRecordFilterForm(request.GET)
+def _resolve_vat_period(filter_form):
+    """
+    決定統計與快速篩選所用的申報期別
+    
+    表單有指定年度與期別時直接使用，否則取（指定年度內）最新的一期。
+    
+    Returns:
+        tuple: (filing_year, filing_period)，沒有任何申報記錄時為 (None, None)
+    """
+    filing_year = filing_period = None
+    if filter_form.is_valid():
+        filing_year = filter_form.cleaned_data.get('filing_year') or None
+        filing_period = filter_form.cleaned_data.get('filing_period') or None
     
-    # 查詢所有客戶，排除非營業人
+    if filing_year and filing_period:
+        return filing_year, filing_period
+    
+    records = VATRecord.objects.all()
+    if filing_year:
+        records = records.filter(filing_year=filing_year)
+    if filing_period:
+        records = records.filter(filing_period=filing_period)
+    latest = records.order_by('-filing_year', '-filing_period').values('filing_year', 'filing_period').first()
+    
+    if latest:
+        return latest['filing_year'], latest['filing_period']
+    return filing_year, filing_period
+
+
+def _vat_status_counts(filing_year, filing_period):
+    """以單一條件彙總查詢計算指定期別的完成／繳稅狀態數量（排除非營業人）"""
+    records = VATRecord.objects.exclude(customer__business_type='non_business').filter(
+        filing_year=filing_year,
+        filing_period=filing_period
+    )
+    
+    return records.aggregate(
+        completed_count=Count('pk', filter=Q(completion_status='completed')),
+        not_started_count=Count('pk', filter=Q(completion_status='not_started')),
+        customer_paid_count=Count('pk', filter=Q(tax_payment_completed='customer_paid')),
+        office_paid_count=Count('pk', filter=Q(tax_payment_completed='office_paid')),
+        not_replied_count=Count('pk', filter=Q(tax_payment_completed='not_replied')),
+    )
+
+
+def _filter_vat_customers(request, filter_form, filing_year=None, filing_period=None):
+    """依快速篩選與進階篩選表單過濾營業稅客戶（排除非營業人）"""
     customers = BookingCustomer.objects.exclude(business_type='non_business')
     
-    # 快速篩選：完成狀態
+    # 快速篩選：完成狀態、繳稅完成否（限定於統計的申報期別，需在同一個 filter 中才會對應同一筆申報記錄）
+    record_filters = {}
     completion_status = request.GET.get('completion_status')
     if completion_status:
-        customers = customers.filter(
-            vatrecord__completion_status=completion_status
-        ).distinct()
-    
-    # 快速篩選：繳稅完成否
+        record_filters['vatrecord__completion_status'] = completion_status
     tax_payment_completed = request.GET.get('tax_payment_completed')
     if tax_payment_completed:
-        customers = customers.filter(
-            vatrecord__tax_payment_completed=tax_payment_completed
-        ).distinct()
+        record_filters['vatrecord__tax_payment_completed'] = tax_payment_completed
+    
+    if record_filters:
+        if filing_year and filing_period:
+            record_filters['vatrecord__filing_year'] = filing_year
+            record_filters['vatrecord__filing_period'] = filing_period
+        customers = customers.filter(**record_filters).distinct()
     
     # 應用篩選條件
     if filter_form.is_valid():
@@ -300,42 +463,51 @@ def vat_record_list(request):
         if tax_payment:
             customers = customers.filter(tax_payment=tax_payment)
     
-    # 計算統計數據（基於所有非營業人客戶）
-    all_customers = BookingCustomer.objects.exclude(business_type='non_business')
-    from django.db.models import Q
-    
-    # 完成狀態統計
-    completed_count = all_customers.filter(
-        vatrecord__completion_status='completed'
-    ).distinct().count()
-    
-    not_started_count = all_customers.filter(
-        vatrecord__completion_status='not_started'
-    ).distinct().count()
-    
-    # 繳稅狀態統計
-    customer_paid_count = all_customers.filter(
-        vatrecord__tax_payment_completed='customer_paid'
-    ).distinct().count()
-    
-    office_paid_count = all_customers.filter(
-        vatrecord__tax_payment_completed='office_paid'
-    ).distinct().count()
+    return customers
+
+
+VAT_TABLE_COLUMNS = [
+    DataTableColumn('company_id', 'company_id'),
+    DataTableColumn('company_name', 'company_name'),
+    DataTableColumn('bookkeeping_assistant', 'bookkeeping_assistant', lambda c: c.bookkeeping_assistant or '—'),
+    DataTableColumn('business_type', 'business_type', lambda c: c.get_business_type_display()),
+    DataTableColumn('tax_payment', 'tax_payment', lambda c: c.get_tax_payment_display() or '—'),
+    DataTableColumn('undertaking_status', 'undertaking_status', _undertaking_status_badge),
+    DataTableColumn('actions', render=lambda c: _edit_button(
+        reverse('booking:vat_record_edit_by_customer', args=[c.pk])
+    )),
+]
+
+VAT_SEARCH_FIELDS = ['company_id', 'company_name', 'bookkeeping_assistant']
+
+
+def vat_record_list(request):
+    """營業稅申報記錄列表視圖（資料由 vat_record_list_data 分頁載入）"""
+    # 獲取篩選條件
+    filter_form = VATRecordFilterForm(request.GET)
+    completion_status = request.GET.get('completion_status')
+    tax_payment_completed = request.GET.get('tax_payment_completed')
     
-    not_replied_count = all_customers.filter(
-        vatrecord__tax_payment_completed='not_replied'
-    ).distinct().count()
+    # 計算統計數據（指定或最新的申報期別，排除非營業人）
+    filing_year, filing_period = _resolve_vat_period(filter_form)
+    if filing_year and filing_period:
+        counts = _vat_status_counts(filing_year, filing_period)
+        period_query = urlencode({'filing_year': filing_year, 'filing_period': filing_period})
+    else:
+        counts = {}
+        period_query = ''
     
-    # 不使用 Django 分頁，讓 DataTables 處理
     context = {
-        'customers': customers,  # 傳遞所有篩選後的客戶，不分頁
         'filter_form': filter_form,
         # 統計數據
-        'completed_count': completed_count,
-        'not_started_count': not_started_count,
-        'customer_paid_count': customer_paid_count,
-        'office_paid_count': office_paid_count,
-        'not_replied_count': not_replied_count,
+        'filing_year': filing_year,
+        'filing_period': filing_period,
+        'period_query': period_query,
+        'completed_count': counts.get('completed_count', 0),
+        'not_started_count': counts.get('not_started_count', 0),
+        'customer_paid_count': counts.get('customer_paid_count', 0),
+        'office_paid_count': counts.get('office_paid_count', 0),
+        'not_replied_count': counts.get('not_replied_count', 0),
         # 當前篩選狀態
         'current_completion_status': completion_status,
         'current_tax_payment_completed': tax_payment_completed,
@@ -343,6 +515,54 @@ def vat_record_list(request):
     return render(request, 'booking/vat_record_list.html', context)
 
 
+def vat_record_list_data(request):
+    """API: 營業稅客戶列表 DataTables 伺服器端分頁資料"""
+    filter_form = VATRecordFilterForm(request.GET)
+    filing_year, filing_period = _resolve_vat_period(filter_form)
+    customers = _filter_vat_customers(request, filter_form, filing_year, filing_period)
+    
+    return datatables_response(
+        request, customers, VAT_TABLE_COLUMNS,
+        search_fields=VAT_SEARCH_FIELDS,
+        default_ordering=['company_name']
+    )
+
+
+# 客戶統編、名稱接在申報記錄欄位之前
+RECORD_CUSTOMER_EXPORT_COLUMNS = [
+    ExportColumn('統一編號', 'customer__company_id'),
+    ExportColumn('公司名稱', 'customer__company_name'),
+]
+
+VAT_EXPORT_COLUMNS = RECORD_CUSTOMER_EXPORT_COLUMNS + model_export_columns(VATRecord, exclude=('id', 'customer'))
+
+
+def vat_record_export(request):
+    """匯出營業稅申報記錄（CSV / XLSX 串流下載，沿用列表的期別、篩選與搜尋條件）"""
+    export_format = _export_format(request)
+    if not export_format:
+        return _unsupported_export_format()
+    
+    filter_form = VATRecordFilterForm(request.GET)
+    filing_year, filing_period = _resolve_vat_period(filter_form)
+    customers = apply_search(
+        _filter_vat_customers(request, filter_form, filing_year, filing_period),
+        request.GET.get('search'), VAT_SEARCH_FIELDS
+    )
+    
+    records = VATRecord.objects.filter(customer__in=customers.values('pk'))
+    filename = '營業稅申報記錄'
+    if filing_year and filing_period:
+        records = records.filter(filing_year=filing_year, filing_period=filing_period)
+        filename = f'{filename}_{filing_year}_{filing_period}'
+    records = records.order_by('customer__company_name', 'pk')
+    
+    return export_response(records, VAT_EXPORT_COLUMNS, filename, export_format)
+
+
+def vat_record_import(request):
+    """批次匯入營業稅申報記錄（依客戶、申報年度、申報期別新增或更新）"""
+    return _import_view(request, import_vat_records, '匯入營業稅申報記錄', 'booking:vat_record_list')
 
 
 def vat_record_create(request):
@@ -432,16 +652,50 @@ def vat_record_delete(request, pk):
 
 # ==================== 所得稅申報相關視圖 ====================
 
+INCOME_TAX_TABLE_COLUMNS = [
+    DataTableColumn('company_id', 'company_id'),
+    DataTableColumn('company_name', 'company_name'),
+    DataTableColumn('bookkeeping_assistant', 'bookkeeping_assistant', lambda c: c.bookkeeping_assistant or '—'),
+    DataTableColumn('business_type', 'business_type', lambda c: c.get_business_type_display()),
+    DataTableColumn('undertaking_status', 'undertaking_status', _undertaking_status_badge),
+    DataTableColumn('actions', render=lambda c: _edit_button(
+        reverse('booking:income_tax_edit_by_customer', args=[c.pk])
+    )),
+]
+
+
 def income_tax_list(request):
-    """所得稅申報記錄列表視圖"""
-    # 查詢所有客戶
-    customers = BookingCustomer.objects.all()
+    """所得稅申報記錄列表視圖（資料由 income_tax_list_data 分頁載入）"""
+    return render(request, 'booking/income_tax_list.html')
+
+
+def income_tax_list_data(request):
+    """API: 所得稅客戶列表 DataTables 伺服器端分頁資料"""
+    return datatables_response(
+        request, BookingCustomer.objects.all(), INCOME_TAX_TABLE_COLUMNS,
+        search_fields=VAT_SEARCH_FIELDS,
+        default_ordering=['company_name']
+    )
+
+
+INCOME_TAX_EXPORT_COLUMNS = RECORD_CUSTOMER_EXPORT_COLUMNS + model_export_columns(
+    IncomeTaxRecord, exclude=('id', 'customer')
+)
+
+
+def income_tax_export(request):
+    """匯出所得稅申報記錄（CSV / XLSX 串流下載，沿用列表的搜尋條件）"""
+    export_format = _export_format(request)
+    if not export_format:
+        return _unsupported_export_format()
     
-    # 不使用 Django 分頁，讓 DataTables 處理
-    context = {
-        'customers': customers,
-    }
-    return render(request, 'booking/income_tax_list.html', context)
+    customers = apply_search(BookingCustomer.objects.all(), request.GET.get('search'), VAT_SEARCH_FIELDS)
+    records = IncomeTaxRecord.objects.filter(customer__in=customers.values('pk')).order_by(
+        'customer__company_name', '-filing_year', 'pk'
+    )
+    
+    filename = f"所得稅申報記錄_{timezone.localdate():%Y%m%d}"
+    return export_response(records, INCOME_TAX_EXPORT_COLUMNS, filename, export_format)
 
 
 def income_tax_edit_by_customer(request, customer_id):
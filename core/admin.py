@@ -1,3 +1,36 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import LineNotification, OutboundEmail
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['requeue']
+
+    @admin.action(description='重新排入寄送佇列')
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status=OutboundEmail.Status.SENT).update(
+            status=OutboundEmail.Status.PENDING, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"已重新排入 {updated} 封郵件。")
+
+
+@admin.register(LineNotification)
+class LineNotificationAdmin(admin.ModelAdmin):
+    list_display = ('target', 'text', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('target', 'source')
+    readonly_fields = ('source', 'attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['requeue']
+
+    @admin.action(description='重新排入發送佇列')
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status=LineNotification.Status.SENT).update(
+            status=LineNotification.Status.PENDING, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"已重新排入 {updated} 則通知。")
@@ -0,0 +1,114 @@
+"""
+Bulk synchronisation of ordered child rows
+
+Line-item forms post the full list of rows on every save. Instead of
+deleting every child and inserting them again one by one, the posted rows
+are diffed against the stored ones by position and written with at most one
+bulk_update, one bulk_create and one targeted delete.
+"""
+import json
+
+from django.db import transaction
+
+BATCH_SIZE = 500
+
+
+def _normalise(model, values):
+    """Convert posted values to their Python field types (keyed by attname)."""
+    normalised = {}
+    for name, value in values.items():
+        field = model._meta.get_field(name)
+        normalised[field.attname] = field.to_python(value)
+    return normalised
+
+
+def posted_item_rows(items, convert):
+    """
+    Turn the line-item JSON strings posted by an item form into the
+    (order, values) pairs sync_ordered_items expects.
+
+    Args:
+        items: Posted JSON strings, e.g. request.POST.getlist('items')
+        convert: Callable mapping one decoded item dict to field values
+
+    Returns:
+        List of (order, values) pairs; empty strings are skipped but keep
+        their position
+    """
+    return [
+        (order, convert(json.loads(item_json)))
+        for order, item_json in enumerate(items)
+        if item_json
+    ]
+
+
+def sync_ordered_items(model, parent_field, parent, rows, order_field='order'):
+    """
+    Make the children of parent match rows.
+
+    Rows are matched to stored children by their order value: a stored child
+    with the same order is updated only when a value changed, missing orders
+    are created and stored children whose order is no longer posted are
+    deleted.
+
+    Args:
+        model: Child model class (e.g. IncomingMailItem)
+        parent_field: Name of the ForeignKey to the parent (e.g. 'incoming_mail')
+        parent: Parent instance
+        rows: Iterable of (order, values) pairs; values is a dict of field
+              name -> posted value
+        order_field: Name of the ordering field on the child model
+
+    Returns:
+        dict: {'created': int, 'updated': int, 'deleted': int}
+    """
+    parent_attname = model._meta.get_field(parent_field).attname
+    order_attname = model._meta.get_field(order_field).attname
+
+    with transaction.atomic():
+        existing = {}
+        stale_pks = []
+        children = model.objects.filter(**{parent_field: parent}).order_by(order_field, 'pk')
+        for child in children.select_for_update():
+            order = getattr(child, order_attname)
+            if order in existing:
+                # 同一順序重複的舊資料直接移除
+                stale_pks.append(child.pk)
+            else:
+                existing[order] = child
+
+        to_create = []
+        to_update = []
+        changed_fields = set()
+
+        for order, values in rows:
+            values = _normalise(model, values)
+            child = existing.pop(order, None)
+            if child is None:
+                to_create.append(model(
+                    **{parent_attname: parent.pk, order_attname: order},
+                    **values
+                ))
+                continue
+
+            changed = [name for name, value in values.items() if getattr(child, name) != value]
+            if changed:
+                for name in changed:
+                    setattr(child, name, values[name])
+                changed_fields.update(changed)
+                to_update.append(child)
+
+        stale_pks.extend(child.pk for child in existing.values())
+
+        if stale_pks:
+            model.objects.filter(pk__in=stale_pks).delete()
+        if to_update:
+            model.objects.bulk_update(to_update, sorted(changed_fields), batch_size=BATCH_SIZE)
+        if to_create:
+            model.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'deleted': len(stale_pks),
+    }
@@ -0,0 +1,103 @@
+"""
+Server-side DataTables protocol helper
+
+Paging, ordering and global search are applied to the queryset in the
+database; only the visible window of rows is rendered.
+See https://datatables.net/manual/server-side
+"""
+from django.db.models import Q
+from django.http import JsonResponse
+
+MAX_PAGE_LENGTH = 500
+
+
+class DataTableColumn:
+    """
+    One DataTables column.
+
+    Args:
+        data: JSON key of the column in each row (matches `columns.data` in JS)
+        order_field: Model field used for ordering; None makes the column unsortable
+        render: Callable(obj) returning the cell value (default: getattr(obj, data))
+    """
+
+    def __init__(self, data, order_field=None, render=None):
+        self.data = data
+        self.order_field = order_field
+        self.render = render or (lambda obj: getattr(obj, data))
+
+
+def _int_param(params, name, default):
+    try:
+        return int(params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def apply_search(queryset, search_value, search_fields):
+    """Filter queryset to rows where any of search_fields contains search_value."""
+    search_value = (search_value or '').strip()
+    if not search_value or not search_fields:
+        return queryset
+    search_q = Q()
+    for field in search_fields:
+        search_q |= Q(**{f'{field}__icontains': search_value})
+    return queryset.filter(search_q)
+
+
+def datatables_response(request, queryset, columns, search_fields=(), default_ordering=('pk',)):
+    """
+    Answer a DataTables server-side request for a queryset.
+
+    Args:
+        request: HttpRequest carrying the DataTables GET parameters
+        queryset: Queryset already narrowed by the page's filter form
+        columns: List of DataTableColumn in the same order as the table
+        search_fields: Fields matched with icontains against the search box
+        default_ordering: Ordering when the request sends none; 'pk' is always
+                          appended as a tiebreaker so pages are stable
+
+    Returns:
+        JsonResponse: {'draw', 'recordsTotal', 'recordsFiltered', 'data'}
+    """
+    params = request.GET
+    draw = _int_param(params, 'draw', 0)
+    start = max(_int_param(params, 'start', 0), 0)
+    length = _int_param(params, 'length', 25)
+    if length <= 0 or length > MAX_PAGE_LENGTH:
+        length = MAX_PAGE_LENGTH
+
+    records_total = queryset.count()
+
+    # 全域搜尋
+    filtered = apply_search(queryset, params.get('search[value]'), search_fields)
+    if filtered is not queryset:
+        records_filtered = filtered.count()
+    else:
+        records_filtered = records_total
+
+    # 排序
+    ordering = []
+    i = 0
+    while f'order[{i}][column]' in params:
+        index = _int_param(params, f'order[{i}][column]', -1)
+        if 0 <= index < len(columns) and columns[index].order_field:
+            prefix = '-' if params.get(f'order[{i}][dir]') == 'desc' else ''
+            ordering.append(f'{prefix}{columns[index].order_field}')
+        i += 1
+    if not ordering:
+        ordering = list(default_ordering)
+    if 'pk' not in ordering and '-pk' not in ordering:
+        ordering.append('pk')
+
+    page = filtered.order_by(*ordering)[start:start + length]
+
+    return JsonResponse({
+        'draw': draw,
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': [
+            {column.data: column.render(obj) for column in columns}
+            for obj in page
+        ],
+    })
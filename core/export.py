@@ -0,0 +1,242 @@
+"""
+Streaming CSV / XLSX export
+
+Rows are read with values_list().iterator(chunk_size=...) and written out
+through a generator behind a StreamingHttpResponse, so memory stays flat
+however many rows a filtered queryset holds.
+
+CSV is written with a UTF-8 BOM so Excel opens the Chinese headers
+correctly. XLSX is produced without third-party packages: the workbook is
+a zip written to an unseekable buffer (zipfile then emits data
+descriptors), with the worksheet XML streamed one row at a time and
+strings stored inline.
+"""
+import csv
+import io
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# XML 1.0 不允許的控制字元
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class ExportColumn:
+    """
+    One export column.
+
+    Args:
+        header: Column title in the first row
+        lookup: Field lookup read with values_list() (e.g. 'customer__company_name')
+        choices: Optional {value: label} shown instead of the stored value
+    """
+
+    def __init__(self, header, lookup, choices=None):
+        self.header = header
+        self.lookup = lookup
+        self.choices = choices
+
+
+def model_export_columns(model, exclude=()):
+    """
+    ExportColumn for every concrete field of model, titled by verbose_name;
+    choice fields export their labels and foreign keys their ID.
+    """
+    columns = []
+    for field in model._meta.concrete_fields:
+        if field.name in exclude:
+            continue
+        lookup = field.attname if isinstance(field, models.ForeignKey) else field.name
+        choices = {value: str(label) for value, label in field.flatchoices} if field.choices else None
+        columns.append(ExportColumn(str(field.verbose_name), lookup, choices))
+    return columns
+
+
+def _is_datetime(model, lookup):
+    """Whether a values_list() lookup ends on a DateTimeField."""
+    field = None
+    for part in lookup.split('__'):
+        if field is not None:
+            model = field.related_model
+        field = model._meta.get_field(part)
+    return isinstance(field, models.DateTimeField)
+
+
+def _rows(queryset, columns, chunk_size):
+    """
+    Yield lists of rows, chunk_size rows at a time, with choice labels
+    substituted and datetimes formatted in the current time zone.
+    """
+    values = queryset.values_list(*[column.lookup for column in columns])
+    choice_columns = [(index, column.choices) for index, column in enumerate(columns) if column.choices]
+    datetime_columns = [
+        index for index, column in enumerate(columns) if _is_datetime(queryset.model, column.lookup)
+    ]
+    tz = timezone.get_current_timezone()
+
+    batch = []
+    for row in values.iterator(chunk_size=chunk_size):
+        if choice_columns or datetime_columns:
+            row = list(row)
+            for index, choices in choice_columns:
+                row[index] = choices.get(row[index], row[index])
+            for index in datetime_columns:
+                value = row[index]
+                if value is not None:
+                    if value.tzinfo is not None:
+                        value = value.astimezone(tz)
+                    row[index] = value.strftime('%Y-%m-%d %H:%M:%S')
+        batch.append(row)
+        if len(batch) == chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_chunks(queryset, columns, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # csv 模組將 None 寫成空字串，日期為 ISO 格式
+    writer.writerow([column.header for column in columns])
+    yield '\ufeff' + buffer.getvalue()
+    for batch in _rows(queryset, columns, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+class _ChunkBuffer:
+    """Unseekable write target collecting zip output until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    kind = type(value)
+    if kind is bool:
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if kind in (int, float, Decimal):
+        return f'<c><v>{value}</v></c>'
+    text = value if kind is str else str(value)
+    text = escape(_ILLEGAL_XML_CHARS.sub('', text))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join([_xlsx_cell(value) for value in values]) + '</row>'
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_chunks(queryset, columns, chunk_size):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        yield buffer.drain()
+
+        # 工作表大小事先未知，force_zip64 讓超過 2 GB 時仍可寫入
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row([column.header for column in columns]).encode())
+            for batch in _rows(queryset, columns, chunk_size):
+                sheet.write(''.join([_xlsx_row(row) for row in batch]).encode())
+                yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def export_response(queryset, columns, filename, export_format='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Stream queryset as a CSV or XLSX download.
+
+    Args:
+        queryset: Queryset already narrowed by the page's filters and ordered
+        columns: List of ExportColumn
+        filename: Download name without extension
+        export_format: 'csv' or 'xlsx'
+        chunk_size: Rows fetched from the database cursor per round trip
+
+    Returns:
+        StreamingHttpResponse
+
+    Raises:
+        ValueError: If export_format is not supported
+    """
+    if export_format == 'csv':
+        content_type = 'text/csv; charset=utf-8'
+        chunks = _csv_chunks(queryset, columns, chunk_size)
+    elif export_format == 'xlsx':
+        content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        chunks = _xlsx_chunks(queryset, columns, chunk_size)
+    else:
+        raise ValueError(f'Unsupported export format: {export_format}')
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = content_disposition_header(True, f'{filename}.{export_format}')
+    return response
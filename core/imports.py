@@ -0,0 +1,395 @@
+"""
+Chunked spreadsheet import
+
+read_spreadsheet() streams the rows of an uploaded CSV or XLSX file (the
+worksheet XML is parsed incrementally, so the file is never loaded whole);
+bulk_import() validates them IMPORT_CHUNK_SIZE rows at a time against the
+model field rules and upserts each chunk with one
+bulk_create(update_conflicts=True) on the model's unique key.
+
+Headers may be field names or verbose_names, so files produced by
+core.export can be edited and imported back. Rows that fail validation are
+reported with their spreadsheet row number and skipped; the other rows of
+the chunk are still written.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime, timedelta
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+
+IMPORT_CHUNK_SIZE = 500
+
+_SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_CELL_REF = re.compile(r'([A-Z]+)')
+# Excel 日期序號的起點
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+# ==================== 讀取檔案 ====================
+
+def _detect_encoding(stream):
+    """UTF-8 (with or without BOM), else Big5 (cp950) as saved by Excel on Traditional Chinese Windows."""
+    sample = stream.read(65536)
+    stream.seek(0)
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as exc:
+        # 取樣截斷在多位元組字元中間時仍視為 UTF-8
+        if exc.start < len(sample) - 3:
+            return 'cp950'
+    return 'utf-8-sig'
+
+
+def _csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding=_detect_encoding(stream), newline='')
+    try:
+        for number, row in enumerate(csv.reader(text), 1):
+            yield number, row
+    except UnicodeDecodeError as exc:
+        raise ValueError('無法辨識 CSV 檔案的文字編碼') from exc
+    finally:
+        # 不關閉呼叫端的檔案
+        text.detach()
+
+
+def _column_index(ref):
+    letters = _CELL_REF.match(ref).group(1)
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _shared_strings(workbook):
+    if 'xl/sharedStrings.xml' not in workbook.namelist():
+        return []
+    strings = []
+    with workbook.open('xl/sharedStrings.xml') as stream:
+        for _, elem in ElementTree.iterparse(stream):
+            if elem.tag == f'{_SHEET_NS}si':
+                strings.append(''.join(text.text or '' for text in elem.iter(f'{_SHEET_NS}t')))
+                elem.clear()
+    return strings
+
+
+def _first_sheet(workbook):
+    """Path of the first worksheet, following the workbook relationships."""
+    root = ElementTree.fromstring(workbook.read('xl/workbook.xml'))
+    sheet = root.find(f'{_SHEET_NS}sheets/{_SHEET_NS}sheet')
+    rel_id = sheet.get(f'{_REL_NS}id')
+    rels = ElementTree.fromstring(workbook.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iter(f'{_PACKAGE_REL_NS}Relationship'):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            return target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+    raise ValueError('找不到工作表')
+
+
+def _cell_value(cell, shared):
+    kind = cell.get('t')
+    if kind == 'inlineStr':
+        return ''.join(text.text or '' for text in cell.iter(f'{_SHEET_NS}t'))
+    value = cell.find(f'{_SHEET_NS}v')
+    if value is None or value.text is None:
+        return ''
+    if kind == 's':
+        return shared[int(value.text)]
+    if kind == 'b':
+        return 'TRUE' if value.text == '1' else 'FALSE'
+    return value.text
+
+
+def _xlsx_rows(stream):
+    try:
+        workbook = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile as exc:
+        raise ValueError('無法讀取 Excel 檔案') from exc
+
+    with workbook:
+        shared = _shared_strings(workbook)
+        with workbook.open(_first_sheet(workbook)) as sheet:
+            sheet_data = None
+            number = 0
+            for event, elem in ElementTree.iterparse(sheet, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == f'{_SHEET_NS}sheetData':
+                        sheet_data = elem
+                    continue
+                if elem.tag != f'{_SHEET_NS}row':
+                    continue
+                number = int(elem.get('r') or number + 1)
+                values = []
+                for cell in elem.iter(f'{_SHEET_NS}c'):
+                    ref = cell.get('r')
+                    index = _column_index(ref) if ref else len(values)
+                    values.extend([''] * (index - len(values)))
+                    values.append(_cell_value(cell, shared))
+                yield number, values
+                # 已處理的列自樹中移除，記憶體不隨列數成長
+                sheet_data.clear()
+
+
+def read_spreadsheet(stream, filename):
+    """
+    Stream the rows of a CSV or XLSX file.
+
+    Args:
+        stream: Seekable binary file object (e.g. an UploadedFile)
+        filename: Original file name; the extension selects the format
+
+    Returns:
+        Iterator of (row number, list of cell strings), the header row first
+
+    Raises:
+        ValueError: If the format is not supported or the file is unreadable
+    """
+    name = filename.lower()
+    if name.endswith('.csv'):
+        return _csv_rows(stream)
+    if name.endswith('.xlsx'):
+        return _xlsx_rows(stream)
+    raise ValueError('僅支援 CSV 或 XLSX 檔案')
+
+
+# ==================== 欄位轉換 ====================
+
+def _import_fields(model, exclude):
+    """{header: field} for the editable fields of model, by name and verbose_name."""
+    fields = {}
+    for field in model._meta.concrete_fields:
+        if field.primary_key or not field.editable or field.name in exclude:
+            continue
+        for header in (field.name, field.attname, str(field.verbose_name)):
+            fields.setdefault(header, field)
+    return fields
+
+
+def _choice_values(field):
+    """{accepted text: stored value} for a choice field (values and labels)."""
+    values = {}
+    for value, label in field.flatchoices:
+        values[str(value)] = value
+        values.setdefault(str(label), value)
+        # Excel 會去掉數字代碼的前導零，如期別 01 -> 1
+        if isinstance(value, str) and value.isdigit():
+            values.setdefault(str(int(value)), value)
+    return values
+
+
+def _excel_serial(text):
+    try:
+        return _EXCEL_EPOCH + timedelta(days=float(text))
+    except (ValueError, OverflowError):
+        return None
+
+
+def _convert(field, text, choices):
+    """
+    Spreadsheet text -> Python value checked against the field rules.
+
+    Raises:
+        ValidationError: If the value is not valid for the field
+    """
+    text = text.strip()
+    if text == '':
+        value = None if field.null else ''
+        field.validate(value, None)
+        return value
+
+    if choices is not None:
+        text = choices.get(text, text)
+    elif isinstance(field, (models.IntegerField, models.DecimalField, models.FloatField)):
+        # 允許千分位逗號
+        text = text.replace(',', '')
+    elif isinstance(field, (models.DateField, models.DateTimeField)) and text.replace('.', '', 1).isdigit():
+        # Excel 儲存格的日期為序號
+        serial = _excel_serial(text)
+        if serial is not None:
+            text = serial if isinstance(field, models.DateTimeField) else serial.date()
+
+    value = field.clean(text, None)
+    if isinstance(value, datetime) and settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _error_text(exc):
+    return '；'.join(exc.messages)
+
+
+# ==================== 匯入 ====================
+
+def _existing_keys(model, unique_fields, keys):
+    """Keys of the chunk already stored, read with one query."""
+    attnames = [model._meta.get_field(name).attname for name in unique_fields]
+    filters = {
+        f'{attname}__in': {key[index] for key in keys}
+        for index, attname in enumerate(attnames)
+    }
+    return set(model._default_manager.filter(**filters).values_list(*attnames))
+
+
+def _write_chunk(model, chunk, unique_fields, update_fields, result):
+    """Validate required fields of new rows and upsert the chunk."""
+    keys = [key for _, key, _ in chunk]
+    existing = _existing_keys(model, unique_fields, keys) if keys else set()
+
+    instances = []
+    for number, key, instance in chunk:
+        if key not in existing:
+            missing = [
+                str(field.verbose_name) for field in model._meta.concrete_fields
+                if field.editable and not field.blank and not field.has_default()
+                and not field.primary_key and getattr(instance, field.attname) in (None, '')
+            ]
+            if missing:
+                result['errors'].append((number, f"新增資料缺少必填欄位：{'、'.join(missing)}"))
+                continue
+            result['created'] += 1
+        else:
+            result['updated'] += 1
+        instances.append(instance)
+
+    if not instances:
+        return
+    with transaction.atomic():
+        if update_fields:
+            model._default_manager.bulk_create(
+                instances, update_conflicts=True,
+                unique_fields=unique_fields, update_fields=update_fields
+            )
+        else:
+            model._default_manager.bulk_create(instances, ignore_conflicts=True)
+
+
+def bulk_import(model, stream, filename, unique_fields, lookups=None, validate=None,
+                exclude=(), chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import a CSV / XLSX file into model, upserting on unique_fields.
+
+    Args:
+        model: Model class
+        stream: Seekable binary file object
+        filename: Original file name (.csv or .xlsx)
+        unique_fields: Field names of the unique key used for the upsert
+        lookups: {header: (field name, resolver)} for foreign keys given by a
+                 natural key; resolver(set of cell texts) returns
+                 {cell text: related object}, called once per chunk
+        validate: Optional callable(instance) returning an error message or
+                  None, for rules beyond the field definitions
+        exclude: Field names that cannot be imported
+        chunk_size: Rows validated and written per batch
+
+    Returns:
+        dict: {'created', 'updated': int, 'errors': [(row number, message)],
+               'ignored_columns': [header]}
+
+    Raises:
+        ValueError: If the file cannot be read or a key column is missing
+    """
+    lookups = lookups or {}
+    rows = read_spreadsheet(stream, filename)
+    try:
+        _, headers = next(rows)
+    except StopIteration:
+        raise ValueError('檔案沒有資料')
+
+    fields = _import_fields(model, exclude)
+    columns = []
+    ignored = []
+    for header in (header.strip() for header in headers):
+        if header in lookups:
+            columns.append(('lookup', header, model._meta.get_field(lookups[header][0])))
+        elif header in fields:
+            field = fields[header]
+            choices = _choice_values(field) if field.choices else None
+            columns.append(('field', header, field, choices))
+        else:
+            columns.append(None)
+            if header:
+                ignored.append(header)
+
+    imported = [column[2].name for column in columns if column]
+    if len(set(imported)) != len(imported):
+        raise ValueError('檔案中有重複對應到同一欄位的標題')
+    missing = [name for name in unique_fields if name not in imported]
+    if missing:
+        raise ValueError('缺少必要欄位：' + '、'.join(
+            str(model._meta.get_field(name).verbose_name) for name in missing
+        ))
+
+    auto_now = [
+        field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)
+    ]
+    update_fields = [name for name in imported if name not in unique_fields] + [
+        name for name in auto_now if name not in imported
+    ]
+
+    result = {'created': 0, 'updated': 0, 'errors': [], 'ignored_columns': ignored}
+    seen = {}
+
+    def process(batch):
+        # 每個 lookup 欄位整批查詢一次
+        resolved = {}
+        for index, column in enumerate(columns):
+            if column and column[0] == 'lookup':
+                texts = {row[index].strip() for _, row in batch if index < len(row) and row[index].strip()}
+                resolved[index] = lookups[column[1]][1](texts) if texts else {}
+
+        chunk = []
+        for number, row in batch:
+            values = {}
+            errors = []
+            for index, column in enumerate(columns):
+                if not column:
+                    continue
+                text = row[index] if index < len(row) else ''
+                if column[0] == 'lookup':
+                    text = text.strip()
+                    related = resolved[index].get(text)
+                    if related is None:
+                        errors.append(f'{column[1]}：找不到「{text}」' if text else f'{column[1]}：必填')
+                    values[column[2].name] = related
+                else:
+                    try:
+                        values[column[2].name] = _convert(column[2], text, column[3])
+                    except ValidationError as exc:
+                        errors.append(f'{column[1]}：{_error_text(exc)}')
+            if errors:
+                result['errors'].append((number, '；'.join(errors)))
+                continue
+
+            instance = model(**values)
+            key = tuple(getattr(instance, model._meta.get_field(name).attname) for name in unique_fields)
+            if key in seen:
+                result['errors'].append((number, f'與第 {seen[key]} 列重複'))
+                continue
+            message = validate(instance) if validate else None
+            if message:
+                result['errors'].append((number, message))
+                continue
+            seen[key] = number
+            chunk.append((number, key, instance))
+
+        _write_chunk(model, chunk, unique_fields, update_fields, result)
+
+    batch = []
+    for number, row in rows:
+        if not any(cell.strip() for cell in row):
+            continue
+        batch.append((number, row))
+        if len(batch) == chunk_size:
+            process(batch)
+            batch = []
+    if batch:
+        process(batch)
+    return result
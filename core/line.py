@@ -0,0 +1,389 @@
+"""
+Queued LINE push notifications
+
+queue_line_message() stores a notification in LineNotification; after
+commit a single background worker drains the queue through the Messaging
+API over one kept-alive HTTP connection:
+
+- pending notifications for the same target (a customer's room / LINE ID)
+  are merged into one request of up to 5 text messages;
+- user IDs that receive identical messages are sent with one multicast
+  (up to 500 recipients) instead of one push each;
+- on 429 the batch stops and the unsent notifications are retried after
+  Retry-After (or an exponential backoff); 5xx and network errors are
+  retried with backoff, other 4xx replies fail.
+
+Every request carries an X-Line-Retry-Key that is stored on its
+notifications before the request is sent. Notifications that already have
+a key are re-sent as the same request with the same key, so a retry after
+a timeout or dropped connection is answered with 409 by LINE instead of
+being delivered twice. LINE_API_BASE_URL can point at a local
+HTTP stub of the Messaging API for testing; the send_line_notifications
+command sweeps the queue from cron and reports throughput.
+"""
+import json
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import LineNotification
+
+logger = logging.getLogger(__name__)
+
+LINE_API_BASE_URL = getattr(settings, 'LINE_API_BASE_URL', 'https://api.line.me')
+BATCH_SIZE = 500
+MULTICAST_LIMIT = 500
+MAX_MESSAGES = 5
+MAX_TEXT_LENGTH = 5000
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+SENDING_LEASE = timedelta(minutes=10)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='line-push')
+_wakeup = threading.Event()
+
+
+def line_target(obj):
+    """
+    LINE target of a customer / case: the room ID when set, else the LINE ID.
+
+    Works for BasicInformation (room_id, LineId), BookingCustomer (line_id)
+    and RegistrationProgress (room_id, line_id).
+    """
+    for attr in ('room_id', 'line_id', 'LineId'):
+        value = (getattr(obj, attr, None) or '').strip()
+        if value:
+            return value
+    return ''
+
+
+def queue_line_message(target, text, source=None):
+    """
+    Queue a LINE notification for background delivery.
+
+    Args:
+        target: LINE userId / roomId / groupId
+        text: Message text
+        source: Optional unique source key (e.g. 'incoming_mail_item:12');
+                a second notification with the same key is ignored
+
+    Returns:
+        LineNotification, or None if source was already queued
+    """
+    try:
+        with transaction.atomic():
+            notification = LineNotification.objects.create(target=target, text=text, source=source)
+    except IntegrityError:
+        return None
+    transaction.on_commit(wake_worker)
+    return notification
+
+
+def queue_line_messages(notifications):
+    """
+    Queue several notifications with one INSERT.
+
+    Args:
+        notifications: Iterable of (target, text, source) tuples; rows whose
+                       source is already queued are skipped
+
+    Returns:
+        int: number of notifications passed in
+    """
+    rows = [LineNotification(target=target, text=text, source=source) for target, text, source in notifications]
+    if rows:
+        LineNotification.objects.bulk_create(rows, ignore_conflicts=True)
+        transaction.on_commit(wake_worker)
+    return len(rows)
+
+
+def wake_worker():
+    """Schedule a dispatch run unless one is already waiting."""
+    if not _wakeup.is_set():
+        _wakeup.set()
+        _executor.submit(_run_in_worker)
+
+
+def _run_in_worker():
+    # 先清除旗標：處理期間新進的通知會再排一次
+    _wakeup.clear()
+    try:
+        while True:
+            result = dispatch_pending()
+            if not result['claimed'] or result['rate_limited']:
+                break
+    except Exception:
+        logger.exception('LINE dispatch failed')
+    finally:
+        connections.close_all()
+
+
+class LineClient:
+    """Messaging API client keeping one HTTP connection open."""
+
+    def __init__(self, access_token, base_url=None, timeout=10):
+        parts = urlsplit(base_url or LINE_API_BASE_URL)
+        self._connection_class = HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+        self._host = parts.netloc
+        self._prefix = parts.path.rstrip('/')
+        self._timeout = timeout
+        self._connection = None
+        self._access_token = access_token
+
+    def post(self, path, payload, retry_key):
+        """
+        POST a JSON payload.
+
+        Returns:
+            tuple: (HTTP status, Retry-After header or None, response body)
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = {
+            'Authorization': f'Bearer {self._access_token}',
+            'Content-Type': 'application/json',
+            'X-Line-Retry-Key': retry_key,
+        }
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = self._connection_class(self._host, timeout=self._timeout)
+            try:
+                self._connection.request('POST', self._prefix + path, body, headers)
+                response = self._connection.getresponse()
+                return response.status, response.getheader('Retry-After'), response.read()
+            except (HTTPException, OSError):
+                # keep-alive 連線被關閉時重連一次；Retry Key 確保不會重複發送
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def _access_token():
+    from master.models import SystemParameter
+    return SystemParameter.load().line_access_token
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        notifications = list(
+            LineNotification.objects.select_for_update(skip_locked=True).filter(
+                status__in=[LineNotification.Status.PENDING, LineNotification.Status.SENDING],
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        if notifications:
+            LineNotification.objects.filter(pk__in=[n.pk for n in notifications]).update(
+                status=LineNotification.Status.SENDING,
+                next_attempt_at=now + SENDING_LEASE,
+                attempts=F('attempts') + 1
+            )
+    return notifications
+
+
+def _pack(texts):
+    """
+    Pack texts into at most MAX_MESSAGES text messages.
+
+    Returns:
+        tuple: (list of message texts, number of texts included)
+    """
+    messages = []
+    used = 0
+    for text in texts:
+        text = text[:MAX_TEXT_LENGTH]
+        if messages and len(messages[-1]) + 2 + len(text) <= MAX_TEXT_LENGTH:
+            messages[-1] = f'{messages[-1]}\n\n{text}'
+        elif len(messages) < MAX_MESSAGES:
+            messages.append(text)
+        else:
+            break
+        used += 1
+    return messages, used
+
+
+def _build_requests(notifications):
+    """
+    Group notifications into Messaging API requests.
+
+    Returns:
+        tuple: (list of (path, payload, notifications), notifications left
+                for the next batch)
+    """
+    by_target = defaultdict(list)
+    resend = defaultdict(list)
+    for notification in sorted(notifications, key=lambda n: (n.created_at, n.pk)):
+        if notification.retry_key:
+            # 曾送出過（結果不明）的通知，依原 Retry Key 重組同一請求
+            resend[notification.retry_key].append(notification)
+        else:
+            by_target[notification.target].append(notification)
+
+    requests = [(*_resend_request(rows), rows) for rows in resend.values()]
+    leftover = []
+    multicast = defaultdict(list)
+    for target, rows in by_target.items():
+        texts, used = _pack([row.text for row in rows])
+        leftover.extend(rows[used:])
+        messages = [{'type': 'text', 'text': text} for text in texts]
+        if target.startswith('U'):
+            # 只有 userId 可用 multicast，內容相同者合併為一次請求
+            multicast[json.dumps(messages, ensure_ascii=False)].append((target, rows[:used]))
+        else:
+            requests.append(('/v2/bot/message/push', {'to': target, 'messages': messages}, rows[:used]))
+
+    for key, members in multicast.items():
+        messages = json.loads(key)
+        if len(members) == 1:
+            target, rows = members[0]
+            requests.append(('/v2/bot/message/push', {'to': target, 'messages': messages}, rows))
+            continue
+        for start in range(0, len(members), MULTICAST_LIMIT):
+            chunk = members[start:start + MULTICAST_LIMIT]
+            requests.append((
+                '/v2/bot/message/multicast',
+                {'to': [target for target, _ in chunk], 'messages': messages},
+                [row for _, rows in chunk for row in rows]
+            ))
+    return requests, leftover
+
+
+def _resend_request(rows):
+    """
+    Rebuild the request of notifications that share a retry key.
+
+    Returns:
+        tuple: (path, payload)
+    """
+    texts = defaultdict(list)
+    for row in rows:
+        texts[row.target].append(row.text)
+    messages = {
+        target: [{'type': 'text', 'text': text} for text in _pack(target_texts)[0]]
+        for target, target_texts in texts.items()
+    }
+    if len(messages) == 1:
+        target, target_messages = next(iter(messages.items()))
+        return '/v2/bot/message/push', {'to': target, 'messages': target_messages}
+    # 多個對象只會來自 multicast，訊息內容相同
+    return '/v2/bot/message/multicast', {'to': list(messages), 'messages': next(iter(messages.values()))}
+
+
+def _assign_retry_keys(requests):
+    """Give every new request a retry key and store it before anything is sent."""
+    keyed = []
+    for _, _, rows in requests:
+        if rows[0].retry_key is None:
+            retry_key = uuid.uuid4()
+            for row in rows:
+                row.retry_key = retry_key
+            keyed.extend(rows)
+    if keyed:
+        LineNotification.objects.bulk_update(keyed, ['retry_key'], batch_size=BATCH_SIZE)
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def _reschedule(rows, error, now, result, delay=None, permanent=False):
+    """Mark rows for retry with backoff (or after delay), or as failed."""
+    for row in rows:
+        # row 為認領前讀出的資料，attempts 需加上這次
+        attempts = row.attempts + 1
+        if permanent or (delay is None and attempts >= MAX_ATTEMPTS):
+            values = {'status': LineNotification.Status.FAILED}
+            result['failed'] += 1
+        else:
+            values = {
+                'status': LineNotification.Status.PENDING,
+                'next_attempt_at': now + (delay if delay is not None else _retry_delay(attempts)),
+            }
+            if delay is not None:
+                # 被限流不算一次失敗
+                values['attempts'] = row.attempts
+            result['retry'] += 1
+        LineNotification.objects.filter(pk=row.pk).update(last_error=error[:1000], **values)
+
+
+def dispatch_pending(batch_size=BATCH_SIZE, client=None):
+    """
+    Send one batch of due LINE notifications.
+
+    Args:
+        batch_size: Maximum number of notifications to claim
+        client: LineClient (default: one using SystemParameter.line_access_token)
+
+    Returns:
+        dict: {'claimed', 'requests', 'sent', 'retry', 'failed': int,
+               'rate_limited': bool}
+    """
+    result = {'claimed': 0, 'requests': 0, 'sent': 0, 'retry': 0, 'failed': 0, 'rate_limited': False}
+    if client is None:
+        token = _access_token()
+        if not token:
+            logger.warning('LINE access token is not configured; notifications stay queued')
+            return result
+        client = LineClient(token)
+
+    notifications = _claim_batch(batch_size)
+    result['claimed'] = len(notifications)
+    if not notifications:
+        return result
+
+    now = timezone.now()
+    requests, leftover = _build_requests(notifications)
+    if leftover:
+        # 超過單次請求上限的通知留待下一批
+        LineNotification.objects.filter(pk__in=[n.pk for n in leftover]).update(
+            status=LineNotification.Status.PENDING, next_attempt_at=now, attempts=F('attempts') - 1
+        )
+
+    _assign_retry_keys(requests)
+
+    sent_ids = []
+    try:
+        for index, (path, payload, rows) in enumerate(requests):
+            try:
+                status, retry_after, body = client.post(path, payload, str(rows[0].retry_key))
+            except (HTTPException, OSError) as exc:
+                _reschedule(rows, str(exc), now, result)
+                continue
+            result['requests'] += 1
+
+            # 409 表示同一 Retry Key 的請求已被接受
+            if 200 <= status < 300 or status == 409:
+                sent_ids.extend(row.pk for row in rows)
+            elif status == 429:
+                delay = timedelta(seconds=int(retry_after)) if (retry_after or '').isdigit() else _retry_delay(1)
+                remaining = [row for _, _, later in requests[index:] for row in later]
+                _reschedule(remaining, f'429 {body[:200]!r}', now, result, delay=delay)
+                result['rate_limited'] = True
+                break
+            elif status >= 500:
+                _reschedule(rows, f'{status} {body[:200]!r}', now, result)
+            else:
+                _reschedule(rows, f'{status} {body[:200]!r}', now, result, permanent=True)
+    finally:
+        client.close()
+        if sent_ids:
+            LineNotification.objects.filter(pk__in=sent_ids).update(
+                status=LineNotification.Status.SENT, sent_at=timezone.now(), last_error=''
+            )
+            result['sent'] = len(sent_ids)
+
+    return result
@@ -0,0 +1,183 @@
+"""
+Queued outbound email
+
+queue_mail() stores the message in OutboundEmail and returns immediately;
+after commit a single background worker drains the queue, sending each
+batch over one SMTP connection instead of one connection per send_mail().
+
+Transient failures (connection drops, 4xx replies) are retried with
+exponential backoff; permanent ones (refused recipients, 5xx replies) and
+messages out of attempts are marked failed. Claimed rows carry a lease in
+next_attempt_at, so rows left in SENDING by a crashed worker are picked up
+again. The send_queued_mail command sweeps the queue from cron.
+
+Any SMTP server works as the target. The benchmark_queued_mail command
+compares send_mail() per message with batched dispatch against a built-in
+local SMTP stand-in (or --host/--port) and rolls its queue rows back.
+"""
+import logging
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+SENDING_LEASE = timedelta(minutes=10)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='outbound-mail')
+_wakeup = threading.Event()
+
+
+def queue_mail(subject, body, recipients, from_email=None):
+    """
+    Queue an email for background delivery.
+
+    Args:
+        subject: Subject line
+        body: Plain-text body
+        recipients: List of recipient addresses
+        from_email: Sender (default: DEFAULT_FROM_EMAIL)
+
+    Returns:
+        OutboundEmail
+    """
+    email = OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or '',
+        recipients=list(recipients),
+    )
+    transaction.on_commit(wake_worker)
+    return email
+
+
+def wake_worker():
+    """Schedule a dispatch run unless one is already waiting."""
+    if not _wakeup.is_set():
+        _wakeup.set()
+        _executor.submit(_run_in_worker)
+
+
+def _run_in_worker():
+    # 先清除旗標：處理期間新進的郵件會再排一次
+    _wakeup.clear()
+    try:
+        while dispatch_pending()['claimed']:
+            pass
+    except Exception:
+        logger.exception('Outbound mail dispatch failed')
+    finally:
+        connections.close_all()
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+                status__in=[OutboundEmail.Status.PENDING, OutboundEmail.Status.SENDING],
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        if emails:
+            OutboundEmail.objects.filter(pk__in=[e.pk for e in emails]).update(
+                status=OutboundEmail.Status.SENDING,
+                next_attempt_at=now + SENDING_LEASE,
+                attempts=F('attempts') + 1
+            )
+    return emails
+
+
+def _is_permanent(exc):
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code >= 500
+    return False
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def _reschedule(email, exc, now, result):
+    """Mark a failed email for retry with backoff, or as failed."""
+    # email 為認領前讀出的資料，attempts 需加上這次
+    attempts = email.attempts + 1
+    if _is_permanent(exc) or attempts >= MAX_ATTEMPTS:
+        status, next_attempt_at = OutboundEmail.Status.FAILED, now
+        result['failed'] += 1
+    else:
+        status, next_attempt_at = OutboundEmail.Status.PENDING, now + _retry_delay(attempts)
+        result['retry'] += 1
+    OutboundEmail.objects.filter(pk=email.pk).update(
+        status=status, next_attempt_at=next_attempt_at, last_error=str(exc)[:1000]
+    )
+
+
+def dispatch_pending(batch_size=BATCH_SIZE, connection=None):
+    """
+    Send one batch of due emails over a single connection.
+
+    Args:
+        batch_size: Maximum number of emails to claim
+        connection: Email backend connection (default: get_connection())
+
+    Returns:
+        dict: {'claimed': int, 'sent': int, 'retry': int, 'failed': int}
+    """
+    emails = _claim_batch(batch_size)
+    result = {'claimed': len(emails), 'sent': 0, 'retry': 0, 'failed': 0}
+    if not emails:
+        return result
+
+    connection = connection or get_connection()
+    sent_ids = []
+    handled = set()
+    now = timezone.now()
+    try:
+        connection.open()
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email or None, email.recipients,
+                connection=connection
+            )
+            try:
+                # 連線已開啟，send_messages 不會在每封之後關閉連線
+                connection.send_messages([message])
+            except Exception as exc:
+                _reschedule(email, exc, now, result)
+                handled.add(email.pk)
+                if not _is_permanent(exc):
+                    # 連線可能已中斷，重新連線後繼續寄送其餘郵件
+                    connection.close()
+                    connection.open()
+            else:
+                sent_ids.append(email.pk)
+                handled.add(email.pk)
+    except Exception as exc:
+        # 無法連線：尚未處理的郵件稍後重試
+        logger.warning('SMTP connection failed: %s', exc)
+        for email in emails:
+            if email.pk not in handled:
+                _reschedule(email, exc, now, result)
+    finally:
+        connection.close()
+        if sent_ids:
+            OutboundEmail.objects.filter(pk__in=sent_ids).update(
+                status=OutboundEmail.Status.SENT, sent_at=timezone.now(), last_error=''
+            )
+            result['sent'] = len(sent_ids)
+
+    return result
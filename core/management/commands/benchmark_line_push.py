@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from core.line import BATCH_SIZE, LineClient, dispatch_pending, queue_line_messages
+from core.models import LineNotification
+
+
+class _LineStubHandler(BaseHTTPRequestHandler):
+    """最小的 Messaging API 替身：接受 push / multicast 並計數，超過限流門檻後回應 429"""
+
+    protocol_version = 'HTTP/1.1'
+    # 標頭與內容分兩次寫出，關閉 Nagle 以免保持連線時每個請求多等一次 delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            limited = server.rate_limit_after and server.requests > server.rate_limit_after
+            if not limited:
+                recipients = payload['to'] if isinstance(payload['to'], list) else [payload['to']]
+                server.recipients += len(recipients)
+                server.paths[self.path] = server.paths.get(self.path, 0) + 1
+        body = b'{"message":"rate limited"}' if limited else b'{}'
+        self.send_response(429 if limited else 200)
+        if limited:
+            self.send_header('Retry-After', '60')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _LineStub(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _LineStubHandler)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, rate_limit_after=0):
+        self.rate_limit_after = rate_limit_after
+        self.requests = 0
+        self.recipients = 0
+        self.paths = {}
+
+
+class Command(BaseCommand):
+    help = (
+        '量測 LINE 通知吞吐量：逐則 push（每則一個連線）與通知佇列批次發送（同一對象合併、相同內容 multicast、'
+        '保持連線）的比較。使用本機 Messaging API 替身；所有佇列寫入在結束時回滾，不會留下資料'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=300, help='群組（room）數（預設 300）')
+        parser.add_argument('--items', type=int, default=3, help='每個群組的通知數（預設 3）')
+        parser.add_argument('--users', type=int, default=500, help='收到同一則公告的使用者數（預設 500）')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE, help=f'佇列每批通知數（預設 {BATCH_SIZE}）'
+        )
+        parser.add_argument(
+            '--rate-limit-after', type=int, default=0,
+            help='替身在第幾個請求之後回應 429（Retry-After: 60），0 表示不限流'
+        )
+
+    def handle(self, *args, **options):
+        if min(options['rooms'], options['items'], options['users'], options['rate_limit_after']) < 0:
+            raise CommandError('--rooms、--items、--users 與 --rate-limit-after 不可為負數')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size 至少為 1')
+
+        notifications = [
+            (f'R{room:032d}', f'案件 {room} 進度更新第 {item + 1} 則', f'benchmark:{room}:{item}')
+            for room in range(options['rooms'])
+            for item in range(options['items'])
+        ] + [
+            (f'U{user:032d}', '本所將於下週一起調整服務時間', f'benchmark:announcement:{user}')
+            for user in range(options['users'])
+        ]
+        if not notifications:
+            raise CommandError('沒有任何通知可發送')
+
+        stub = _LineStub()
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        base_url = f'http://{stub.server_address[0]}:{stub.server_address[1]}'
+        try:
+            direct = self.direct(notifications, base_url)
+            direct_requests = stub.requests
+            # 限流只套用在佇列發送
+            stub.reset(options['rate_limit_after'])
+            with transaction.atomic():
+                dispatched, totals, batches = self.queued(notifications, base_url, options['batch_size'])
+                attempts = sorted(set(
+                    LineNotification.objects.filter(status=LineNotification.Status.PENDING)
+                    .values_list('attempts', flat=True)
+                ))
+                # 回滾佇列資料；交易未提交，背景發送程序也不會被喚醒
+                transaction.set_rollback(True)
+        finally:
+            stub.shutdown()
+            stub.server_close()
+
+        count = len(notifications)
+        self.stdout.write(f"{count} 則通知：{options['rooms']} 個群組 x {options['items']} 則、公告 {options['users']} 位使用者")
+        self.stdout.write(f'逐則 push：{direct:.2f} 秒，{direct_requests} 次請求，{count / direct:.1f} 則/秒')
+        self.stdout.write(self.style.SUCCESS(
+            f"佇列批次發送：送出 {totals['sent']} 則（{batches} 批，{totals['requests']} 次請求），"
+            f"{dispatched:.2f} 秒，{totals['sent'] / dispatched:.1f} 則/秒"
+        ))
+        self.stdout.write(f'  替身收到：{stub.paths}，收件對象 {stub.recipients} 個')
+        if totals['rate_limited']:
+            self.stdout.write(self.style.WARNING(
+                f"被限流：待重試 {totals['retry']} 則，其 attempts 為 {attempts}（限流不計入失敗次數）"
+            ))
+
+    def direct(self, notifications, base_url):
+        """原本的做法：每則通知各開一個連線 push 一次"""
+        started = time.perf_counter()
+        for target, text, _ in notifications:
+            client = LineClient('benchmark', base_url=base_url)
+            try:
+                client.post('/v2/bot/message/push', {'to': target, 'messages': [{'type': 'text', 'text': text}]}, '')
+            finally:
+                client.close()
+        return time.perf_counter() - started
+
+    def queued(self, notifications, base_url, batch_size):
+        # 既有的待發送通知延後，不計入量測（交易回滾後還原）
+        LineNotification.objects.filter(
+            status__in=[LineNotification.Status.PENDING, LineNotification.Status.SENDING]
+        ).update(next_attempt_at=timezone.now() + timedelta(days=365))
+        queue_line_messages(notifications)
+        totals = {'requests': 0, 'sent': 0, 'retry': 0, 'rate_limited': False}
+        batches = 0
+        started = time.perf_counter()
+        while True:
+            result = dispatch_pending(batch_size, client=LineClient('benchmark', base_url=base_url))
+            if not result['claimed']:
+                break
+            batches += 1
+            for key in ('requests', 'sent', 'retry'):
+                totals[key] += result[key]
+            if result['rate_limited']:
+                totals['rate_limited'] = True
+                break
+        return time.perf_counter() - started, totals, batches
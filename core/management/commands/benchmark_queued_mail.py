@@ -0,0 +1,118 @@
+import socketserver
+import threading
+import time
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.mail import BATCH_SIZE, dispatch_pending, queue_mail
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """最小的 SMTP 伺服器：接受所有指令與郵件並計數，不實際寄送"""
+
+    def reply(self, line):
+        self.wfile.write(line + b'\r\n')
+
+    def handle(self):
+        self.reply(b'220 localhost SMTP sink')
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line.rstrip(b'\r\n') == b'.':
+                    in_data = False
+                    with self.server.lock:
+                        self.server.received += 1
+                    self.reply(b'250 OK')
+                continue
+            command = line[:4].upper()
+            if command == b'DATA':
+                in_data = True
+                self.reply(b'354 End data with <CR><LF>.<CR><LF>')
+            elif command == b'QUIT':
+                self.reply(b'221 Bye')
+                return
+            else:
+                self.reply(b'250 OK')
+
+
+class _SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SMTPSinkHandler)
+        self.lock = threading.Lock()
+        self.received = 0
+
+
+class Command(BaseCommand):
+    help = (
+        '量測郵件寄送吞吐量：逐封 send_mail（每封一個連線）與郵件佇列批次寄送（每批一個連線）的比較。'
+        '預設啟動本機 SMTP 替身；所有佇列寫入在結束時回滾，不會留下資料'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='郵件數（預設 500）')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE, help=f'佇列每批郵件數（預設 {BATCH_SIZE}）'
+        )
+        parser.add_argument('--host', help='改用既有的 SMTP 伺服器（例如 localhost）')
+        parser.add_argument('--port', type=int, default=25, help='搭配 --host 使用的連接埠（預設 25）')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        if count < 1 or options['batch_size'] < 1:
+            raise CommandError('--messages 與 --batch-size 至少為 1')
+
+        sink = None
+        if options['host']:
+            host, port = options['host'], options['port']
+        else:
+            sink = _SMTPSink()
+            threading.Thread(target=sink.serve_forever, daemon=True).start()
+            host, port = sink.server_address
+
+        def connection():
+            return get_connection(SMTP_BACKEND, host=host, port=port, use_tls=False, use_ssl=False)
+
+        recipients = [f'bench{index}@example.invalid' for index in range(count)]
+        try:
+            started = time.perf_counter()
+            for recipient in recipients:
+                # 等同原本的 send_mail()：每封開一個新連線
+                EmailMessage('benchmark', 'body', 'noreply@smartfirm.com', [recipient], connection=connection()).send()
+            direct = time.perf_counter() - started
+
+            with transaction.atomic():
+                started = time.perf_counter()
+                for recipient in recipients:
+                    queue_mail('benchmark', 'body', [recipient], from_email='noreply@smartfirm.com')
+                queued = time.perf_counter() - started
+
+                started = time.perf_counter()
+                sent = batches = 0
+                while True:
+                    result = dispatch_pending(options['batch_size'], connection=connection())
+                    if not result['claimed']:
+                        break
+                    sent += result['sent']
+                    batches += 1
+                dispatched = time.perf_counter() - started
+                # 回滾佇列資料；交易未提交，背景寄送程序也不會被喚醒
+                transaction.set_rollback(True)
+        finally:
+            if sink is not None:
+                sink.shutdown()
+                sink.server_close()
+
+        self.stdout.write(f'SMTP: {host}:{port}，{count} 封')
+        self.stdout.write(f'逐封 send_mail：{direct:.2f} 秒，{count / direct:.1f} 封/秒')
+        self.stdout.write(f'寫入佇列：每封 {queued * 1000 / count:.2f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'佇列批次寄送：寄出 {sent} 封（{batches} 批），{dispatched:.2f} 秒，{sent / dispatched:.1f} 封/秒'
+        ))
+        if sink is not None:
+            self.stdout.write(f'SMTP 替身共收到 {sink.received} 封')
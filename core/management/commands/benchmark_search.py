@@ -0,0 +1,119 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+from admin_module.models import BasicInformation
+from core.search import SEARCH_LIMIT, SEARCH_TIMEOUT_MS, TRIGRAM_MIN_LENGTH, ranked_search
+
+# 產生公司名稱用的字元與後綴（固定亂數種子，結果可重現）
+NAME_CHARS = '台灣中華大新東西南北國際科技電子工業企業實業貿易建設開發投資資訊生技食品精密光電材料能源'
+NAME_SUFFIXES = ['股份有限公司', '有限公司', '企業社', '商行', '工作室']
+
+# 只有一家公司包含的字詞（字元不在 NAME_CHARS 中）
+RARE_NAME = '瑞昇精工股份有限公司'
+
+# (說明, 搜尋字詞)；統編完全相符的字詞依產生的資料決定
+TERMS = [
+    ('統編完全相符', None),
+    ('統編前綴', '1234'),
+    ('常見長字詞', '股份有限公司'),
+    ('常見短字詞（1 字）', '台'),
+    ('常見短字詞（2 字）', '科技'),
+    ('少見字詞', '昇精工'),
+    ('無相符', 'ZZZ不存在'),
+]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        '量測自動完成搜尋（core.search.ranked_search）在大量公司資料下的延遲；'
+        '資料於交易中產生，結束時回滾。索引與 statement_timeout 僅在 PostgreSQL 生效'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=100000, help='產生的公司數（預設 100000）')
+        parser.add_argument('--repeat', type=int, default=20, help='每個字詞執行次數（預設 20）')
+        parser.add_argument(
+            '--timeout-ms', type=int, default=SEARCH_TIMEOUT_MS,
+            help=f'包含比對的延遲預算（預設 {SEARCH_TIMEOUT_MS}）'
+        )
+        parser.add_argument('--explain', action='store_true', help='PostgreSQL：另外輸出各字詞包含比對的執行計畫')
+
+    def handle(self, *args, **options):
+        if options['companies'] < 1 or options['repeat'] < 1:
+            raise CommandError('--companies 與 --repeat 至少為 1')
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f'目前資料庫為 {connection.vendor}：沒有 trigram / 前綴索引與 statement_timeout，數據僅供參考'
+            ))
+
+        with transaction.atomic():
+            rows = self.generate(options['companies'])
+            terms = [(label, term or rows[len(rows) // 2].companyId) for label, term in TERMS]
+            self.run(terms, options)
+            # 回滾產生的資料
+            transaction.set_rollback(True)
+
+    def generate(self, count):
+        rng = random.Random(20260127)
+        started = time.perf_counter()
+        existing = set(BasicInformation.all_objects.values_list('companyId', flat=True))
+        rows = []
+        for index in range(count):
+            company_id = f'{index + 10000000:08d}'[-8:]
+            if company_id in existing:
+                continue
+            if index == count - 1:
+                name = RARE_NAME
+            else:
+                name = ''.join(rng.choice(NAME_CHARS) for _ in range(rng.randint(2, 8))) + rng.choice(NAME_SUFFIXES)
+            rows.append(BasicInformation(
+                companyId=company_id, companyName=name, contact='聯絡人', registration_address='台北市'
+            ))
+        BasicInformation.all_objects.bulk_create(rows, batch_size=5000)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE basic_information')
+        self.stdout.write(f'產生 {len(rows)} 家公司：{time.perf_counter() - started:.1f} 秒')
+        return rows
+
+    def run(self, terms, options):
+        queryset = BasicInformation.objects.filter(is_deleted=False)
+        self.stdout.write(f"{'字詞':<24}{'筆數':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'逾時':>6}")
+        for label, term in terms:
+            timings = []
+            partial = 0
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                results = ranked_search(queryset, term, 'companyName', 'companyId', timeout_ms=options['timeout_ms'])
+                timings.append((time.perf_counter() - started) * 1000)
+                partial += results.partial
+            self.stdout.write(
+                f"{f'{label} {term!r}':<24}{len(results):>6}{statistics.median(timings):>10.1f}"
+                f"{_percentile(timings, 0.95):>10.1f}{max(timings):>10.1f}{partial:>6}"
+            )
+            if options['explain'] and connection.vendor == 'postgresql':
+                self.explain(queryset, term)
+
+    def explain(self, queryset, term):
+        """前綴層與包含層查詢的實際執行計畫"""
+        shortest_first = (Length('companyName'), 'companyName')
+        tiers = [
+            ('名稱前綴', queryset.filter(companyName__istartswith=term).order_by(*shortest_first)),
+            ('包含', queryset.filter(Q(companyName__icontains=term) | Q(companyId__icontains=term)).order_by(
+                *(shortest_first if len(term) >= TRIGRAM_MIN_LENGTH else ())
+            )),
+        ]
+        for label, tier in tiers:
+            self.stdout.write(f'  {label}：')
+            plan = tier[:SEARCH_LIMIT].explain(analyze=True)
+            self.stdout.write('\n'.join(f'    {line}' for line in plan.splitlines()))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.line import BATCH_SIZE, dispatch_pending
+
+
+class Command(BaseCommand):
+    help = '發送 LINE 通知佇列中到期的通知（同一對象合併、相同內容以 multicast 發送），可由排程定期執行'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'每批認領的通知數（預設 {BATCH_SIZE}）'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=0,
+            help='最多處理批數，0 表示直到佇列清空或被限流'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size 至少為 1')
+
+        totals = {'claimed': 0, 'requests': 0, 'sent': 0, 'retry': 0, 'failed': 0}
+        batches = 0
+        rate_limited = False
+        started = time.perf_counter()
+        while not options['max_batches'] or batches < options['max_batches']:
+            result = dispatch_pending(options['batch_size'])
+            if not result['claimed']:
+                break
+            batches += 1
+            for key in totals:
+                totals[key] += result[key]
+            if result['rate_limited']:
+                rate_limited = True
+                break
+        elapsed = time.perf_counter() - started
+
+        rate = totals['sent'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"發送 {totals['sent']} 則通知（{totals['requests']} 次 API 請求），"
+            f"待重試 {totals['retry']} 則，失敗 {totals['failed']} 則"
+            f"（{batches} 批，{elapsed:.2f} 秒，{rate:.1f} 則/秒）"
+        ))
+        if rate_limited:
+            self.stdout.write(self.style.WARNING('LINE API 回應 429，其餘通知已延後重試'))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.mail import BATCH_SIZE, dispatch_pending
+
+
+class Command(BaseCommand):
+    help = '批次寄出郵件佇列中到期的郵件（每批共用一個 SMTP 連線），可由排程定期執行'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'每批認領的郵件數，每批使用一個連線（預設 {BATCH_SIZE}）'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=0,
+            help='最多處理批數，0 表示直到佇列清空'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size 至少為 1')
+
+        totals = {'claimed': 0, 'sent': 0, 'retry': 0, 'failed': 0}
+        batches = 0
+        started = time.perf_counter()
+        while not options['max_batches'] or batches < options['max_batches']:
+            result = dispatch_pending(options['batch_size'])
+            if not result['claimed']:
+                break
+            batches += 1
+            for key in totals:
+                totals[key] += result[key]
+        elapsed = time.perf_counter() - started
+
+        rate = totals['sent'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"寄出 {totals['sent']} 封，待重試 {totals['retry']} 封，失敗 {totals['failed']} 封"
+            f"（{batches} 批，{elapsed:.2f} 秒，{rate:.1f} 封/秒）"
+        ))
@@ -0,0 +1,68 @@
+"""
+Soft-delete QuerySet and managers
+
+Models with an is_deleted flag declare both managers, all_objects first so
+it stays the default manager (admin, unique validation and related managers
+keep seeing every row, as before):
+
+    all_objects = SoftDeleteManager(include_deleted=True)
+    objects = SoftDeleteManager()
+
+`Model.objects` then only returns live rows, and queryset delete()/restore()
+flip the flag with a single UPDATE instead of deleting rows.
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+
+    def _flag_update(self, is_deleted):
+        values = {'is_deleted': is_deleted}
+        # update() 不會觸發 auto_now，需自行帶入更新時間
+        if any(f.name == 'updated_at' for f in self.model._meta.concrete_fields):
+            values['updated_at'] = timezone.now()
+        return self.update(**values)
+
+    def delete(self):
+        """軟刪除：以一次 UPDATE 標記為已刪除，回傳格式與 QuerySet.delete() 相同"""
+        count = self.filter(is_deleted=False)._flag_update(True)
+        return count, {self.model._meta.label: count}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def hard_delete(self):
+        """實際刪除資料列"""
+        return super().delete()
+
+    hard_delete.alters_data = True
+    hard_delete.queryset_only = True
+
+    def restore(self):
+        """還原已刪除的資料列，回傳還原筆數"""
+        return self.filter(is_deleted=True)._flag_update(False)
+
+    restore.alters_data = True
+
+    def alive(self):
+        return self.filter(is_deleted=False)
+
+    def deleted(self):
+        return self.filter(is_deleted=True)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """
+    Manager returning live rows only, or every row with include_deleted=True.
+    """
+
+    def __init__(self, *args, include_deleted=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.include_deleted = include_deleted
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.include_deleted:
+            queryset = queryset.filter(is_deleted=False)
+        return queryset
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=50, unique=True, verbose_name='前綴')),
+                ('last_value', models.BigIntegerField(default=0, verbose_name='目前序號')),
+            ],
+            options={
+                'verbose_name': '流水號',
+                'verbose_name_plural': '流水號',
+                'db_table': 'core_sequence',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='主旨')),
+                ('body', models.TextField(verbose_name='內容')),
+                ('from_email', models.CharField(blank=True, max_length=255, verbose_name='寄件人')),
+                ('recipients', models.JSONField(default=list, verbose_name='收件人')),
+                ('status', models.CharField(choices=[('pending', '待寄送'), ('sending', '寄送中'), ('sent', '已寄出'), ('failed', '寄送失敗')], default='pending', max_length=10, verbose_name='狀態')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='嘗試次數')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次寄送時間')),
+                ('last_error', models.TextField(blank=True, verbose_name='最後錯誤')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='寄出時間')),
+            ],
+            options={
+                'verbose_name': '待寄送郵件',
+                'verbose_name_plural': '待寄送郵件',
+                'db_table': 'core_outbound_email',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('status__in', ['pending', 'sending'])), fields=['next_attempt_at'], name='outbound_email_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LineNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(help_text='LINE userId / roomId / groupId', max_length=64, verbose_name='發送對象')),
+                ('text', models.TextField(verbose_name='訊息內容')),
+                ('source', models.CharField(blank=True, help_text='例如 incoming_mail_item:12，避免同一來源重複通知', max_length=100, null=True, unique=True, verbose_name='來源')),
+                ('status', models.CharField(choices=[('pending', '待發送'), ('sending', '發送中'), ('sent', '已發送'), ('failed', '發送失敗')], default='pending', max_length=10, verbose_name='狀態')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='嘗試次數')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次發送時間')),
+                ('last_error', models.TextField(blank=True, verbose_name='最後錯誤')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='發送時間')),
+            ],
+            options={
+                'verbose_name': '待發送 LINE 通知',
+                'verbose_name_plural': '待發送 LINE 通知',
+                'db_table': 'core_line_notification',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('status__in', ['pending', 'sending'])), fields=['next_attempt_at'], name='line_notification_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_shared_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linenotification',
+            name='retry_key',
+            field=models.UUIDField(blank=True, editable=False, help_text='X-Line-Retry-Key，同一次請求的通知共用，重送時沿用', null=True, verbose_name='重送金鑰'),
+        ),
+    ]
@@ -1,3 +1,172 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class Sequence(models.Model):
+    """流水號計數器（每個前綴一列，由 core.sequences 以單一 SQL 原子遞增）"""
+    prefix = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name='前綴'
+    )
+    last_value = models.BigIntegerField(
+        default=0,
+        verbose_name='目前序號'
+    )
+
+    class Meta:
+        db_table = 'core_sequence'
+        verbose_name = '流水號'
+        verbose_name_plural = '流水號'
+
+    def __str__(self):
+        return f"{self.prefix}{self.last_value}"
+
+
+class OutboundEmail(models.Model):
+    """待寄送郵件佇列（由 core.mail 批次寄出）"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', '待寄送'
+        SENDING = 'sending', '寄送中'
+        SENT = 'sent', '已寄出'
+        FAILED = 'failed', '寄送失敗'
+
+    subject = models.CharField(
+        max_length=255,
+        verbose_name='主旨'
+    )
+    body = models.TextField(
+        verbose_name='內容'
+    )
+    from_email = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='寄件人'
+    )
+    recipients = models.JSONField(
+        default=list,
+        verbose_name='收件人'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='狀態'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='嘗試次數'
+    )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='下次寄送時間'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='最後錯誤'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='建立時間'
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='寄出時間'
+    )
+
+    class Meta:
+        db_table = 'core_outbound_email'
+        verbose_name = '待寄送郵件'
+        verbose_name_plural = '待寄送郵件'
+        ordering = ['-created_at']
+        indexes = [
+            # 寄送程序只掃描尚未完成的郵件
+            models.Index(
+                fields=['next_attempt_at'],
+                name='outbound_email_due_idx',
+                condition=models.Q(status__in=['pending', 'sending'])
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+
+class LineNotification(models.Model):
+    """待發送 LINE 通知佇列（由 core.line 合併同一對象的通知後發送）"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', '待發送'
+        SENDING = 'sending', '發送中'
+        SENT = 'sent', '已發送'
+        FAILED = 'failed', '發送失敗'
+
+    target = models.CharField(
+        max_length=64,
+        verbose_name='發送對象',
+        help_text='LINE userId / roomId / groupId'
+    )
+    text = models.TextField(
+        verbose_name='訊息內容'
+    )
+    source = models.CharField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='來源',
+        help_text='例如 incoming_mail_item:12，避免同一來源重複通知'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='狀態'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='嘗試次數'
+    )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='下次發送時間'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='最後錯誤'
+    )
+    retry_key = models.UUIDField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='重送金鑰',
+        help_text='X-Line-Retry-Key，同一次請求的通知共用，重送時沿用'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='建立時間'
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='發送時間'
+    )
+
+    class Meta:
+        db_table = 'core_line_notification'
+        verbose_name = '待發送 LINE 通知'
+        verbose_name_plural = '待發送 LINE 通知'
+        ordering = ['-created_at']
+        indexes = [
+            # 發送程序只掃描尚未完成的通知
+            models.Index(
+                fields=['next_attempt_at'],
+                name='line_notification_due_idx',
+                condition=models.Q(status__in=['pending', 'sending'])
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.target}: {self.text[:30]}"
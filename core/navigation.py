@@ -0,0 +1,189 @@
+"""
+Keyset navigation and pagination
+
+Previous/next record links and list pages are served with keyset queries
+("rows after / before this position in list order, LIMIT n") instead of
+loading every primary key or counting through an OFFSET, so the cost stays
+flat as the table grows when the ordering is indexed.
+"""
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.http import urlencode
+
+
+def _keyset_q(values, ordering, forward):
+    """
+    Q selecting the rows that come after the position values (field name ->
+    value) in ordering, or before it when forward is False:
+    (f1 > v1) | (f1 = v1 & f2 > v2) | ...
+    """
+    condition = Q(pk__in=[])
+    equal = Q()
+    for field in ordering:
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        value = values[name]
+        lookup = 'lt' if descending == forward else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _position(obj, ordering):
+    """Ordering field values of obj as {field name: value}."""
+    names = [field.lstrip('-') for field in ordering]
+    return {name: obj.pk if name == 'pk' else getattr(obj, name) for name in names}
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder keeping microseconds, which it otherwise rounds to milliseconds."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    """Opaque URL-safe cursor for a {field name: value} position."""
+    raw = json.dumps(values, cls=_CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, cursor, ordering):
+    """
+    Position encoded by encode_cursor(), converted back to field types.
+
+    Raises:
+        ValueError: If the cursor is malformed or does not match ordering
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        position = {}
+        for field in ordering:
+            name = field.lstrip('-')
+            model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            position[name] = model_field.to_python(values[name])
+        return position
+    except Exception as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=50):
+    """
+    One page of queryset in ordering, continuing after cursor.
+
+    Args:
+        queryset: Filtered queryset; may be a values() queryset as long as
+                  it selects the ordering fields ('pk' is read from the
+                  primary key column)
+        ordering: Ordering ending with a unique field (e.g. ('-date', '-pk'))
+        cursor: Cursor returned with the previous page, or None
+        limit: Rows per page
+
+    Returns:
+        tuple: (rows, next cursor or None on the last page)
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    ordering = list(ordering)
+    if cursor:
+        position = decode_cursor(queryset.model, cursor, ordering)
+        queryset = queryset.filter(_keyset_q(position, ordering, forward=True))
+
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    if isinstance(last, dict):
+        pk_name = queryset.model._meta.pk.attname
+        names = [field.lstrip('-') for field in ordering]
+        position = {name: last[pk_name if name == 'pk' else name] for name in names}
+    else:
+        position = _position(last, ordering)
+    return rows, encode_cursor(position)
+
+
+def keyset_through(model, cursor, ordering):
+    """
+    Q selecting the rows up to and including the cursor position in
+    ordering, i.e. everything before the page that follows cursor.
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    position = decode_cursor(model, cursor, ordering)
+    return _keyset_q(position, ordering, forward=False) | Q(**position)
+
+
+def _reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetNavigationMixin:
+    """
+    Add the previous/next record IDs to a DetailView/UpdateView context.
+
+    Attributes:
+        navigation_ordering: Same ordering as the list page; must end with a
+                             unique field (pk) so neighbours are well defined
+        navigation_filters: {GET parameter: model field} filters of the list
+                            page, carried over from the query string
+        navigation_filter_defaults: {GET parameter: value} used when the
+                                    parameter is absent (as the list page does)
+        navigation_context_names: Context keys of the previous/next IDs
+    """
+    navigation_ordering = ('-created_at', '-pk')
+    navigation_filters = {}
+    navigation_filter_defaults = {}
+    navigation_context_names = ('previous_pk', 'next_pk')
+
+    def get_navigation_queryset(self):
+        return self.model._default_manager.all()
+
+    def get_navigation_params(self):
+        """Active list filters as {GET parameter: value}."""
+        params = {}
+        for param in self.navigation_filters:
+            value = self.request.GET.get(param, self.navigation_filter_defaults.get(param, ''))
+            if value:
+                params[param] = value
+        return params
+
+    def get_navigation(self, obj):
+        """
+        Returns:
+            tuple: (previous pk or None, next pk or None)
+        """
+        params = self.get_navigation_params()
+        queryset = self.get_navigation_queryset().filter(**{
+            self.navigation_filters[param]: value for param, value in params.items()
+        })
+        ordering = list(self.navigation_ordering)
+
+        position = _position(obj, ordering)
+        previous_pk = queryset.filter(_keyset_q(position, ordering, forward=False)).order_by(
+            *_reverse_ordering(ordering)
+        ).values_list('pk', flat=True).first()
+        next_pk = queryset.filter(_keyset_q(position, ordering, forward=True)).order_by(
+            *ordering
+        ).values_list('pk', flat=True).first()
+        return previous_pk, next_pk
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        previous_name, next_name = self.navigation_context_names
+        context[previous_name], context[next_name] = self.get_navigation(self.object)
+        # 上一筆/下一筆連結沿用列表篩選條件
+        context['navigation_query'] = urlencode(
+            {param: self.request.GET[param] for param in self.navigation_filters if param in self.request.GET}
+        )
+        return context
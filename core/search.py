@@ -0,0 +1,129 @@
+"""
+Ranked autocomplete search
+
+Shared by every company/shareholder autocomplete endpoint. Results come in
+tiers, each fetched with its own LIMITed query and only while the limit is
+not yet filled: the exact ID hit (unique index), ID prefix, name prefix,
+then contains. Within a tier shorter names come first.
+
+On PostgreSQL the prefix tiers are served by btree text_pattern_ops indexes
+on UPPER(column::text) and the contains tier by pg_trgm GIN indexes (see
+the search index migrations), so no tier sorts on a computed rank. pg_trgm
+cannot narrow terms shorter than TRIGRAM_MIN_LENGTH characters (e.g. a one
+or two character Chinese name fragment), so for those the contains tier
+takes the first matches of a LIMITed scan and orders them in Python
+instead of sorting every match.
+
+The contains tier runs under a statement_timeout; when it fires, the
+prefix tiers are returned, the timeout is logged and the result is marked
+partial. Other backends (SQLite in tests) run the same queries without the
+indexes or the timeout. The benchmark_search command measures the tiers
+against a generated data set.
+"""
+import logging
+from contextlib import contextmanager
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+
+logger = logging.getLogger(__name__)
+
+SEARCH_LIMIT = 20
+SEARCH_TIMEOUT_MS = 300
+TRIGRAM_MIN_LENGTH = 3
+
+
+class SearchResults(list):
+    """Search results; partial is True when the contains tier timed out."""
+
+    partial = False
+
+
+@contextmanager
+def _statement_timeout(timeout_ms):
+    # 以 savepoint 執行：逾時回滾時設定一併還原，成功時還原為原本的值
+    with transaction.atomic():
+        if connection.vendor != 'postgresql':
+            yield
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT current_setting('statement_timeout')")
+            previous = cursor.fetchone()[0]
+            cursor.execute("SELECT set_config('statement_timeout', %s, true)", [str(int(timeout_ms))])
+        yield
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('statement_timeout', %s, true)", [previous])
+
+
+def exact_match(queryset, id_field, term):
+    """
+    Return the object whose ID field equals term, or None.
+
+    Args:
+        queryset: Base queryset (e.g. non-deleted companies)
+        id_field: Unique ID field name (e.g. 'companyId')
+        term: Search term
+    """
+    term = (term or '').strip()
+    if not term:
+        return None
+    return queryset.filter(**{id_field: term}).first()
+
+
+def ranked_search(queryset, term, name_field, id_field, limit=SEARCH_LIMIT, timeout_ms=SEARCH_TIMEOUT_MS):
+    """
+    Search queryset by name and ID, exact ID hits first.
+
+    Args:
+        queryset: Base queryset (e.g. non-deleted companies)
+        term: Search term typed by the user
+        name_field: Name field matched with icontains
+        id_field: Unique ID field (tax ID / identifier); an exact hit ranks first
+        limit: Maximum number of results
+        timeout_ms: Latency budget of the contains tier on PostgreSQL
+
+    Returns:
+        SearchResults of model instances, best match first
+    """
+    results = SearchResults()
+    term = (term or '').strip()
+    if not term:
+        return results
+
+    exact = exact_match(queryset, id_field, term)
+    if exact:
+        results.append(exact)
+
+    def tier(condition):
+        return queryset.filter(condition).exclude(pk__in=[obj.pk for obj in results])
+
+    shortest_first = (Length(name_field), name_field)
+    for condition in (Q(**{f'{id_field}__istartswith': term}), Q(**{f'{name_field}__istartswith': term})):
+        if len(results) < limit:
+            results.extend(tier(condition).order_by(*shortest_first)[:limit - len(results)])
+
+    if len(results) >= limit:
+        return results
+
+    contains = tier(Q(**{f'{name_field}__icontains': term}) | Q(**{f'{id_field}__icontains': term}))
+    try:
+        with _statement_timeout(timeout_ms):
+            if len(term) >= TRIGRAM_MIN_LENGTH:
+                matches = list(contains.order_by(*shortest_first)[:limit - len(results)])
+            else:
+                # 短字詞無法使用 trigram 索引：掃描到足夠筆數即停止，不排序全部結果
+                matches = sorted(
+                    contains[:limit - len(results)],
+                    key=lambda obj: (len(getattr(obj, name_field) or ''), getattr(obj, name_field) or '')
+                )
+    except OperationalError:
+        logger.warning(
+            'Contains search for %r on %s exceeded %s ms; returning prefix matches only',
+            term, queryset.model._meta.label, timeout_ms
+        )
+        results.partial = True
+    else:
+        results.extend(matches)
+
+    return results
@@ -0,0 +1,51 @@
+"""
+Shared sequence allocator
+
+Numbers are handed out by a single atomic upsert on the per-prefix
+Sequence row (INSERT ... ON CONFLICT DO UPDATE ... RETURNING), so
+concurrent callers never read the same value and never need to retry.
+"""
+from django.db import connection
+from .models import Sequence
+
+
+def _table():
+    return connection.ops.quote_name(Sequence._meta.db_table)
+
+
+def _upsert(prefix, start):
+    table = _table()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (prefix, last_value) VALUES (%s, %s) "
+            f"ON CONFLICT (prefix) DO UPDATE SET last_value = {table}.last_value + 1 "
+            f"RETURNING last_value",
+            [prefix, start]
+        )
+        return cursor.fetchone()[0]
+
+
+def next_value(prefix, seed=None):
+    """
+    Allocate the next number for prefix.
+
+    Args:
+        prefix: Sequence key, e.g. 'RO-20260127-R'
+        seed: Optional callable returning the highest number already in use,
+              consulted only when the prefix has no counter row yet (so rows
+              created before the counter existed are not reused)
+
+    Returns:
+        int: the allocated number (starting at 1)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {_table()} SET last_value = last_value + 1 WHERE prefix = %s RETURNING last_value",
+            [prefix]
+        )
+        row = cursor.fetchone()
+    if row:
+        return row[0]
+
+    start = (seed() if seed else 0) + 1
+    return _upsert(prefix, start)
@@ -1,3 +1,495 @@
-from django.test import TestCase
+import io
+import smtplib
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date, timedelta
+from unittest import mock
+from django.db import OperationalError, connection
+from django.utils import timezone
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from admin_module.models import BasicInformation
+from booking.models import BookingCustomer, VATRecord
+from booking.utils import import_booking_customers, import_vat_records
+from booking.views import CUSTOMER_EXPORT_COLUMNS, VAT_EXPORT_COLUMNS
+from . import imports, line, mail
+from .export import export_response
+from .imports import bulk_import
+from .line import dispatch_pending
+from .models import LineNotification, OutboundEmail
+from .navigation import decode_cursor, encode_cursor
+from .search import ranked_search
+from .sequences import next_value
 
-# Create your tests here.
+
+class RankedSearchTests(TestCase):
+    """統編完全相符優先，其次為統編開頭、名稱開頭、包含（名稱較短者優先）"""
+
+    def setUp(self):
+        for company_id, name in (
+            ('00001234', 'X'),
+            ('88888888', 'AB1234'),
+            ('99999999', '1234 Trading'),
+            ('12345678', '乙公司'),
+            ('1234', '完全相符公司'),
+            ('77777777', '不相關公司'),
+        ):
+            BasicInformation.objects.create(
+                companyId=company_id, companyName=name, contact='聯絡人', registration_address='台北市'
+            )
+
+    def search(self, term, **kwargs):
+        return [
+            company.companyId
+            for company in ranked_search(BasicInformation.objects.all(), term, 'companyName', 'companyId', **kwargs)
+        ]
+
+    def test_ranking(self):
+        self.assertEqual(self.search('1234'), ['1234', '12345678', '99999999', '00001234', '88888888'])
+
+    def test_limit_keeps_best_matches(self):
+        self.assertEqual(self.search('1234', limit=2), ['1234', '12345678'])
+
+    def test_blank_term(self):
+        self.assertEqual(self.search('  '), [])
+
+    def test_excludes_rows_outside_queryset(self):
+        BasicInformation.objects.filter(companyId='1234').update(is_deleted=True)
+        companies = ranked_search(BasicInformation.objects.all(), '1234', 'companyName', 'companyId')
+        self.assertEqual(companies[0].companyId, '12345678')
+
+    def test_autocomplete_endpoint_uses_ranking(self):
+        response = self.client.get(reverse('booking:search_customers'), {'q': '1234'})
+        self.assertEqual(
+            [row['unified_business_number'] for row in response.json()['data']],
+            ['1234', '12345678', '99999999', '00001234', '88888888']
+        )
+        self.assertFalse(response.json()['partial'])
+
+    def test_short_term_ordered_by_name_length(self):
+        # 少於 3 字的片段不走 trigram 排序，取得的結果於 Python 依名稱長度排序
+        self.assertEqual(self.search('公司'), ['12345678', '77777777', '1234'])
+
+    def test_contains_timeout_falls_back_to_prefix_matches(self):
+        @contextmanager
+        def timed_out(timeout_ms):
+            raise OperationalError('canceling statement due to statement timeout')
+            yield
+
+        with mock.patch('core.search._statement_timeout', timed_out), \
+                self.assertLogs('core.search', 'WARNING') as logs:
+            results = ranked_search(BasicInformation.objects.all(), '1234', 'companyName', 'companyId')
+            response = self.client.get(reverse('booking:search_customers'), {'q': '1234'})
+
+        self.assertEqual([company.companyId for company in results], ['1234', '12345678', '99999999'])
+        self.assertTrue(results.partial)
+        self.assertIn('exceeded 300 ms', logs.output[0])
+        self.assertTrue(response.json()['partial'])
+        self.assertEqual(len(response.json()['data']), 3)
+
+
+class KeysetCursorTests(TestCase):
+    """分頁游標需完整保留排序欄位的值"""
+
+    def test_cursor_keeps_microseconds(self):
+        created = timezone.now().replace(microsecond=123456)
+        cursor = encode_cursor({'created_at': created, 'pk': 7})
+        self.assertEqual(
+            decode_cursor(OutboundEmail, cursor, ['-created_at', '-pk']),
+            {'created_at': created, 'pk': 7}
+        )
+
+
+class SequenceAllocationTests(TransactionTestCase):
+    """流水號以單一 SQL 原子遞增，同時配發也不會重複或跳號"""
+
+    def test_seed_only_used_without_counter(self):
+        self.assertEqual(next_value('TEST-SEED-', seed=lambda: 41), 42)
+        self.assertEqual(next_value('TEST-SEED-', seed=lambda: 1000), 43)
+        self.assertEqual(next_value('TEST-OTHER-'), 1)
+
+    # SQLite 的記憶體測試資料庫無法同時寫入，需於 PostgreSQL 執行
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_parallel_allocation(self):
+        threads_count, per_thread = 8, 25
+        allocated = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(threads_count)
+
+        def allocate():
+            try:
+                start.wait()
+                values = [next_value('TEST-PARALLEL-') for _ in range(per_thread)]
+                with lock:
+                    allocated.extend(values)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=allocate) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(allocated), list(range(1, threads_count * per_thread + 1)))
+
+
+class FakeLineClient:
+    """依序回傳預設結果的 Messaging API client，記錄每次請求"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.requests = []
+
+    def post(self, path, payload, retry_key):
+        self.requests.append((path, payload, retry_key))
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        # 狀態碼，或 (狀態碼, Retry-After)
+        status, retry_after = result if isinstance(result, tuple) else (result, None)
+        return status, retry_after, b''
+
+    def close(self):
+        pass
+
+
+class LineRetryKeyTests(TestCase):
+    """逾時後重送沿用同一個 Retry Key 與請求內容，不會與新通知合併"""
+
+    def dispatch(self, *results):
+        client = FakeLineClient(*results)
+        dispatch_pending(client=client)
+        return client.requests
+
+    def test_retry_reuses_key(self):
+        LineNotification.objects.create(target='U0001', text='第一則')
+        LineNotification.objects.create(target='U0001', text='第二則')
+
+        (path, payload, retry_key), = self.dispatch(TimeoutError('timed out'))
+        self.assertEqual(
+            set(LineNotification.objects.values_list('retry_key', flat=True)), {uuid.UUID(retry_key)}
+        )
+
+        LineNotification.objects.update(next_attempt_at=timezone.now())
+        LineNotification.objects.create(target='U0001', text='第三則')
+        retry, new = self.dispatch(409, 200)
+
+        self.assertEqual(retry, (path, payload, retry_key))
+        self.assertNotEqual(new[2], retry_key)
+        self.assertEqual(new[1]['messages'], [{'type': 'text', 'text': '第三則'}])
+        self.assertEqual(LineNotification.objects.filter(status=LineNotification.Status.SENT).count(), 3)
+
+    def test_multicast_retry_keeps_recipients(self):
+        for target in ('U0001', 'U0002'):
+            LineNotification.objects.create(target=target, text='同一則')
+
+        (path, payload, retry_key), = self.dispatch(503)
+        LineNotification.objects.update(next_attempt_at=timezone.now())
+        (retry_path, retry_payload, retry_retry_key), = self.dispatch(200)
+
+        self.assertEqual(path, '/v2/bot/message/multicast')
+        self.assertEqual((retry_path, retry_retry_key), (path, retry_key))
+        self.assertEqual(sorted(retry_payload['to']), sorted(payload['to']))
+        self.assertEqual(retry_payload['messages'], payload['messages'])
+
+
+class LineBatchingTests(TestCase):
+    """相同內容的 userId 以 multicast 合併發送；429 時依 Retry-After 延後其餘通知"""
+
+    def dispatch(self, *results):
+        client = FakeLineClient(*results)
+        result = dispatch_pending(client=client)
+        return result, client.requests
+
+    def test_identical_messages_multicast(self):
+        for target in ('U0001', 'U0002', 'U0003'):
+            LineNotification.objects.create(target=target, text='服務時間調整')
+        LineNotification.objects.create(target='U0004', text='另一則')
+        LineNotification.objects.create(target='R0001', text='服務時間調整')
+
+        result, requests = self.dispatch(200, 200, 200)
+
+        by_path = {}
+        for path, payload, _ in requests:
+            by_path.setdefault(path, []).append(payload)
+        multicast, = by_path['/v2/bot/message/multicast']
+        self.assertEqual(sorted(multicast['to']), ['U0001', 'U0002', 'U0003'])
+        self.assertEqual(multicast['messages'], [{'type': 'text', 'text': '服務時間調整'}])
+        # room 不能 multicast；只有一位收件者時用 push
+        self.assertEqual(sorted(payload['to'] for payload in by_path['/v2/bot/message/push']), ['R0001', 'U0004'])
+        self.assertEqual((result['requests'], result['sent']), (3, 5))
+        self.assertEqual(
+            LineNotification.objects.filter(status=LineNotification.Status.SENT).count(), 5
+        )
+
+    @mock.patch('core.line.MULTICAST_LIMIT', 2)
+    def test_multicast_split_by_limit(self):
+        for index in range(5):
+            LineNotification.objects.create(target=f'U{index:04d}', text='同一則')
+
+        _, requests = self.dispatch(200, 200, 200)
+
+        self.assertEqual([len(payload['to']) for _, payload, _ in requests], [2, 2, 1])
+        self.assertEqual(len({retry_key for _, _, retry_key in requests}), 3)
+
+    def test_rate_limit_waits_for_retry_after(self):
+        for target in ('R0001', 'R0002', 'R0003'):
+            LineNotification.objects.create(target=target, text=f'{target} 進度更新')
+
+        before = timezone.now()
+        result, requests = self.dispatch(200, (429, '120'))
+
+        # 429 之後不再送出其餘請求
+        self.assertEqual([payload['to'] for _, payload, _ in requests], ['R0001', 'R0002'])
+        self.assertTrue(result['rate_limited'])
+        self.assertEqual((result['sent'], result['retry'], result['failed']), (1, 2, 0))
+        for notification in LineNotification.objects.exclude(target='R0001'):
+            self.assertEqual(notification.status, LineNotification.Status.PENDING)
+            # 被限流不算一次失敗
+            self.assertEqual(notification.attempts, 0)
+            self.assertGreaterEqual(notification.next_attempt_at, before + timedelta(seconds=120))
+            self.assertLess(notification.next_attempt_at, timezone.now() + timedelta(seconds=121))
+            self.assertIn('429', notification.last_error)
+
+    def test_rate_limit_without_retry_after_backs_off(self):
+        LineNotification.objects.create(target='R0001', text='進度更新')
+
+        before = timezone.now()
+        result, _ = self.dispatch(429)
+
+        notification = LineNotification.objects.get()
+        self.assertTrue(result['rate_limited'])
+        self.assertEqual((notification.status, notification.attempts), (LineNotification.Status.PENDING, 0))
+        self.assertGreaterEqual(notification.next_attempt_at, before + timedelta(seconds=line.RETRY_BASE_SECONDS))
+
+
+def export_file(queryset, columns, export_format='csv'):
+    response = export_response(queryset, columns, 'export', export_format)
+    content = b''.join(part if isinstance(part, bytes) else part.encode() for part in response.streaming_content)
+    return io.BytesIO(content)
+
+
+def csv_file(text, encoding='utf-8'):
+    return io.BytesIO(text.encode(encoding))
+
+
+class SpreadsheetImportTests(TestCase):
+    """匯入：core.export 的檔案可匯回、逐列回報錯誤、依唯一鍵新增或更新"""
+
+    header = '統一編號,公司名稱,登記地址,聯絡人,收費狀態,Email\n'
+
+    def setUp(self):
+        self.first = BookingCustomer.objects.create(
+            company_id='10000001', company_name='甲公司', registration_address='台北市',
+            contact_person='王先生', charge_status='not_charging'
+        )
+        self.second = BookingCustomer.objects.create(
+            company_id='10000002', company_name='乙公司', registration_address='新北市', contact_person='李小姐'
+        )
+
+    def import_customers(self, text, **kwargs):
+        return bulk_import(BookingCustomer, csv_file(text), 'customers.csv', unique_fields=['company_id'], **kwargs)
+
+    def assert_round_trip(self, export_format):
+        exported = export_file(BookingCustomer.objects.order_by('pk'), CUSTOMER_EXPORT_COLUMNS, export_format)
+        BookingCustomer.objects.filter(pk=self.first.pk).update(company_name='改名', charge_status='charging')
+        self.second.delete()
+
+        result = import_booking_customers(exported, f'customers.{export_format}')
+
+        self.assertEqual((result['created'], result['updated'], result['errors']), (1, 1, []))
+        self.assertIn('ID', result['ignored_columns'])
+        first = BookingCustomer.objects.get(company_id='10000001')
+        self.assertEqual((first.company_name, first.charge_status), ('甲公司', 'not_charging'))
+        self.assertEqual(BookingCustomer.objects.get(company_id='10000002').contact_person, '李小姐')
+
+    def test_csv_round_trip(self):
+        self.assert_round_trip('csv')
+
+    def test_xlsx_round_trip(self):
+        self.assert_round_trip('xlsx')
+
+    def test_vat_xlsx_round_trip_with_lookup_and_dates(self):
+        VATRecord.objects.create(
+            customer=self.first, filing_year='114', filing_period='02',
+            sales_amount=12345, tax_deadline=date(2025, 3, 15)
+        )
+        exported = export_file(VATRecord.objects.all(), VAT_EXPORT_COLUMNS, 'xlsx')
+        VATRecord.objects.update(sales_amount=0, tax_deadline=None)
+
+        result = import_vat_records(exported, 'vat.xlsx')
+
+        self.assertEqual((result['created'], result['updated'], result['errors']), (0, 1, []))
+        record = VATRecord.objects.get()
+        self.assertEqual((record.sales_amount, record.tax_deadline), (12345, date(2025, 3, 15)))
+
+    def test_big5_csv(self):
+        text = self.header + '10000003,丙公司,台中市,陳先生,未收費,\n'
+        result = bulk_import(
+            BookingCustomer, csv_file(text, 'cp950'), 'customers.csv', unique_fields=['company_id']
+        )
+
+        self.assertEqual((result['created'], result['errors']), (1, []))
+        customer = BookingCustomer.objects.get(company_id='10000003')
+        self.assertEqual((customer.company_name, customer.charge_status), ('丙公司', 'not_charging'))
+
+    def test_utf8_bom_csv(self):
+        result = self.import_customers('\ufeff' + self.header + '10000001,甲公司新名,台北市,王先生,收費中,\n')
+
+        self.assertEqual((result['created'], result['updated'], result['errors']), (0, 1, []))
+        self.assertEqual(BookingCustomer.objects.get(pk=self.first.pk).company_name, '甲公司新名')
+
+    def test_excel_serial_date(self):
+        text = 'company_id,filing_year,filing_period,tax_deadline\n10000001,114,2,45292\n'
+        result = import_vat_records(csv_file(text), 'vat.csv')
+
+        self.assertEqual(result['errors'], [])
+        record = VATRecord.objects.get()
+        # Excel 去掉的前導零補回
+        self.assertEqual((record.filing_period, record.tax_deadline), ('02', date(2024, 1, 1)))
+
+    def test_errors_report_row_numbers(self):
+        text = (
+            self.header
+            + '10000003,丙公司,台中市,陳先生,收費中,\n'
+            + '10000004,丁公司,台中市,陳先生,不存在的狀態,\n'
+            + ',,,,,\n'
+            + '10000005,戊公司,台中市,陳先生,收費中,not-an-email\n'
+            + '10000006,,台中市,陳先生,收費中,\n'
+        )
+        result = self.import_customers(text)
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([number for number, _ in result['errors']], [3, 5, 6])
+        self.assertIn('收費狀態', result['errors'][0][1])
+        self.assertIn('Email', result['errors'][1][1])
+        self.assertIn('公司名稱', result['errors'][2][1])
+        self.assertFalse(BookingCustomer.objects.filter(company_id__in=['10000004', '10000005', '10000006']).exists())
+
+    def test_duplicate_key_in_file(self):
+        text = self.header + '10000003,丙公司,台中市,陳先生,收費中,\n10000003,丙公司二,台中市,陳先生,收費中,\n'
+        result = self.import_customers(text)
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['errors'], [(3, '與第 2 列重複')])
+        self.assertEqual(BookingCustomer.objects.get(company_id='10000003').company_name, '丙公司')
+
+    def test_missing_key_column(self):
+        with self.assertRaises(ValueError):
+            self.import_customers('公司名稱,登記地址\n丙公司,台中市\n')
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            bulk_import(BookingCustomer, csv_file(''), 'customers.pdf', unique_fields=['company_id'])
+
+    def test_multiple_chunks(self):
+        rows = [f'1000000{index},公司{index},台北市,聯絡人,收費中,\n' for index in range(1, 8)]
+        # 最後一列與第一個 chunk 的資料重複
+        rows.append('10000003,重複公司,台北市,聯絡人,收費中,\n')
+
+        with mock.patch.object(imports, '_write_chunk', wraps=imports._write_chunk) as write_chunk:
+            result = self.import_customers(self.header + ''.join(rows), chunk_size=3)
+
+        self.assertEqual(write_chunk.call_count, 3)
+        self.assertEqual((result['created'], result['updated']), (5, 2))
+        self.assertEqual(result['errors'], [(9, '與第 4 列重複')])
+        self.assertEqual(BookingCustomer.objects.count(), 7)
+        self.assertEqual(BookingCustomer.objects.get(company_id='10000001').company_name, '公司1')
+
+
+class FakeMailConnection:
+    """記錄開啟次數與寄出郵件的 email backend；failures 為 {收件人: 例外}"""
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.opened = 0
+        self.sent = []
+
+    def open(self):
+        self.opened += 1
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        for message in messages:
+            error = self.failures.get(message.to[0])
+            if error is not None:
+                raise error
+            self.sent.append(message)
+        return len(messages)
+
+
+class QueuedMailTests(TestCase):
+    """郵件佇列：每批共用一個連線，暫時性錯誤退避重試，永久性錯誤直接失敗"""
+
+    def queue(self, *recipients):
+        with mock.patch.object(mail, 'wake_worker'), self.captureOnCommitCallbacks(execute=True):
+            return [mail.queue_mail('主旨', '內容', [recipient]) for recipient in recipients]
+
+    def status(self, email):
+        email.refresh_from_db()
+        return email.status, email.attempts
+
+    def test_batch_uses_one_connection(self):
+        emails = self.queue('a@example.com', 'b@example.com', 'c@example.com')
+        connection = FakeMailConnection()
+
+        result = mail.dispatch_pending(connection=connection)
+
+        self.assertEqual(result, {'claimed': 3, 'sent': 3, 'retry': 0, 'failed': 0})
+        self.assertEqual(connection.opened, 1)
+        self.assertEqual([message.to for message in connection.sent], [[e.recipients[0]] for e in emails])
+        self.assertEqual({self.status(email) for email in emails}, {(OutboundEmail.Status.SENT, 1)})
+        self.assertEqual(mail.dispatch_pending(connection=connection)['claimed'], 0)
+
+    def test_transient_error_backs_off(self):
+        delayed, sent = self.queue('slow@example.com', 'ok@example.com')
+        connection = FakeMailConnection({'slow@example.com': smtplib.SMTPResponseException(451, b'try later')})
+
+        started = timezone.now()
+        result = mail.dispatch_pending(connection=connection)
+
+        self.assertEqual((result['sent'], result['retry']), (1, 1))
+        # 暫時性錯誤後重新連線，其餘郵件照常寄出
+        self.assertEqual(connection.opened, 2)
+        self.assertEqual(self.status(sent), (OutboundEmail.Status.SENT, 1))
+        self.assertEqual(self.status(delayed), (OutboundEmail.Status.PENDING, 1))
+        self.assertIn('451', delayed.last_error)
+        self.assertGreaterEqual(delayed.next_attempt_at, started + timedelta(seconds=mail.RETRY_BASE_SECONDS))
+
+        # 未到重試時間不會再認領；每次重試的退避時間加倍，用完次數即失敗
+        self.assertEqual(mail.dispatch_pending(connection=connection)['claimed'], 0)
+        for attempt in range(2, mail.MAX_ATTEMPTS + 1):
+            OutboundEmail.objects.filter(pk=delayed.pk).update(next_attempt_at=timezone.now())
+            started = timezone.now()
+            mail.dispatch_pending(connection=connection)
+            status, attempts = self.status(delayed)
+            self.assertEqual(attempts, attempt)
+            if attempt < mail.MAX_ATTEMPTS:
+                self.assertEqual(status, OutboundEmail.Status.PENDING)
+                backoff = timedelta(seconds=mail.RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+                self.assertGreaterEqual(delayed.next_attempt_at, started + backoff)
+        self.assertEqual(status, OutboundEmail.Status.FAILED)
+
+    def test_permanent_error_fails_at_once(self):
+        email, = self.queue('nobody@example.com')
+        connection = FakeMailConnection({'nobody@example.com': smtplib.SMTPResponseException(550, b'no such user')})
+
+        self.assertEqual(mail.dispatch_pending(connection=connection)['failed'], 1)
+        self.assertEqual(self.status(email), (OutboundEmail.Status.FAILED, 1))
+
+    def test_connection_failure_reschedules_batch(self):
+        emails = self.queue('a@example.com', 'b@example.com')
+        connection = FakeMailConnection()
+        connection.open = mock.Mock(side_effect=ConnectionRefusedError('refused'))
+
+        with self.assertLogs('core.mail', 'WARNING'):
+            self.assertEqual(mail.dispatch_pending(connection=connection)['retry'], 2)
+        self.assertEqual({self.status(email) for email in emails}, {(OutboundEmail.Status.PENDING, 1)})
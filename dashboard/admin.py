@@ -1,3 +1,9 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import DashboardMetric
+
+
+@admin.register(DashboardMetric)
+class DashboardMetricAdmin(admin.ModelAdmin):
+    list_display = ('key', 'refreshed_at')
+    readonly_fields = ('key', 'data', 'refreshed_at')
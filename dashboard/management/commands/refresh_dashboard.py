@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from dashboard.metrics import SECTIONS, refresh_metrics
+
+
+class Command(BaseCommand):
+    help = '重新計算首頁 KPI 彙總，可由排程定期執行（涵蓋批次更新等不會觸發 signal 的變更）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--section',
+            action='append',
+            choices=list(SECTIONS),
+            help='只重算指定區塊，可重複指定；未指定時重算全部'
+        )
+
+    def handle(self, *args, **options):
+        results = refresh_metrics(options.get('section'))
+        for key, data in results.items():
+            self.stdout.write(f'{key}: {data}')
+        self.stdout.write(self.style.SUCCESS('首頁統計更新完成'))
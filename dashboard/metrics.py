@@ -0,0 +1,122 @@
+"""
+Dashboard KPI summaries
+
+Each dashboard block (cases, VAT, payments, tax audits) is computed by one
+aggregate query and stored as a DashboardMetric row, so the home page reads
+a handful of small rows instead of aggregating every table per request.
+
+Blocks are refreshed by a background worker after a related model is saved
+or deleted (see dashboard.signals), so the aggregates never run inside the
+writing request. Bulk writes (queryset.update, bulk_create) do not
+send signals, so rows older than DASHBOARD_MAX_AGE, or computed on a
+previous day (overdue counts depend on today's date), are recomputed on
+read; the refresh_dashboard command can also run from cron.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from booking.models import TaxAuditRecord, VATRecord
+from payment.models import PaymentTransaction
+from registration.progress.services import get_case_statistics, get_open_cases, get_overdue_cases
+
+from .models import DashboardMetric
+
+DASHBOARD_MAX_AGE = timedelta(minutes=10)
+
+
+def _case_metrics(today):
+    """登記案件：各狀態數量、進行中與逾期件數"""
+    return {
+        'by_status': get_case_statistics(),
+        'open': get_open_cases().count(),
+        'overdue': get_overdue_cases(today).count(),
+    }
+
+
+def _vat_metrics(today):
+    """營業稅：最新申報期別的完成率（排除非營業人）"""
+    latest = VATRecord.objects.order_by('-filing_year', '-filing_period').values(
+        'filing_year', 'filing_period'
+    ).first()
+    if not latest:
+        return {'filing_year': None, 'filing_period': None, 'total': 0, 'completed': 0, 'completion_rate': 0}
+
+    counts = VATRecord.objects.exclude(customer__business_type='non_business').filter(
+        **latest
+    ).aggregate(
+        total=Count('pk'),
+        completed=Count('pk', filter=Q(completion_status='completed')),
+    )
+    rate = round(counts['completed'] * 100 / counts['total']) if counts['total'] else 0
+    return {**latest, **counts, 'completion_rate': rate}
+
+
+def _payment_metrics(today):
+    """金流：待付款交易筆數與金額"""
+    totals = PaymentTransaction.objects.filter(
+        status=PaymentTransaction.Status.PENDING
+    ).aggregate(count=Count('pk'), amount=Sum('amount'))
+    return {'unpaid': totals['count'], 'unpaid_amount': int(totals['amount'] or 0)}
+
+
+def _audit_metrics(today):
+    """查帳：討論中件數與超過預計回覆日期件數"""
+    return TaxAuditRecord.objects.filter(progress='discussing').aggregate(
+        open=Count('pk'),
+        overdue=Count('pk', filter=Q(expected_reply_date__lt=today)),
+    )
+
+
+SECTIONS = {
+    'cases': _case_metrics,
+    'vat': _vat_metrics,
+    'payments': _payment_metrics,
+    'audits': _audit_metrics,
+}
+
+
+def refresh_metrics(keys=None):
+    """
+    Recompute dashboard blocks and store them.
+
+    Args:
+        keys: Block names to refresh (default: every block)
+
+    Returns:
+        dict: {block name: data}
+    """
+    today = timezone.localdate()
+    results = {}
+    for key in keys or SECTIONS:
+        data = SECTIONS[key](today)
+        DashboardMetric.objects.update_or_create(key=key, defaults={'data': data})
+        results[key] = data
+    return results
+
+
+def get_dashboard_metrics():
+    """
+    Dashboard blocks for the home page.
+
+    Reads every stored block with one query and recomputes only the blocks
+    that are missing or stale.
+
+    Returns:
+        dict: {block name: data}
+    """
+    now = timezone.now()
+    today = timezone.localdate(now)
+    metrics = {}
+    stale = []
+    for metric in DashboardMetric.objects.filter(key__in=SECTIONS):
+        if now - metric.refreshed_at > DASHBOARD_MAX_AGE or timezone.localdate(metric.refreshed_at) != today:
+            stale.append(metric.key)
+        else:
+            metrics[metric.key] = metric.data
+
+    stale.extend(key for key in SECTIONS if key not in metrics and key not in stale)
+    if stale:
+        metrics.update(refresh_metrics(stale))
+    return metrics
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True, verbose_name='區塊')),
+                ('data', models.JSONField(default=dict, verbose_name='彙總資料')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+            ],
+            options={
+                'verbose_name': '首頁統計',
+                'verbose_name_plural': '首頁統計',
+                'db_table': 'dashboard_metric',
+                'ordering': ['key'],
+            },
+        ),
+    ]
@@ -1,3 +1,27 @@
 from django.db import models
 
-# Create your models here.
+
+class DashboardMetric(models.Model):
+    """首頁 KPI 彙總（每個區塊一筆，由 dashboard.metrics 維護）"""
+    key = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name='區塊'
+    )
+    data = models.JSONField(
+        default=dict,
+        verbose_name='彙總資料'
+    )
+    refreshed_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='更新時間'
+    )
+
+    class Meta:
+        db_table = 'dashboard_metric'
+        verbose_name = '首頁統計'
+        verbose_name_plural = '首頁統計'
+        ordering = ['key']
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,86 @@
+"""
+Refresh dashboard blocks in the background when their source models change.
+
+A save only adds its block to the thread's pending set for the current
+transaction; the set is handed over after commit, when the first of that
+transaction's on_commit callbacks runs (the others find it empty). A
+single background worker then refreshes each dirty block once, merging
+blocks dirtied by transactions that commit while it is busy, so the
+aggregates never run on the request path.
+
+Blocks pending in a transaction that rolls back stay in the set and are
+refreshed with the next commit of the thread, which only costs an extra
+refresh.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_delete, post_save
+
+from booking.models import BookingCustomer, TaxAuditRecord, VATRecord
+from payment.models import PaymentTransaction
+from registration.models import RegistrationProgress
+
+from .metrics import SECTIONS, refresh_metrics
+
+logger = logging.getLogger(__name__)
+
+# 來源模型 -> 受影響的首頁區塊
+SOURCE_MODELS = {
+    RegistrationProgress: 'cases',
+    VATRecord: 'vat',
+    BookingCustomer: 'vat',
+    PaymentTransaction: 'payments',
+    TaxAuditRecord: 'audits',
+}
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dashboard-refresh')
+# 各 thread、各資料庫別名目前交易中待重算的區塊
+_pending = threading.local()
+# 已提交、等待背景重算的區塊
+_dirty = set()
+_dirty_lock = threading.Lock()
+
+
+def _schedule_refresh(sender, using=None, **kwargs):
+    alias = using or DEFAULT_DB_ALIAS
+    _pending.__dict__.setdefault(alias, set()).add(SOURCE_MODELS[sender])
+    # 交易提交後才交給背景重算（autocommit 時立即執行）
+    transaction.on_commit(partial(_flush, alias), using=alias)
+
+
+def _flush(alias):
+    """Hand the blocks of the committed transaction to the background worker."""
+    blocks = _pending.__dict__.pop(alias, None)
+    if not blocks:
+        return
+    with _dirty_lock:
+        # 已有待執行的重算時，新區塊併入同一次
+        scheduled = bool(_dirty)
+        _dirty.update(blocks)
+    if not scheduled:
+        _executor.submit(_run_in_worker)
+
+
+def _run_in_worker():
+    with _dirty_lock:
+        keys = [key for key in SECTIONS if key in _dirty]
+        _dirty.clear()
+    try:
+        if keys:
+            refresh_metrics(keys)
+    except Exception:
+        # 失敗時只記錄錯誤；讀取時過期的區塊仍會重算
+        logger.exception('Dashboard refresh failed for %s', keys)
+    finally:
+        # 背景執行緒各自持有資料庫連線，處理完即關閉
+        connections.close_all()
+
+
+def connect():
+    for model in SOURCE_MODELS:
+        post_save.connect(_schedule_refresh, sender=model, dispatch_uid=f'dashboard_{model._meta.label}_save')
+        post_delete.connect(_schedule_refresh, sender=model, dispatch_uid=f'dashboard_{model._meta.label}_delete')
@@ -1,3 +1,65 @@
+from unittest import mock
+from django.db import transaction
 from django.test import TestCase
+from registration.models import RegistrationProgress
+from booking.models import BookingCustomer
+from . import signals
 
-# Create your tests here.
+
+def create_customer(company_id):
+    return BookingCustomer.objects.create(
+        company_id=company_id, company_name='測試公司', registration_address='台北市', contact_person='聯絡人'
+    )
+
+
+@mock.patch.object(signals, '_executor')
+class DashboardRefreshSignalTests(TestCase):
+    """寫入只標記區塊；交易提交後交給背景重算，每個區塊只重算一次"""
+
+    def setUp(self):
+        signals._dirty.clear()
+        signals._pending.__dict__.clear()
+
+    def run_worker(self):
+        with mock.patch.object(signals, 'refresh_metrics') as refresh_metrics, \
+                mock.patch.object(signals, 'connections'):
+            signals._run_in_worker()
+        return refresh_metrics
+
+    def test_blocks_refreshed_once_after_commit(self, executor):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                RegistrationProgress.objects.create()
+            create_customer('10000001')
+            create_customer('10000002')
+            executor.submit.assert_not_called()
+
+        executor.submit.assert_called_once_with(signals._run_in_worker)
+        self.run_worker().assert_called_once_with(['cases', 'vat'])
+        self.assertEqual(signals._dirty, set())
+
+    def test_commits_before_worker_runs_are_merged(self, executor):
+        with self.captureOnCommitCallbacks(execute=True):
+            RegistrationProgress.objects.create()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_customer('10000001')
+
+        executor.submit.assert_called_once()
+        self.run_worker().assert_called_once_with(['cases', 'vat'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_customer('10000002')
+        self.assertEqual(executor.submit.call_count, 2)
+
+    def test_rolled_back_blocks_ride_on_next_commit(self, executor):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    RegistrationProgress.objects.create()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            create_customer('10000001')
+
+        executor.submit.assert_called_once()
+        self.run_worker().assert_called_once_with(['cases', 'vat'])
@@ -1,7 +1,19 @@
 from django.shortcuts import render
 
-def index(request):
-    """Dashboard 首頁視圖"""
-    return render(request, 'dashboard/index.html')
+from registration.models import RegistrationProgress
+
+from .metrics import get_dashboard_metrics
 
 
+def index(request):
+    """Dashboard 首頁視圖"""
+    metrics = get_dashboard_metrics()
+    by_status = metrics['cases']['by_status']
+    context = {
+        'metrics': metrics,
+        'case_status_rows': [
+            (label, by_status.get(status, 0))
+            for status, label in RegistrationProgress.STATUS_CHOICES
+        ],
+    }
+    return render(request, 'dashboard/index.html', context)
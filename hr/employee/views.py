@@ -2,6 +2,7 @@ from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.http import HttpResponseRedirect
+from core.navigation import KeysetNavigationMixin
 from hr.models import Employee
 from .forms import EmployeeForm
 
@@ -34,32 +35,22 @@ class EmployeeCreateView(CreateView):
         messages.success(self.request, '員工資料已成功建立')
         return super().form_valid(form)
 
-class EmployeeUpdateView(UpdateView):
+class EmployeeUpdateView(KeysetNavigationMixin, UpdateView):
     model = Employee
     form_class = EmployeeForm
     template_name = 'hr/employee/form.html'
     success_url = reverse_lazy('hr:employee_list')
+    # Prev/Next 依列表順序 (employee_id) 及在職狀態篩選
+    navigation_ordering = ('employee_id', 'pk')
+    navigation_filters = {'status': 'status'}
+    navigation_filter_defaults = {'status': 'active'}
 
     def form_valid(self, form):
         messages.success(self.request, '員工資料已成功更新')
         return super().form_valid(form)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        # Get all employees ordered by employee_id as per model Meta
-        employees = list(Employee.objects.filter(is_deleted=False).values_list('pk', flat=True))
-        current_pk = self.object.pk
-        try:
-            index = employees.index(current_pk)
-            previous_pk = employees[index - 1] if index > 0 else None
-            next_pk = employees[index + 1] if index < len(employees) - 1 else None
-        except ValueError:
-            previous_pk = None
-            next_pk = None
-        
-        context['previous_pk'] = previous_pk
-        context['next_pk'] = next_pk
-        return context
+    def get_navigation_queryset(self):
+        return Employee.objects.filter(is_deleted=False)
 
 class EmployeeDeleteView(DeleteView):
     model = Employee
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:03
+
+import django.db.models.manager
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0003_employee_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='employee',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['status', 'employee_id'], name='employee_live_status_idx'),
+        ),
+    ]
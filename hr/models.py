@@ -1,4 +1,5 @@
 from django.db import models
+from core.managers import SoftDeleteManager
 from django.urls import reverse
 
 class Employee(models.Model):
@@ -53,6 +54,10 @@ class Employee(models.Model):
     extension = models.CharField(max_length=10, blank=True, null=True, verbose_name='分機號碼')
     is_deleted = models.BooleanField(default=False, verbose_name='是否刪除')
 
+    # all_objects 需宣告在前，作為預設 manager（admin、唯一值檢查可看到已刪除資料）
+    all_objects = SoftDeleteManager(include_deleted=True)
+    objects = SoftDeleteManager()
+
     def __str__(self):
         return f"{self.employee_id} - {self.name}"
 
@@ -60,3 +65,7 @@ class Employee(models.Model):
         verbose_name = '員工資料'
         verbose_name_plural = '員工資料'
         ordering = ['employee_id']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['status', 'employee_id'], name='employee_live_status_idx', condition=models.Q(is_deleted=False)),
+        ]
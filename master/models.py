@@ -1,4 +1,18 @@
-from django.db import models
+import threading
+import time
+import uuid
+from django.core.cache import caches
+from django.db import models, transaction
+
+# SystemParameter 快取：各 process 保留一份本地副本，並以共用快取中的版本號判斷是否過期
+SYSTEM_PARAMETER_CACHE_KEY = 'system_parameter:values'
+SYSTEM_PARAMETER_VERSION_KEY = 'system_parameter:version'
+SYSTEM_PARAMETER_RECHECK_SECONDS = 5
+# 版本號須所有 worker 一致，放在共用（資料庫）快取；預設的 LocMemCache 只在單一 process 內有效
+SYSTEM_PARAMETER_CACHE_ALIAS = 'shared'
+
+_system_parameter_lock = threading.Lock()
+_system_parameter_local = {'values': None, 'version': None, 'checked_at': 0.0}
 
 class ServiceItem(models.Model):
     service_code = models.CharField(max_length=50, unique=True, verbose_name='服務代碼')
@@ -67,14 +81,65 @@ class SystemParameter(models.Model):
     def save(self, *args, **kwargs):
         self.pk = 1
         super(SystemParameter, self).save(*args, **kwargs)
+        transaction.on_commit(SystemParameter.invalidate_cache)
 
     def delete(self, *args, **kwargs):
         pass
 
     @classmethod
     def load(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
-        return obj
+        """
+        取得系統參數（單例）
+
+        先讀本地副本；每 SYSTEM_PARAMETER_RECHECK_SECONDS 秒比對一次共用快取的
+        版本號，版本變更時才重新讀取，因此一般呼叫不產生任何資料庫查詢。
+        每次回傳新的 instance，呼叫端修改不會影響快取。
+        """
+        local = _system_parameter_local
+        now = time.monotonic()
+
+        with _system_parameter_lock:
+            if local['values'] is not None and now - local['checked_at'] < SYSTEM_PARAMETER_RECHECK_SECONDS:
+                return cls._from_values(local['values'])
+
+        cache = caches[SYSTEM_PARAMETER_CACHE_ALIAS]
+        version = cache.get(SYSTEM_PARAMETER_VERSION_KEY)
+        if version is None:
+            cache.add(SYSTEM_PARAMETER_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(SYSTEM_PARAMETER_VERSION_KEY)
+
+        with _system_parameter_lock:
+            if local['values'] is not None and local['version'] == version:
+                local['checked_at'] = now
+                return cls._from_values(local['values'])
+
+        cached = cache.get(SYSTEM_PARAMETER_CACHE_KEY)
+        if cached is not None and cached['version'] == version:
+            values = cached['values']
+        else:
+            obj, created = cls.objects.get_or_create(pk=1)
+            values = {field.attname: getattr(obj, field.attname) for field in cls._meta.concrete_fields}
+            cache.set(SYSTEM_PARAMETER_CACHE_KEY, {'version': version, 'values': values}, None)
+
+        with _system_parameter_lock:
+            local['values'] = values
+            local['version'] = version
+            local['checked_at'] = now
+        return cls._from_values(values)
+
+    @classmethod
+    def _from_values(cls, values):
+        return cls.from_db(None, list(values), list(values.values()))
+
+    @staticmethod
+    def invalidate_cache():
+        """更換版本號，讓所有 worker 在下次比對時重新讀取系統參數"""
+        cache = caches[SYSTEM_PARAMETER_CACHE_ALIAS]
+        cache.set(SYSTEM_PARAMETER_VERSION_KEY, uuid.uuid4().hex, None)
+        cache.delete(SYSTEM_PARAMETER_CACHE_KEY)
+        with _system_parameter_lock:
+            _system_parameter_local['values'] = None
+            _system_parameter_local['version'] = None
 
     def __str__(self):
         return "系統參數設定"
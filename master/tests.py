@@ -1,3 +1,39 @@
+from django.core.cache import caches
 from django.test import TestCase
+from . import models as master_models
+from .models import SystemParameter
 
-# Create your tests here.
+
+class SystemParameterCacheTests(TestCase):
+    """系統參數的版本號放在共用快取，其他 worker 的修改在下次比對時生效"""
+
+    def setUp(self):
+        SystemParameter.invalidate_cache()
+        SystemParameter.objects.update_or_create(pk=1, defaults={'line_access_token': 'old-token'})
+        SystemParameter.invalidate_cache()
+
+    def expire_local_copy(self):
+        master_models._system_parameter_local['checked_at'] = 0.0
+
+    def test_local_copy_served_without_queries(self):
+        self.assertEqual(SystemParameter.load().line_access_token, 'old-token')
+        with self.assertNumQueries(0):
+            self.assertEqual(SystemParameter.load().line_access_token, 'old-token')
+
+    def test_change_from_other_worker(self):
+        self.assertEqual(SystemParameter.load().line_access_token, 'old-token')
+
+        # 模擬另一個 worker 儲存：只會更換共用快取中的版本號，本 process 的副本不受影響
+        SystemParameter.objects.filter(pk=1).update(line_access_token='new-token')
+        caches['shared'].set(master_models.SYSTEM_PARAMETER_VERSION_KEY, 'other-worker', None)
+        self.assertEqual(SystemParameter.load().line_access_token, 'old-token')
+
+        self.expire_local_copy()
+        self.assertEqual(SystemParameter.load().line_access_token, 'new-token')
+
+    def test_save_invalidates_on_commit(self):
+        parameter = SystemParameter.load()
+        parameter.line_access_token = 'new-token'
+        with self.captureOnCommitCallbacks(execute=True):
+            parameter.save()
+        self.assertEqual(SystemParameter.load().line_access_token, 'new-token')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PaymentProvider, PaymentTransaction
+from .models import PaymentProvider, PaymentTransaction, PaymentNotification
 
 @admin.register(PaymentProvider)
 class PaymentProviderAdmin(admin.ModelAdmin):
@@ -13,3 +13,10 @@ class PaymentTransactionAdmin(admin.ModelAdmin):
     list_filter = ('status', 'provider', 'currency')
     search_fields = ('merchant_trade_no', 'trade_no')
     readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(PaymentNotification)
+class PaymentNotificationAdmin(admin.ModelAdmin):
+    list_display = ('merchant_trade_no', 'provider_code', 'status', 'received_at', 'processed_at')
+    list_filter = ('status', 'provider_code')
+    search_fields = ('merchant_trade_no',)
+    readonly_fields = ('received_at', 'processed_at')
@@ -0,0 +1,74 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q, Sum
+from django.urls import reverse
+from payment.services import create_payments, checkout_url
+from registration.models import RegistrationMandate, RegistrationProgress
+
+
+class Command(BaseCommand):
+    help = '批次為登記案件建立綠界付款交易，並輸出可透過 LINE 或 Email 發送的付款連結'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url',
+            required=True,
+            help='網站根網址，例如 https://firm.example.com'
+        )
+        parser.add_argument(
+            '--case',
+            type=int,
+            nargs='*',
+            help='指定登記案件 ID；未指定時依 --status 篩選'
+        )
+        parser.add_argument(
+            '--status',
+            default='new_case',
+            help='未指定 --case 時的案件狀態（預設 new_case）'
+        )
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+
+        cases = RegistrationProgress.objects.filter(is_deleted=False)
+        if options['case']:
+            cases = cases.filter(pk__in=options['case'])
+        else:
+            cases = cases.filter(status=options['status'])
+
+        cases = cases.annotate(
+            fee_total=Sum('services__fee', filter=Q(services__is_deleted=False)),
+            mandate_delivery_method=F('mandate__delivery_method')
+        ).order_by('pk')
+
+        items = []
+        for case in cases:
+            amount = case.fee_total or 0
+            # 與委任書付款相同：委任書選擇郵寄交付時加收郵資
+            if case.mandate_delivery_method == 'post':
+                amount += RegistrationMandate.POSTAGE_FEE
+            if amount > 0:
+                items.append((case, amount, case.case_number))
+
+        if not items:
+            raise CommandError('沒有需要建立付款的案件')
+
+        started = time.perf_counter()
+        transactions = create_payments(
+            items,
+            return_url=base_url + reverse('ecpay_callback'),
+            client_back_url=lambda case: base_url + reverse(
+                'registration:progress:edit', kwargs={'pk': case.pk}
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+        for tx in transactions:
+            self.stdout.write(f"{tx.trade_no}\t{tx.amount}\t{checkout_url(tx, base_url)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f'已建立 {len(transactions)} 筆付款交易，耗時 {elapsed:.2f} 秒'
+        ))
+        skipped = len(items) - len(transactions)
+        if skipped:
+            self.stdout.write(f'略過 {skipped} 件已有待付款或已付款交易的案件')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from payment.notifications import process_pending_notifications
+
+
+class Command(BaseCommand):
+    help = '處理尚未套用的金流通知（例如背景執行緒中斷後遺留者），可由排程定期執行'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=60,
+            help='只處理收到超過指定秒數的通知（預設 60）'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=1000,
+            help='單次最多處理筆數（預設 1000）'
+        )
+
+    def handle(self, *args, **options):
+        count = process_pending_notifications(options['older_than'], options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'已處理 {count} 筆金流通知'))
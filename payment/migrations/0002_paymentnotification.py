@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider_code', models.SlugField(verbose_name='Provider Code')),
+                ('merchant_trade_no', models.CharField(max_length=64, verbose_name='Merchant Trade No')),
+                ('check_mac_value', models.CharField(max_length=128, verbose_name='CheckMacValue')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Payload')),
+                ('status', models.CharField(choices=[('RECEIVED', 'Received'), ('PROCESSED', 'Processed'), ('DUPLICATE', 'Duplicate'), ('FAILED', 'Failed')], default='RECEIVED', max_length=20, verbose_name='Status')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Payment Notification',
+                'verbose_name_plural': 'Payment Notifications',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['merchant_trade_no'], name='payment_notify_trade_no_idx'), models.Index(fields=['status', 'received_at'], name='payment_notify_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('provider_code', 'merchant_trade_no', 'check_mac_value'), name='unique_payment_notification')],
+            },
+        ),
+    ]
@@ -61,3 +61,47 @@ class PaymentTransaction(models.Model):
 
     def __str__(self):
         return f"{self.merchant_trade_no} ({self.status})"
+
+
+class PaymentNotification(models.Model):
+    """
+    Raw server-side notification from a payment provider.
+
+    Stored and acknowledged immediately by the callback view, then applied to
+    the PaymentTransaction by payment.notifications in the background.
+    """
+    class Status(models.TextChoices):
+        RECEIVED = 'RECEIVED', _('Received')
+        PROCESSED = 'PROCESSED', _('Processed')
+        DUPLICATE = 'DUPLICATE', _('Duplicate')
+        FAILED = 'FAILED', _('Failed')
+
+    provider_code = models.SlugField(_("Provider Code"), max_length=50)
+    merchant_trade_no = models.CharField(_("Merchant Trade No"), max_length=64)
+    check_mac_value = models.CharField(_("CheckMacValue"), max_length=128)
+    payload = models.JSONField(_("Payload"), default=dict, blank=True)
+
+    status = models.CharField(_("Status"), max_length=20, choices=Status.choices, default=Status.RECEIVED)
+    error = models.TextField(_("Error"), blank=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-received_at']
+        verbose_name = _("Payment Notification")
+        verbose_name_plural = _("Payment Notifications")
+        constraints = [
+            # 綠界重送的通知內容相同，以簽章去重
+            models.UniqueConstraint(
+                fields=['provider_code', 'merchant_trade_no', 'check_mac_value'],
+                name='unique_payment_notification'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['merchant_trade_no'], name='payment_notify_trade_no_idx'),
+            models.Index(fields=['status', 'received_at'], name='payment_notify_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.merchant_trade_no} ({self.status})"
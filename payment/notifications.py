@@ -0,0 +1,186 @@
+"""
+ECPay callback pipeline
+
+The callback view only verifies the CheckMacValue, stores the raw
+notification and acknowledges with "1|OK". Applying the result to the
+PaymentTransaction happens on a small background thread pool after the
+notification is committed; notifications left in RECEIVED (e.g. after a
+restart) are swept by the process_payment_notifications command.
+
+ECPay retries a notification until it gets "1|OK", so retries are dropped
+at three levels: a short-lived cache key, the unique constraint on
+(provider, merchant_trade_no, CheckMacValue), and the transaction status
+check while processing. The unique constraint is authoritative: the cache
+key is only set once the notification is committed, so a failed insert
+never acknowledges a notification that was not stored.
+
+A declined payment leaves the transaction PENDING (the attempt is kept in
+response_data['failed_attempts']), so its hosted checkout link can be
+used again with a fresh MerchantTradeNo.
+"""
+import hmac
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .models import PaymentNotification, PaymentTransaction
+from .services import ECPayAdapter, TRANSACTION_REF_FIELD
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_CODE = 'ecpay'
+DEDUP_CACHE_SECONDS = 600
+WORKER_THREADS = 2
+
+_executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix='payment-notify')
+
+
+def verify_check_mac_value(params):
+    """
+    Verify the CheckMacValue of an ECPay notification.
+
+    Args:
+        params: Dict of the POSTed fields, including CheckMacValue
+
+    Returns:
+        bool: True if the signature matches
+    """
+    received = params.get('CheckMacValue', '')
+    fields = {k: v for k, v in params.items() if k != 'CheckMacValue'}
+    expected = ECPayAdapter().generate_check_mac_value(fields)
+    return bool(received) and hmac.compare_digest(received.upper(), expected)
+
+
+def record_notification(params):
+    """
+    Store a verified notification and queue it for processing.
+
+    Args:
+        params: Dict of the POSTed fields
+
+    Returns:
+        bool: True if this is a new notification, False for a retry
+    """
+    merchant_trade_no = params.get('MerchantTradeNo', '')
+    check_mac_value = params.get('CheckMacValue', '').upper()
+
+    # 回呼風暴時，已入庫的重送通知在快取層就直接略過，不觸及資料庫
+    dedup_key = f'payment_notify:{PROVIDER_CODE}:{merchant_trade_no}:{check_mac_value}'
+    if cache.get(dedup_key):
+        return False
+
+    # 是否重複以資料庫的唯一約束為準；快取鍵只在通知確實提交後才設定，
+    # 其他資料庫錯誤會往外拋出（回應非 1|OK），讓綠界重送時仍能寫入
+    try:
+        with transaction.atomic():
+            notification = PaymentNotification.objects.create(
+                provider_code=PROVIDER_CODE,
+                merchant_trade_no=merchant_trade_no,
+                check_mac_value=check_mac_value,
+                payload=params
+            )
+            transaction.on_commit(lambda: cache.set(dedup_key, 1, DEDUP_CACHE_SECONDS))
+            transaction.on_commit(lambda: enqueue(notification.pk))
+    except IntegrityError:
+        cache.set(dedup_key, 1, DEDUP_CACHE_SECONDS)
+        return False
+
+    return True
+
+
+def enqueue(notification_id):
+    """Process a notification on the background thread pool."""
+    _executor.submit(_run_in_worker, notification_id)
+
+
+def _run_in_worker(notification_id):
+    try:
+        process_notification(notification_id)
+    except Exception:
+        logger.exception('Failed to process payment notification %s', notification_id)
+    finally:
+        # 背景執行緒各自持有資料庫連線，處理完即關閉
+        connections.close_all()
+
+
+def _parse_payment_date(value):
+    try:
+        return timezone.make_aware(datetime.strptime(value, '%Y/%m/%d %H:%M:%S'))
+    except (TypeError, ValueError):
+        return timezone.now()
+
+
+def process_notification(notification_id):
+    """
+    Apply a stored notification to its PaymentTransaction.
+
+    Args:
+        notification_id: PaymentNotification ID
+
+    Returns:
+        PaymentNotification status after processing, or None if it had
+        already been processed
+    """
+    with transaction.atomic():
+        notification = PaymentNotification.objects.select_for_update().filter(
+            pk=notification_id,
+            status=PaymentNotification.Status.RECEIVED
+        ).first()
+        if notification is None:
+            return None
+
+        payload = notification.payload
+        # 付款連結每次付款都使用新的 MerchantTradeNo，原交易編號由 CustomField1 帶回
+        payment = PaymentTransaction.objects.select_for_update().filter(
+            merchant_trade_no=payload.get(TRANSACTION_REF_FIELD) or notification.merchant_trade_no
+        ).first()
+
+        if payment is None:
+            notification.status = PaymentNotification.Status.FAILED
+            notification.error = 'Unknown MerchantTradeNo'
+        elif payment.status == PaymentTransaction.Status.SUCCESS:
+            notification.status = PaymentNotification.Status.DUPLICATE
+        elif str(payload.get('TradeAmt', '')) not in ('', str(int(payment.amount))):
+            notification.status = PaymentNotification.Status.FAILED
+            notification.error = f"TradeAmt {payload.get('TradeAmt')} does not match {payment.amount}"
+        else:
+            # trade_no 保留案件編號，綠界交易資料存於 response_data
+            if str(payload.get('RtnCode')) == '1':
+                payment.status = PaymentTransaction.Status.SUCCESS
+                payment.payment_time = _parse_payment_date(payload.get('PaymentDate'))
+                payment.response_data = {**payment.response_data, 'callback': payload}
+            else:
+                # 付款失敗（例如刷卡被拒）維持 PENDING，付款連結可再次付款；失敗紀錄保留在 response_data
+                failed_attempts = payment.response_data.get('failed_attempts', [])
+                payment.response_data = {**payment.response_data, 'failed_attempts': [*failed_attempts, payload]}
+            payment.save(update_fields=['status', 'payment_time', 'response_data', 'updated_at'])
+            notification.status = PaymentNotification.Status.PROCESSED
+
+        notification.processed_at = timezone.now()
+        notification.save(update_fields=['status', 'error', 'processed_at'])
+
+    return notification.status
+
+
+def process_pending_notifications(older_than_seconds=60, limit=1000):
+    """
+    Process notifications still in RECEIVED, e.g. after a worker restart.
+
+    Returns:
+        int: number of notifications processed
+    """
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    pending_ids = PaymentNotification.objects.filter(
+        status=PaymentNotification.Status.RECEIVED,
+        received_at__lte=cutoff
+    ).order_by('received_at').values_list('pk', flat=True)[:limit]
+
+    processed = 0
+    for notification_id in list(pending_ids):
+        if process_notification(notification_id) is not None:
+            processed += 1
+    return processed
@@ -7,6 +7,9 @@ from django.contrib.contenttypes.models import ContentType
 from master.models import SystemParameter
 from .models import PaymentTransaction, PaymentProvider
 
+# 綠界會在付款通知中原樣回傳 CustomField1，用來帶回 PaymentTransaction 的 merchant_trade_no
+TRANSACTION_REF_FIELD = 'CustomField1'
+
 class ECPayAdapter:
     def __init__(self):
         params = SystemParameter.load()
@@ -57,9 +60,15 @@ class ECPayAdapter:
         m.update(encoded.encode('utf-8'))
         return m.hexdigest().upper()
 
-    def create_payment_html(self, transaction, return_url, client_back_url=None):
+    def create_payment_html(self, transaction, return_url, client_back_url=None, merchant_trade_no=None):
         """
         Generates the HTML form to auto-submit to ECPay.
+
+        Args:
+            merchant_trade_no: MerchantTradeNo of this attempt; when it differs
+                               from transaction.merchant_trade_no, the latter is
+                               sent in TRANSACTION_REF_FIELD so the notification
+                               can be mapped back to the transaction
         """
         # Prepare parameters
         now_str = datetime.now().strftime("%Y/%m/%d %H:%M:%S")
@@ -72,7 +81,7 @@ class ECPayAdapter:
 
         params = {
             'MerchantID': self.merchant_id,
-            'MerchantTradeNo': transaction.merchant_trade_no,
+            'MerchantTradeNo': merchant_trade_no or transaction.merchant_trade_no,
             'MerchantTradeDate': now_str,
             'PaymentType': 'aio',
             'TotalAmount': int(transaction.amount),
@@ -83,6 +92,9 @@ class ECPayAdapter:
             'EncryptType': '1',
         }
         
+        if merchant_trade_no and merchant_trade_no != transaction.merchant_trade_no:
+            params[TRANSACTION_REF_FIELD] = transaction.merchant_trade_no
+
         if client_back_url:
             params['ClientBackURL'] = client_back_url # Button "Back to Store"
             params['OrderResultURL'] = client_back_url # Redirect after payment (if ClientRedirect is on)
@@ -171,38 +183,42 @@ class ECPayAdapter:
         """
         return html
 
-def create_payment(source_obj, amount, merchant_trade_no, return_url, client_back_url=None):
+def build_merchant_trade_no(merchant_trade_no):
     """
-    Facade to create transaction and return HTML.
-    
-    Args:
-        merchant_trade_no: The base Identifier (e.g. Case Number).
-                           This function will sanitize it and append a suffix to ensure
-                           uniqueness for ECPay (Max 20 chars).
+    Make an ECPay MerchantTradeNo from a base identifier (e.g. Case Number).
+
+    Non-alphanumeric characters are removed and a random suffix is appended
+    so every attempt is unique for ECPay (max 20 chars).
     """
     import re
     import random
     import string
-    import time
-    
+
     # 1. Sanitize: Remove non-alphanumeric characters
     # e.g. "RO-20260127-R001" -> "RO20260127R001"
     safe_base_no = re.sub(r'[^a-zA-Z0-9]', '', merchant_trade_no)
-    
+
     # 2. Append Unique Suffix
     # ECPay max length is 20.
-    # We reserve 6 chars for uniqueness suffix (enough for timestamp tail + random)
-    # 4 chars random hex/alphanumeric allows 1.6M combinations, sufficient for retries.
+    # 4 chars random alphanumeric allows 1.6M combinations, sufficient for retries.
     # Let's use 4 chars suffix -> Max base length = 16.
-    
     max_base_len = 16
     truncated_base = safe_base_no[:max_base_len]
-    
-    # Generate suffix: e.g. last 2 digits of timestamp + 2 random chars
-    # Or just 4 random chars.
     suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
+
+    return f"{truncated_base}{suffix}"
+
+
+def create_payment(source_obj, amount, merchant_trade_no, return_url, client_back_url=None):
+    """
+    Facade to create transaction and return HTML.
     
-    final_trade_no = f"{truncated_base}{suffix}"
+    Args:
+        merchant_trade_no: The base Identifier (e.g. Case Number).
+                           This function will sanitize it and append a suffix to ensure
+                           uniqueness for ECPay (Max 20 chars).
+    """
+    final_trade_no = build_merchant_trade_no(merchant_trade_no)
     
     # 3. Create Transaction Record
     provider, _ = PaymentProvider.objects.get_or_create(code='ecpay', defaults={'name': 'ECPay'})
@@ -225,3 +241,100 @@ def create_payment(source_obj, amount, merchant_trade_no, return_url, client_bac
     
     # 3. Generate HTML
     return adapter.create_payment_html(tx, return_url, client_back_url)
+
+
+def create_payments(items, return_url, client_back_url=None, batch_size=500):
+    """
+    Create PENDING transactions for many source objects at once.
+
+    The provider and content types are looked up once and the rows are
+    written with bulk_create. The ECPay form is rendered later by the
+    checkout view, so each transaction only needs its hosted link
+    (see checkout_url). Source objects that already have a PENDING or
+    SUCCESS transaction are skipped, so re-running a batch never bills
+    them twice.
+
+    Args:
+        items: Iterable of (source_obj, amount, merchant_trade_no) tuples;
+               merchant_trade_no is the base identifier as in create_payment
+        return_url: Absolute server-side callback URL
+        client_back_url: Absolute URL or callable(source_obj) returning one
+        batch_size: Rows per INSERT
+
+    Returns:
+        List of created PaymentTransaction
+    """
+    provider, _ = PaymentProvider.objects.get_or_create(code='ecpay', defaults={'name': 'ECPay'})
+    content_types = {}
+
+    items = list(items)
+    for source_obj, amount, merchant_trade_no in items:
+        model = type(source_obj)
+        if model not in content_types:
+            content_types[model] = ContentType.objects.get_for_model(source_obj)
+
+    # 已有待付款或已付款交易的來源不再建立，避免重複請款
+    billed = set()
+    for model, content_type in content_types.items():
+        billed.update(PaymentTransaction.objects.filter(
+            content_type=content_type,
+            object_id__in=[source_obj.pk for source_obj, _, _ in items if type(source_obj) is model],
+            status__in=[PaymentTransaction.Status.PENDING, PaymentTransaction.Status.SUCCESS]
+        ).values_list('content_type_id', 'object_id'))
+
+    transactions = []
+    used_trade_nos = set()
+    for source_obj, amount, merchant_trade_no in items:
+        model = type(source_obj)
+        if (content_types[model].pk, source_obj.pk) in billed:
+            continue
+        billed.add((content_types[model].pk, source_obj.pk))
+
+        back_url = client_back_url(source_obj) if callable(client_back_url) else client_back_url
+        transactions.append(PaymentTransaction(
+            provider=provider,
+            merchant_trade_no=_new_trade_no(merchant_trade_no, used_trade_nos),
+            amount=amount,
+            content_type=content_types[model],
+            object_id=source_obj.pk,
+            status=PaymentTransaction.Status.PENDING,
+            trade_no=merchant_trade_no,
+            response_data={
+                'original_merchant_trade_no': merchant_trade_no,
+                'return_url': return_url,
+                'client_back_url': back_url,
+            }
+        ))
+
+    # 隨機尾碼也可能與既有交易相撞，重新產生後再寫入，避免整批 bulk_create 失敗
+    while transactions:
+        taken = set(PaymentTransaction.objects.filter(
+            merchant_trade_no__in=[tx.merchant_trade_no for tx in transactions]
+        ).values_list('merchant_trade_no', flat=True))
+        if not taken:
+            break
+        for tx in transactions:
+            if tx.merchant_trade_no in taken:
+                tx.merchant_trade_no = _new_trade_no(tx.trade_no, used_trade_nos)
+
+    return PaymentTransaction.objects.bulk_create(transactions, batch_size=batch_size)
+
+
+def _new_trade_no(merchant_trade_no, used_trade_nos):
+    """build_merchant_trade_no, retried until it is not in used_trade_nos (which it is added to)."""
+    final_trade_no = build_merchant_trade_no(merchant_trade_no)
+    while final_trade_no in used_trade_nos:
+        final_trade_no = build_merchant_trade_no(merchant_trade_no)
+    used_trade_nos.add(final_trade_no)
+    return final_trade_no
+
+
+def checkout_url(transaction, base_url):
+    """
+    Hosted payment link of a transaction, suitable for LINE or email.
+
+    Args:
+        transaction: PaymentTransaction
+        base_url: Site root, e.g. "https://firm.example.com"
+    """
+    return base_url.rstrip('/') + reverse('payment_checkout', kwargs={'pk': transaction.pk})
@@ -1,3 +1,129 @@
+import io
+import re
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
 from django.test import TestCase
+from django.urls import reverse
+from registration.models import RegistrationMandate, RegistrationProgress, RegistrationService
+from .models import PaymentNotification, PaymentTransaction
+from .notifications import process_notification, record_notification
+from .services import create_payments
 
-# Create your tests here.
+
+@mock.patch('payment.notifications.enqueue')
+class RecordNotificationTests(TestCase):
+    """綠界通知去重以資料庫唯一約束為準，寫入失敗時重送仍可入庫"""
+
+    params = {'MerchantTradeNo': 'SF0001', 'RtnCode': '1', 'TradeAmt': '100', 'CheckMacValue': 'abc'}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_retry_is_dropped(self, enqueue):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(record_notification(self.params))
+        self.assertFalse(record_notification(self.params))
+
+        cache.clear()
+        self.assertFalse(record_notification(self.params))
+        self.assertEqual(PaymentNotification.objects.count(), 1)
+        self.assertEqual(enqueue.call_count, 1)
+
+    def test_failed_insert_is_not_acknowledged(self, enqueue):
+        with mock.patch.object(PaymentNotification.objects, 'create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                record_notification(self.params)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(record_notification(self.params))
+        self.assertEqual(PaymentNotification.objects.count(), 1)
+        enqueue.assert_called_once()
+
+
+class CheckoutTests(TestCase):
+    """付款連結每次開啟都使用新的 MerchantTradeNo，付款通知仍對應回原交易"""
+
+    def setUp(self):
+        self.case = RegistrationProgress.objects.create()
+        self.payment, = create_payments([(self.case, 1000, self.case.case_number)], 'https://firm.example.com/notify')
+
+    def form_fields(self):
+        response = self.client.get(reverse('payment_checkout', kwargs={'pk': self.payment.pk}))
+        return dict(re.findall(r'name="(\w+)" value="([^"]*)"', response.content.decode()))
+
+    def test_each_attempt_gets_new_trade_no(self):
+        first, second = self.form_fields(), self.form_fields()
+
+        self.assertNotEqual(first['MerchantTradeNo'], second['MerchantTradeNo'])
+        self.assertNotEqual(first['MerchantTradeNo'], self.payment.merchant_trade_no)
+        self.assertEqual(first['CustomField1'], self.payment.merchant_trade_no)
+
+    def pay(self, rtn_code):
+        """開啟付款連結並模擬綠界的付款結果通知"""
+        fields = self.form_fields()
+        with mock.patch('payment.notifications.enqueue'):
+            record_notification({
+                'MerchantTradeNo': fields['MerchantTradeNo'],
+                'CustomField1': fields['CustomField1'],
+                'RtnCode': rtn_code,
+                'TradeAmt': '1000',
+                'CheckMacValue': fields['MerchantTradeNo'],
+            })
+        notification = PaymentNotification.objects.latest('received_at')
+        self.assertEqual(process_notification(notification.pk), PaymentNotification.Status.PROCESSED)
+        self.payment.refresh_from_db()
+
+    def test_notification_maps_back_to_transaction(self):
+        self.pay('1')
+        self.assertEqual(self.payment.status, PaymentTransaction.Status.SUCCESS)
+
+    def test_declined_payment_can_be_retried(self):
+        self.pay('10100058')
+        self.assertEqual(self.payment.status, PaymentTransaction.Status.PENDING)
+        self.assertEqual(len(self.payment.response_data['failed_attempts']), 1)
+
+        self.pay('1')
+        self.assertEqual(self.payment.status, PaymentTransaction.Status.SUCCESS)
+        response = self.client.get(reverse('payment_checkout', kwargs={'pk': self.payment.pk}))
+        self.assertEqual(response.status_code, 410)
+
+    def test_batch_avoids_existing_trade_no(self):
+        case = RegistrationProgress.objects.create()
+        taken = self.payment.merchant_trade_no
+        with mock.patch('payment.services.build_merchant_trade_no', side_effect=[taken, 'SFNEW0001']):
+            payment, = create_payments([(case, 500, case.case_number)], 'https://firm.example.com/notify')
+        self.assertEqual(payment.merchant_trade_no, 'SFNEW0001')
+
+
+class CreatePaymentLinksTests(TestCase):
+    """批次建立付款連結：重複執行不會重複請款，郵資依委任書的郵寄交付計算"""
+
+    def setUp(self):
+        self.mailed = RegistrationProgress.objects.create(status='new_case')
+        self.picked_up = RegistrationProgress.objects.create(status='new_case')
+        for case in (self.mailed, self.picked_up):
+            RegistrationService.objects.create(progress=case, fee=1000)
+        RegistrationMandate.objects.create(progress=self.mailed, delivery_method='post')
+        RegistrationMandate.objects.create(progress=self.picked_up, delivery_method='self')
+
+    def run_command(self):
+        call_command('create_payment_links', base_url='https://firm.example.com', stdout=io.StringIO())
+        return {tx.object_id: tx.amount for tx in PaymentTransaction.objects.all()}
+
+    def test_postage_for_mailed_cases(self):
+        self.assertEqual(self.run_command(), {
+            self.mailed.pk: 1000 + RegistrationMandate.POSTAGE_FEE,
+            self.picked_up.pk: 1000,
+        })
+
+    def test_rerun_skips_billed_cases(self):
+        self.run_command()
+        self.run_command()
+        self.assertEqual(PaymentTransaction.objects.count(), 2)
+
+        # 付款失敗的案件可重新建立
+        PaymentTransaction.objects.filter(object_id=self.picked_up.pk).update(status=PaymentTransaction.Status.FAILED)
+        self.run_command()
+        self.assertEqual(PaymentTransaction.objects.filter(object_id=self.picked_up.pk).count(), 2)
@@ -1,3 +1,47 @@
-from django.shortcuts import render
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
-# Create your views here.
+from .models import PaymentTransaction
+from .notifications import verify_check_mac_value, record_notification
+from .services import ECPayAdapter, build_merchant_trade_no
+
+
+@csrf_exempt
+@require_POST
+def ecpay_callback(request):
+    """
+    綠界付款結果通知 (ReturnURL)
+
+    驗證 CheckMacValue 後儲存原始通知並立即回覆 1|OK，
+    交易狀態於背景更新。
+    """
+    params = request.POST.dict()
+    if not verify_check_mac_value(params):
+        return HttpResponse('0|CheckMacValue Error', status=400)
+
+    record_notification(params)
+    return HttpResponse('1|OK')
+
+
+def checkout(request, pk):
+    """
+    付款連結頁面
+
+    以批次建立的交易產生綠界付款表單並自動送出；已付款或失效的交易不再導向綠界
+    （付款失敗的交易仍為 PENDING，可再次付款）。
+    綠界不接受重複的 MerchantTradeNo，每次開啟都產生新的交易編號，
+    付款通知再以 CustomField1 對應回原交易。
+    """
+    payment = get_object_or_404(PaymentTransaction, pk=pk)
+    if payment.status != PaymentTransaction.Status.PENDING:
+        return HttpResponse('此付款連結已失效', status=410)
+
+    return_url = payment.response_data.get('return_url') or request.build_absolute_uri(reverse('ecpay_callback'))
+    client_back_url = payment.response_data.get('client_back_url')
+    attempt_trade_no = build_merchant_trade_no(payment.trade_no or payment.merchant_trade_no)
+    return HttpResponse(ECPayAdapter().create_payment_html(
+        payment, return_url, client_back_url, merchant_trade_no=attempt_trade_no
+    ))
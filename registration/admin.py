@@ -9,14 +9,17 @@ class SoftDeleteAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         """顯示所有項目（包含已刪除），以便從垃圾桶救回"""
-        # 使用 un-filtered 的 manager (如果有的話)，這裡直接用 objects 
-        # 因為我們還沒在 Model 層強制過濾 objects，所以這裡預設會看到全部
-        return super().get_queryset(request)
+        # objects 只回傳未刪除資料，這裡改用 all_objects
+        qs = self.model.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            qs = qs.order_by(*ordering)
+        return qs
 
     @admin.action(description='還原已刪除的項目')
     def restore_deleted_items(self, request, queryset):
-        # 批量還原
-        updated_count = queryset.update(is_deleted=False)
+        # 批量還原（restore() 會經過模型的 QuerySet，例如同步持股餘額帳）
+        updated_count = queryset.restore()
         self.message_user(request, f"已成功還原 {updated_count} 筆資料。")
 
 
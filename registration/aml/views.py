@@ -10,7 +10,7 @@ def aml_update(request, pk):
     progress = get_object_or_404(RegistrationProgress, pk=pk)
     
     # Get or Create AML Record
-    aml, created = RegistrationAML.objects.get_or_create(progress=progress)
+    aml, created = RegistrationAML.all_objects.get_or_create(progress=progress)
     
     if request.method == 'POST':
         form = RegistrationAMLForm(request.POST, instance=aml)
@@ -0,0 +1,122 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from registration.models import RegistrationProgress
+from registration.progress.services import (
+    CLOSED_STATUSES, calculate_remaining_days, check_case_overdue, flag_overdue_cases, scan_open_cases
+)
+
+STATUSES = [status for status, _ in RegistrationProgress.STATUS_CHOICES]
+
+
+class Command(BaseCommand):
+    help = (
+        '量測案件期限計算：逐筆以 Python 計算（check_case_overdue / calculate_remaining_days）'
+        '與資料庫端 scan_open_cases()、flag_overdue_cases() 的比較。資料於交易中產生，結束時回滾'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', type=int, default=40000, help='產生的案件數（預設 40000）')
+        parser.add_argument('--explain', action='store_true', help='輸出 scan_open_cases() 的執行計畫')
+
+    def handle(self, *args, **options):
+        if options['cases'] < 1:
+            raise CommandError('--cases 至少為 1')
+
+        with transaction.atomic():
+            self.generate(options['cases'])
+            today = timezone.localdate()
+            python_result = self.measure('逐筆 Python 計算', self.python_scan)
+            database_result = self.measure('scan_open_cases()', lambda: self.database_scan(today))
+            if python_result != database_result:
+                raise CommandError('兩種計算的逾期案件或剩餘天數不一致')
+            self.stdout.write(f'結果一致：進行中 {len(database_result[0])} 件，逾期 {len(database_result[1])} 件')
+
+            with transaction.atomic():
+                changed = self.measure('逐筆更新逾期旗標', lambda: self.python_flag(today))
+                self.stdout.write(f'  更新 {changed} 件')
+                # 還原，讓 flag_overdue_cases() 從相同狀態開始
+                transaction.set_rollback(True)
+            flagged = self.measure('flag_overdue_cases()', lambda: flag_overdue_cases(today))
+            self.stdout.write(f'  {flagged}')
+            again = self.measure('flag_overdue_cases() 再次執行', lambda: flag_overdue_cases(today))
+            self.stdout.write(f'  {again}')
+
+            if options['explain']:
+                analyze = {'analyze': True} if connection.vendor == 'postgresql' else {}
+                self.stdout.write(scan_open_cases(today).explain(**analyze))
+            # 回滾產生的資料與旗標
+            transaction.set_rollback(True)
+
+    def generate(self, count):
+        rng = random.Random(20260127)
+        today = timezone.localdate()
+        started = time.perf_counter()
+        cases = []
+        for index in range(count):
+            accepted = today - timedelta(days=rng.randint(0, 365))
+            due = accepted + timedelta(days=rng.randint(10, 120)) if rng.random() > 0.05 else None
+            cases.append(RegistrationProgress(
+                case_number=f'BENCH-{index:07d}',
+                status=rng.choice(STATUSES),
+                acceptance_date=accepted,
+                due_date=due,
+            ))
+        RegistrationProgress.objects.bulk_create(cases, batch_size=5000)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {RegistrationProgress._meta.db_table}')
+        self.stdout.write(f'產生 {count} 件案件：{time.perf_counter() - started:.1f} 秒')
+
+    def measure(self, label, func):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label}：{elapsed:.3f} 秒，{queries} 個查詢')
+        return result
+
+    def python_scan(self):
+        """原本的做法：載入進行中案件後逐筆呼叫期限函式（以系統日期為基準）"""
+        remaining = {}
+        overdue = set()
+        for case in RegistrationProgress.objects.exclude(status__in=CLOSED_STATUSES):
+            if not case.due_date:
+                remaining[case.pk] = None
+                continue
+            expected_days = (case.due_date - case.acceptance_date).days
+            remaining[case.pk] = calculate_remaining_days(case.acceptance_date, expected_days)
+            if check_case_overdue(case.acceptance_date, expected_days):
+                overdue.add(case.pk)
+        return remaining, overdue
+
+    def python_flag(self, today):
+        """逐筆判斷並儲存有變動的旗標"""
+        changed = 0
+        for case in RegistrationProgress.objects.all():
+            overdue = bool(case.status not in CLOSED_STATUSES and case.due_date and case.due_date < today)
+            if case.is_overdue != overdue:
+                case.is_overdue = overdue
+                case.save(update_fields=['is_overdue'])
+                changed += 1
+        return changed
+
+    def database_scan(self, today):
+        remaining = {}
+        overdue = set()
+        for case in scan_open_cases(today):
+            remaining[case.pk] = case.remaining_days
+            if case.overdue:
+                overdue.add(case.pk)
+        return remaining, overdue
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from registration.progress.services import flag_overdue_cases
+
+
+class Command(BaseCommand):
+    help = '批次更新登記案件的逾期旗標（預計完成日已過且未結案），建議每日排程執行'
+
+    def handle(self, *args, **options):
+        result = flag_overdue_cases()
+        self.stdout.write(self.style.SUCCESS(
+            f"逾期旗標更新完成：新標記 {result['flagged']} 筆，解除 {result['cleared']} 筆"
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from registration.shareholders.ledger import verify_ledger, rebuild_ledger
+
+
+class Command(BaseCommand):
+    help = '由股權交易記錄重建持股餘額帳，並回報帳差異'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='只處理指定公司 (BasicInformation ID)'
+        )
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='只檢查差異，不重建'
+        )
+
+    def handle(self, *args, **options):
+        company_id = options.get('company')
+
+        drift = verify_ledger(company_id)
+        for item in drift:
+            actual = item['actual']
+            self.stdout.write(
+                f"持股關係 {item['company_holding_id']} {item['stock_type']} {item['date']}: "
+                f"應為 {item['expected']['shares']} 股 / {item['expected']['amount']}，"
+                f"帳上 {actual['shares'] if actual else '-'} 股 / {actual['amount'] if actual else '-'}"
+            )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('持股餘額帳與交易記錄一致'))
+        else:
+            self.stdout.write(self.style.WARNING(f'發現 {len(drift)} 筆差異'))
+
+        if options['verify_only']:
+            return
+
+        if drift:
+            count = rebuild_ledger(company_id)
+            self.stdout.write(self.style.SUCCESS(f'已重建持股餘額帳，共 {count} 筆'))
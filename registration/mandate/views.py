@@ -14,7 +14,7 @@ def mandate_update(request, pk):
     progress = get_object_or_404(RegistrationProgress, pk=pk)
     
     # Get or Create Mandate
-    mandate, created = RegistrationMandate.objects.get_or_create(progress=progress)
+    mandate, created = RegistrationMandate.all_objects.get_or_create(progress=progress)
     
     if request.method == 'POST':
         form = RegistrationMandateForm(request.POST, instance=mandate)
@@ -63,7 +63,7 @@ class MandateDetailView(UpdateView):
     def get_object(self, queryset=None):
         progress_id = self.kwargs.get('pk')
         progress = get_object_or_404(RegistrationProgress, pk=progress_id)
-        mandate, _ = RegistrationMandate.objects.get_or_create(progress=progress)
+        mandate, _ = RegistrationMandate.all_objects.get_or_create(progress=progress)
         return mandate
 
     def get_context_data(self, **kwargs):
@@ -126,7 +126,7 @@ class MandateDetailView(UpdateView):
         # Delivery surcharge
         delivery_method = form.cleaned_data.get('delivery_method')
         if delivery_method == 'post': # Check actual value in choices
-             total_amount += 65
+             total_amount += RegistrationMandate.POSTAGE_FEE
              
         # 2. Case Number (MerchantTradeNo)
         # ECPay requires unique MerchantTradeNo. Case Number might be reused if payment fails?
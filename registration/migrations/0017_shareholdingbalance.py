@@ -0,0 +1,71 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:43
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_balances(apps, schema_editor):
+    StockTransaction = apps.get_model('registration', 'StockTransaction')
+    ShareholdingBalance = apps.get_model('registration', 'ShareholdingBalance')
+
+    rows = StockTransaction.objects.filter(is_deleted=False).values(
+        'company_holding_id', 'stock_type', 'transaction_date'
+    ).annotate(
+        day_shares=Sum('quantity'),
+        day_amount=Sum('stock_amount')
+    ).order_by('company_holding_id', 'stock_type', 'transaction_date')
+
+    balances = []
+    current_key = None
+    running_shares = 0
+    running_amount = Decimal('0')
+    for row in rows:
+        key = (row['company_holding_id'], row['stock_type'])
+        if key != current_key:
+            current_key = key
+            running_shares = 0
+            running_amount = Decimal('0')
+        running_shares += row['day_shares'] or 0
+        running_amount += row['day_amount'] or 0
+        balances.append(ShareholdingBalance(
+            company_holding_id=key[0],
+            stock_type=key[1],
+            date=row['transaction_date'],
+            shares=running_shares,
+            amount=running_amount
+        ))
+
+    ShareholdingBalance.objects.bulk_create(balances, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0016_alter_registrationmandate_delivery_method_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShareholdingBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_type', models.CharField(choices=[('common', '普通股'), ('preferred', '特別股')], max_length=20, verbose_name='股票類型')),
+                ('date', models.DateField(verbose_name='餘額日期')),
+                ('shares', models.IntegerField(default=0, verbose_name='累計股數')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='累計股票金額')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('company_holding', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='registration.companyshareholding', verbose_name='持股關係')),
+            ],
+            options={
+                'verbose_name': '持股餘額帳',
+                'verbose_name_plural': '持股餘額帳',
+                'db_table': 'shareholding_balance',
+                'ordering': ['company_holding', 'stock_type', 'date'],
+                'unique_together': {('company_holding', 'stock_type', 'date')},
+            },
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_module', '0011_basicinformation_trigram_indexes'),
+        ('master', '0006_systemparameter'),
+        ('registration', '0018_shareholder_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registrationprogress',
+            index=models.Index(fields=['created_at', 'id'], name='reg_progress_created_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:03
+
+import django.db.models.manager
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_module', '0012_soft_delete_partial_indexes'),
+        ('hr', '0004_soft_delete_partial_indexes'),
+        ('master', '0006_systemparameter'),
+        ('registration', '0019_registrationprogress_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='boardmember',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='companyshareholding',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='registrationaml',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='registrationcostsplit',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='registrationmandate',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='registrationprogress',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='registrationservice',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='shareholder',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='stocktransaction',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='boardmember',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['company'], name='board_member_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='companyshareholding',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['company'], name='holding_live_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrationcostsplit',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['progress'], name='reg_cost_split_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrationprogress',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['status', '-created_at'], name='reg_progress_live_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrationservice',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['progress'], name='reg_service_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shareholder',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['name'], name='shareholder_live_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['company_holding', 'transaction_date'], name='stock_trans_live_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def flag_existing(apps, schema_editor):
+    """既有案件依預計完成日標記逾期"""
+    RegistrationProgress = apps.get_model('registration', 'RegistrationProgress')
+    RegistrationProgress._default_manager.filter(
+        is_deleted=False,
+        due_date__lt=timezone.localdate()
+    ).exclude(status__in=['closed', 'none']).update(is_overdue=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_module', '0012_soft_delete_partial_indexes'),
+        ('master', '0006_systemparameter'),
+        ('registration', '0020_soft_delete_partial_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registrationprogress',
+            name='is_overdue',
+            field=models.BooleanField(default=False, help_text='儲存時及每日排程（flag_overdue_cases）更新', verbose_name='已逾期'),
+        ),
+        migrations.AddIndex(
+            model_name='registrationprogress',
+            index=models.Index(condition=models.Q(('is_deleted', False), models.Q(('status__in', ['closed', 'none']), _negated=True)), fields=['due_date', 'acceptance_date'], name='reg_progress_open_due_idx'),
+        ),
+        migrations.RunPython(flag_existing, migrations.RunPython.noop),
+    ]
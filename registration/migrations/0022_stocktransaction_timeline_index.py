@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0021_registrationprogress_is_overdue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['company_holding', '-transaction_date', '-transaction_type'], include=('quantity',), name='stock_trans_timeline_idx'),
+        ),
+    ]
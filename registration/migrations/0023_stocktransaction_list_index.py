@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0022_stocktransaction_timeline_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-transaction_date', '-id'], name='stock_trans_list_idx'),
+        ),
+    ]
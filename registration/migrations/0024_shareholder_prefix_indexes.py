@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# btree text_pattern_ops 索引，對應 istartswith 產生的 UPPER("欄位"::text) LIKE 'xx%' 前綴查詢；
+# 自動完成的前綴層以範圍掃描取得，不需 trigram 比對。非 PostgreSQL 略過
+INDEXES = [
+    ('shareholder_name_prefix_idx', 'name'),
+    ('shareholder_identifier_prefix_idx', 'identifier'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON shareholder '
+            f'(UPPER("{column}"::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0023_stocktransaction_list_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
+from functools import partial
+from django.db import models, transaction as db_transaction
 from admin_module.models import BasicInformation, Contact
 
 from django.conf import settings
 from django.utils import timezone
+from core.managers import SoftDeleteManager, SoftDeleteQuerySet
+from core.sequences import next_value
 
 class SmartFirmBaseModel(models.Model):
     """基礎模型：包含建立/修改資訊與軟刪除功能"""
@@ -17,18 +20,22 @@ class SmartFirmBaseModel(models.Model):
     )
     is_deleted = models.BooleanField(default=False, verbose_name='是否刪除')
 
+    # all_objects 需宣告在前，作為預設 manager（admin、唯一值檢查可看到已刪除資料）
+    all_objects = SoftDeleteManager(include_deleted=True)
+    objects = SoftDeleteManager()
+
     class Meta:
         abstract = True
 
     def delete(self, using=None, keep_parents=False):
-        """軟刪除：標記為已刪除"""
+        """軟刪除：標記為已刪除（單一 UPDATE）"""
+        type(self).all_objects.filter(pk=self.pk).delete()
         self.is_deleted = True
-        self.save()
 
     def restore(self):
         """還原刪除"""
+        type(self).all_objects.filter(pk=self.pk).restore()
         self.is_deleted = False
-        self.save()
 
 class Shareholder(SmartFirmBaseModel):
     """股東基本資料模型（集中管理）"""
@@ -69,11 +76,42 @@ class Shareholder(SmartFirmBaseModel):
         verbose_name = '股東'
         verbose_name_plural = '股東'
         ordering = ['name']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['name'], name='shareholder_live_name_idx', condition=models.Q(is_deleted=False)),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.identifier})"
 
 
+class CompanyShareholdingQuerySet(SoftDeleteQuerySet):
+    """持股關係的軟刪除／還原或改變公司、股東時，使相關公司的名冊快照失效"""
+
+    ROSTER_FIELDS = frozenset({'is_deleted', 'company', 'company_id', 'shareholder', 'shareholder_id'})
+
+    def update(self, **kwargs):
+        if self.ROSTER_FIELDS.isdisjoint(kwargs):
+            return super().update(**kwargs)
+
+        from registration.shareholders.snapshot_cache import invalidate_on_commit
+        with db_transaction.atomic():
+            pks = list(self.values_list('pk', flat=True))
+            company_ids = set(self.values_list('company_id', flat=True))
+            result = super().update(**kwargs)
+            company_ids.update(
+                CompanyShareholding.all_objects.filter(pk__in=pks).values_list('company_id', flat=True)
+            )
+            for company_id in company_ids:
+                invalidate_on_commit(company_id)
+        return result
+
+    update.alters_data = True
+
+
+CompanyShareholdingManager = SoftDeleteManager.from_queryset(CompanyShareholdingQuerySet)
+
+
 class CompanyShareholding(SmartFirmBaseModel):
     """公司持股關係模型"""
     shareholder = models.ForeignKey(
@@ -89,16 +127,60 @@ class CompanyShareholding(SmartFirmBaseModel):
         verbose_name='公司'
     )
 
+    all_objects = CompanyShareholdingManager(include_deleted=True)
+    objects = CompanyShareholdingManager()
+
     class Meta:
         db_table = 'company_shareholding'
         verbose_name = '持股關係'
         verbose_name_plural = '持股關係'
         unique_together = [['shareholder', 'company']]
         ordering = ['company', 'shareholder']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['company'], name='holding_live_company_idx', condition=models.Q(is_deleted=False)),
+        ]
 
     def __str__(self):
         return f"{self.shareholder.name} - {self.company.companyName}"
 
+    def save(self, *args, **kwargs):
+        """儲存時使新舊公司的名冊快照失效（admin 編輯也適用）"""
+        from registration.shareholders.snapshot_cache import invalidate_on_commit
+
+        with db_transaction.atomic():
+            if self.pk:
+                previous = type(self).all_objects.filter(pk=self.pk).values_list('company_id', flat=True).first()
+                if previous and previous != self.company_id:
+                    invalidate_on_commit(previous)
+            super().save(*args, **kwargs)
+            invalidate_on_commit(self.company_id)
+
+
+class StockTransactionQuerySet(SoftDeleteQuerySet):
+    """
+    批次 update()、軟刪除／還原與實際刪除都會同步調整持股餘額帳
+    （ledger 匯入本模組的模型，因此在方法內匯入）
+    """
+
+    def update(self, **kwargs):
+        from registration.shareholders.ledger import LEDGER_FIELDS, track_bulk_change
+        if LEDGER_FIELDS.isdisjoint(kwargs):
+            return super().update(**kwargs)
+        return track_bulk_change(self, partial(super().update, **kwargs))
+
+    update.alters_data = True
+
+    def hard_delete(self):
+        from registration.shareholders.ledger import track_bulk_change
+        return track_bulk_change(self, super().hard_delete)
+
+    hard_delete.alters_data = True
+    hard_delete.queryset_only = True
+
+
+StockTransactionManager = SoftDeleteManager.from_queryset(StockTransactionQuerySet)
+
 
 class StockTransaction(SmartFirmBaseModel):
     """股權交易記錄模型"""
@@ -171,15 +253,87 @@ class StockTransaction(SmartFirmBaseModel):
         verbose_name='備註'
     )
 
+    all_objects = StockTransactionManager(include_deleted=True)
+    objects = StockTransactionManager()
+
     class Meta:
         db_table = 'stock_transaction'
         verbose_name = '股權交易記錄'
         verbose_name_plural = '股權交易記錄'
         ordering = ['transaction_date', 'created_at']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['company_holding', 'transaction_date'], name='stock_trans_live_idx', condition=models.Q(is_deleted=False)),
+            # 交易列表：依日期由新到舊 keyset 分頁
+            models.Index(fields=['-transaction_date', '-id'], name='stock_trans_list_idx', condition=models.Q(is_deleted=False)),
+            # 公司交易歷程：依日期、類型分組並以 keyset 分頁（PostgreSQL 可 index-only scan）
+            models.Index(
+                fields=['company_holding', '-transaction_date', '-transaction_type'],
+                include=['quantity'],
+                name='stock_trans_timeline_idx',
+                condition=models.Q(is_deleted=False)
+            ),
+        ]
 
     def __str__(self):
         return f"{self.company_holding.shareholder.name} - {self.get_transaction_type_display()} ({self.quantity}股) - {self.transaction_date}"
 
+    def save(self, *args, **kwargs):
+        """儲存時在同一個資料庫交易內同步調整持股餘額帳（API、admin 及腳本皆適用）"""
+        from registration.shareholders.ledger import snapshot_transaction, apply_transaction_change
+
+        with db_transaction.atomic():
+            stored = None
+            if self.pk:
+                stored = type(self).all_objects.select_for_update(of=('self',)).select_related(
+                    'company_holding'
+                ).filter(pk=self.pk).first()
+            super().save(*args, **kwargs)
+            apply_transaction_change(
+                snapshot_transaction(stored) if stored else None,
+                snapshot_transaction(self)
+            )
+
+
+class ShareholdingBalance(models.Model):
+    """持股餘額帳（依持股關係、股票類型、日期累計）"""
+    company_holding = models.ForeignKey(
+        CompanyShareholding,
+        on_delete=models.CASCADE,
+        related_name='balances',
+        verbose_name='持股關係'
+    )
+    stock_type = models.CharField(
+        max_length=20,
+        choices=StockTransaction.STOCK_TYPE_CHOICES,
+        verbose_name='股票類型'
+    )
+    date = models.DateField(
+        verbose_name='餘額日期'
+    )
+    shares = models.IntegerField(
+        default=0,
+        verbose_name='累計股數'
+    )
+    amount = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        verbose_name='累計股票金額'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    class Meta:
+        db_table = 'shareholding_balance'
+        verbose_name = '持股餘額帳'
+        verbose_name_plural = '持股餘額帳'
+        ordering = ['company_holding', 'stock_type', 'date']
+        # 每個持股關係、股票類型在同一天只有一筆累計餘額（同時作為「截至某日」查詢的索引）
+        unique_together = [['company_holding', 'stock_type', 'date']]
+
+    def __str__(self):
+        return f"{self.company_holding_id} - {self.get_stock_type_display()} - {self.date}: {self.shares}"
+
 
 class BoardMember(SmartFirmBaseModel):
     """董監事模型"""
@@ -226,6 +380,10 @@ class BoardMember(SmartFirmBaseModel):
         verbose_name = '董監事'
         verbose_name_plural = '董監事'
         ordering = ['company', 'title', 'person']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['company'], name='board_member_live_idx', condition=models.Q(is_deleted=False)),
+        ]
 
     def __str__(self):
         return f"{self.company.companyName} - {self.get_title_display()}: {self.person.name}"
@@ -250,6 +408,9 @@ class RegistrationProgress(SmartFirmBaseModel):
         ('none', '5.沒有辦理'),
     ]
     
+    # 不列入進行中案件的狀態
+    CLOSED_STATUSES = ('closed', 'none')
+    
     DELIVERY_METHOD_CHOICES = [
         ('self_pickup', '自取'),
         ('mail', '郵寄'),
@@ -305,6 +466,11 @@ class RegistrationProgress(SmartFirmBaseModel):
         verbose_name='承接日期'
     )
     due_date = models.DateField(blank=True, null=True, verbose_name='預計完成日期')
+    is_overdue = models.BooleanField(
+        default=False,
+        verbose_name='已逾期',
+        help_text='儲存時及每日排程（flag_overdue_cases）更新'
+    )
     
     main_contact = models.ForeignKey(
         Contact,
@@ -328,26 +494,38 @@ class RegistrationProgress(SmartFirmBaseModel):
         verbose_name = '登記案件'
         verbose_name_plural = '登記案件'
         ordering = ['-created_at']
+        indexes = [
+            # 列表排序及編輯頁上一筆/下一筆的 keyset 查詢
+            models.Index(fields=['created_at', 'id'], name='reg_progress_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='reg_progress_live_status_idx', condition=models.Q(is_deleted=False)),
+            # 逾期/期限掃描：只索引未刪除且未結案的案件
+            models.Index(
+                fields=['due_date', 'acceptance_date'],
+                name='reg_progress_open_due_idx',
+                condition=models.Q(is_deleted=False) & ~models.Q(status__in=['closed', 'none'])
+            ),
+        ]
 
     def __str__(self):
         return f"{self.case_number} - {self.customer.companyName if self.customer else 'Unknown'}"
 
+    @staticmethod
+    def _max_case_sequence(prefix):
+        """取得今日已使用的最大序號（流水號計數器建立前的既有案件）"""
+        existing = RegistrationProgress.all_objects.filter(case_number__startswith=prefix).order_by('case_number').last()
+        if existing:
+            try:
+                # Extract sequence number RO-YYYYMMDD-RXXX
+                return int(existing.case_number.split('-R')[-1])
+            except ValueError:
+                pass
+        return 0
+
     def save(self, *args, **kwargs):
         if not self.case_number:
             today_str = timezone.now().strftime('%Y%m%d')
             prefix = f"RO-{today_str}-R"
-            # Find max seq for today
-            existing = RegistrationProgress.objects.filter(case_number__startswith=prefix).order_by('case_number').last()
-            if existing:
-                try:
-                    # Extract sequence number RO-YYYYMMDD-RXXX
-                    seq = int(existing.case_number.split('-R')[-1])
-                    new_seq = seq + 1
-                except ValueError:
-                    new_seq = 1
-            else:
-                new_seq = 1
-            
+            new_seq = next_value(prefix, seed=lambda: self._max_case_sequence(prefix))
             self.case_number = f"{prefix}{new_seq:03d}"
             
         # Update completion date if status is closed or none
@@ -359,6 +537,12 @@ class RegistrationProgress(SmartFirmBaseModel):
              # I'll default it to today if empty and status is finalized, or leave logic to view/frontend.
              pass
 
+        self.is_overdue = bool(
+            self.status not in self.CLOSED_STATUSES
+            and self.due_date
+            and self.due_date < timezone.localdate()
+        )
+
         super().save(*args, **kwargs)
 
 
@@ -387,6 +571,10 @@ class RegistrationService(SmartFirmBaseModel):
         verbose_name = '登記案件服務明細'
         verbose_name_plural = '登記案件服務明細'
         ordering = ['created_at']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['progress'], name='reg_service_live_idx', condition=models.Q(is_deleted=False)),
+        ]
 
 class RegistrationCostSplit(SmartFirmBaseModel):
     """登記案件公費拆分計算"""
@@ -422,6 +610,10 @@ class RegistrationCostSplit(SmartFirmBaseModel):
         verbose_name = '公費拆分'
         verbose_name_plural = '公費拆分'
         ordering = ['created_at']
+        # 只索引未刪除資料（部分索引）
+        indexes = [
+            models.Index(fields=['progress'], name='reg_cost_split_live_idx', condition=models.Q(is_deleted=False)),
+        ]
 
 class RegistrationMandate(SmartFirmBaseModel):
     """委任書 (Mandate)"""
@@ -436,6 +628,8 @@ class RegistrationMandate(SmartFirmBaseModel):
         ('self', '自取'),
         ('post', '郵寄'),
     ]
+    # 郵寄交付加收郵資
+    POSTAGE_FEE = 65
     mandate_date = models.DateField(blank=True, null=True, verbose_name='委任日期')
     delivery_method = models.CharField(max_length=20, choices=DELIVERY_CHOICES, blank=True, null=True, verbose_name='交付方式')
     address = models.CharField(max_length=200, blank=True, null=True, verbose_name='地址')
@@ -2,7 +2,35 @@
 案件進度追蹤業務邏輯
 """
 from datetime import date, timedelta
-from django.core.mail import send_mail
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, Func, IntegerField, Q, Value
+from django.utils import timezone
+
+from core.mail import queue_mail
+from registration.models import RegistrationProgress
+
+# 不列入進行中案件的狀態
+CLOSED_STATUSES = RegistrationProgress.CLOSED_STATUSES
+
+
+class DaysBetween(Func):
+    """
+    兩個日期相差的天數（end - start），以整數回傳
+    
+    PostgreSQL 的 date - date 即為天數；SQLite 以 julianday 計算。
+    """
+    arity = 2
+    output_field = IntegerField()
+    
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context)
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
 
 
 def check_case_overdue(case_filing_date, expected_days):
@@ -44,30 +72,108 @@ def send_progress_notification(case_id, recipient_email, message):
         case_id: 案件ID
         recipient_email: 收件人email
         message: 通知訊息
+    
+    Returns:
+        OutboundEmail: 佇列中的郵件
     """
     subject = f'案件進度更新通知 - 案號 #{case_id}'
     
-    send_mail(
+    # 寫入郵件佇列，交易提交後由背景程序批次寄出，不阻塞請求
+    return queue_mail(
         subject=subject,
-        message=message,
+        body=message,
+        recipients=[recipient_email],
         from_email='noreply@smartfirm.com',
-        recipient_list=[recipient_email],
-        fail_silently=False,
     )
 
 
+def get_open_cases():
+    """
+    取得尚未結案的案件（排除結案與沒有辦理）
+    
+    Returns:
+        QuerySet: RegistrationProgress
+    """
+    return RegistrationProgress.objects.exclude(status__in=CLOSED_STATUSES)
+
+
+def get_overdue_cases(today=None):
+    """
+    取得已超過預計完成日期且尚未結案的案件
+    
+    Args:
+        today: 基準日期，預設為今天
+    
+    Returns:
+        QuerySet: RegistrationProgress
+    """
+    return get_open_cases().filter(due_date__lt=today or timezone.localdate())
+
+
+def annotate_deadlines(queryset, today=None):
+    """
+    在資料庫端計算期限資訊，取代逐筆呼叫 check_case_overdue / calculate_remaining_days
+    
+    Args:
+        queryset: RegistrationProgress QuerySet
+        today: 基準日期，預設為今天
+    
+    Returns:
+        QuerySet: 加上 remaining_days（剩餘天數，負數表示逾期；無預計完成日為 None）、
+                  days_open（承接至今天數）、overdue（是否逾期）
+    """
+    today = Value(today or timezone.localdate())
+    return queryset.annotate(
+        remaining_days=DaysBetween(F('due_date'), today),
+        days_open=DaysBetween(today, F('acceptance_date')),
+        overdue=ExpressionWrapper(
+            Q(due_date__lt=today) & ~Q(status__in=CLOSED_STATUSES),
+            output_field=BooleanField()
+        ),
+    )
+
+
+def scan_open_cases(today=None):
+    """
+    以單一查詢取得所有進行中案件及其期限資訊（使用 reg_progress_open_due_idx）
+    
+    Args:
+        today: 基準日期，預設為今天
+    
+    Returns:
+        QuerySet: 依預計完成日排序，逾期最久者在前
+    """
+    return annotate_deadlines(get_open_cases(), today).order_by(F('due_date').asc(nulls_last=True), 'acceptance_date')
+
+
+def flag_overdue_cases(today=None):
+    """
+    批次更新案件的 is_overdue 旗標（每日排程執行）
+    
+    Args:
+        today: 基準日期，預設為今天
+    
+    Returns:
+        dict: {'flagged': 新標記逾期筆數, 'cleared': 解除逾期筆數}
+    """
+    today = today or timezone.localdate()
+    overdue = get_overdue_cases(today)
+    flagged = overdue.filter(is_overdue=False).update(is_overdue=True)
+    cleared = RegistrationProgress.objects.filter(is_overdue=True).exclude(
+        pk__in=overdue.values('pk')
+    ).update(is_overdue=False)
+    return {'flagged': flagged, 'cleared': cleared}
+
+
 def get_case_statistics():
     """
     取得案件統計資料
     
     Returns:
-        dict: 各狀態案件數量
-    """
-    # TODO: 實作從資料庫取得統計
-    return {
-        'pending': 0,
-        'processing': 0,
-        'review': 0,
-        'approved': 0,
-        'completed': 0,
-    }
+        dict: 各狀態案件數量（以單一 GROUP BY 查詢計算，未出現的狀態為 0）
+    """
+    statistics = {status: 0 for status, _ in RegistrationProgress.STATUS_CHOICES}
+    rows = RegistrationProgress.objects.order_by().values('status').annotate(count=Count('pk'))
+    for row in rows:
+        statistics[row['status']] = row['count']
+    return statistics
@@ -1,8 +1,11 @@
 from django.urls import reverse_lazy
+from django.utils.http import urlencode
 from django.db import transaction
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from core.navigation import KeysetNavigationMixin
 from registration.models import RegistrationProgress, RegistrationService, RegistrationCostSplit, RegistrationMandate, RegistrationAML
+from .services import annotate_deadlines
 from .forms import RegistrationProgressForm, RegistrationServiceFormSet, RegistrationCostSplitFormSet
 from registration.mandate.forms import RegistrationMandateForm
 from registration.aml.forms import RegistrationAMLForm
@@ -14,12 +17,23 @@ class RegistrationProgressListView(LoginRequiredMixin, ListView):
     ordering = ['-created_at']
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = annotate_deadlines(super().get_queryset())
         status = self.request.GET.get('status')
         if status:
             queryset = queryset.filter(status=status)
+        if self.request.GET.get('overdue'):
+            queryset = queryset.filter(overdue=True)
         return queryset
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # 編輯頁的上一筆/下一筆沿用列表篩選條件
+        context['navigation_query'] = urlencode({
+            param: self.request.GET[param]
+            for param in RegistrationProgressUpdateView.navigation_filters if self.request.GET.get(param)
+        })
+        return context
+
 class RegistrationProgressCreateView(LoginRequiredMixin, CreateView):
     model = RegistrationProgress
     form_class = RegistrationProgressForm
@@ -53,10 +67,24 @@ class RegistrationProgressCreateView(LoginRequiredMixin, CreateView):
             print("Services Formset Errors (Create):", services.errors)
             return self.render_to_response(self.get_context_data(form=form))
 
-class RegistrationProgressUpdateView(LoginRequiredMixin, UpdateView):
+class RegistrationProgressUpdateView(LoginRequiredMixin, KeysetNavigationMixin, UpdateView):
     model = RegistrationProgress
     form_class = RegistrationProgressForm
     template_name = 'progress/form.html'
+    # Prev/Next 依列表順序 (-created_at) 及狀態、逾期篩選
+    navigation_ordering = ('-created_at', '-pk')
+    navigation_filters = {'status': 'status', 'overdue': 'is_overdue'}
+    navigation_context_names = ('previous_case', 'next_case')
+
+    def get_navigation_queryset(self):
+        return RegistrationProgress.objects.filter(is_deleted=False)
+
+    def get_navigation_params(self):
+        params = super().get_navigation_params()
+        if 'overdue' in params:
+            # 列表只要帶有 overdue 參數（例如 overdue=1）即只列逾期案件
+            params['overdue'] = True
+        return params
     
     def get_success_url(self):
         return reverse_lazy('registration:progress:edit', kwargs={'pk': self.object.pk})
@@ -79,26 +107,12 @@ class RegistrationProgressUpdateView(LoginRequiredMixin, UpdateView):
                 prefix='cost_splits'
             )
         
-        # Navigation logic (Prev/Next)
-        cases = RegistrationProgress.objects.filter(is_deleted=False).order_by('-created_at')
-        cases_list = list(cases.values_list('pk', flat=True))
-        try:
-            current_idx = cases_list.index(self.object.pk)
-            # Previous (newer in time desc list)
-            if current_idx > 0:
-                data['previous_case'] = cases_list[current_idx - 1]
-            # Next (older in time desc list)
-            if current_idx < len(cases_list) - 1:
-                data['next_case'] = cases_list[current_idx + 1]
-        except ValueError:
-            pass
-
         # Load Mandate Form
-        mandate, _ = RegistrationMandate.objects.get_or_create(progress=self.object)
+        mandate, _ = RegistrationMandate.all_objects.get_or_create(progress=self.object)
         data['mandate_form'] = RegistrationMandateForm(self.request.POST or None, instance=mandate, prefix='mandate')
 
         # Load AML Form
-        aml, _ = RegistrationAML.objects.get_or_create(progress=self.object)
+        aml, _ = RegistrationAML.all_objects.get_or_create(progress=self.object)
         data['aml_form'] = RegistrationAMLForm(self.request.POST or None, instance=aml, prefix='aml')
         
         # Check if AML is required based on Services
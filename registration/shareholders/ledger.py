@@ -0,0 +1,287 @@
+"""
+Shareholding balance ledger maintenance
+
+ShareholdingBalance stores the running balance of each
+(company_holding, stock_type) at every date that has transactions, so an
+"as of date" lookup only needs the latest row on or before that date.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import F, Sum
+from registration.models import CompanyShareholding, StockTransaction, ShareholdingBalance
+from .snapshot_cache import invalidate_on_commit, clear_snapshots
+
+
+def snapshot_transaction(trans):
+    """
+    Capture the ledger-relevant values of a transaction.
+
+    Values are normalised with the model fields because the views assign raw
+    POST strings to the instance before saving.
+
+    Args:
+        trans: StockTransaction instance
+
+    Returns:
+        Dict of ledger values, or None if the transaction does not count
+        towards balances (soft-deleted).
+    """
+    if trans.is_deleted:
+        return None
+
+    meta = StockTransaction._meta
+    return {
+        'company_id': trans.company_holding.company_id,
+        'company_holding_id': trans.company_holding_id,
+        'stock_type': trans.stock_type,
+        'date': meta.get_field('transaction_date').to_python(trans.transaction_date),
+        'shares': meta.get_field('quantity').to_python(trans.quantity) or 0,
+        'amount': meta.get_field('stock_amount').to_python(trans.stock_amount) or Decimal('0'),
+    }
+
+
+def _apply_delta(company_holding_id, stock_type, on_date, shares, amount):
+    """
+    Add shares/amount to the balance on on_date and every later balance.
+
+    The caller must hold the lock on the CompanyShareholding row (see
+    apply_transaction_changes).
+    """
+    if not shares and not amount:
+        return
+
+    rows = ShareholdingBalance.objects.filter(
+        company_holding_id=company_holding_id,
+        stock_type=stock_type
+    )
+
+    if not rows.filter(date=on_date).exists():
+        previous = rows.filter(date__lt=on_date).order_by('-date').first()
+        ShareholdingBalance.objects.create(
+            company_holding_id=company_holding_id,
+            stock_type=stock_type,
+            date=on_date,
+            shares=previous.shares if previous else 0,
+            amount=previous.amount if previous else 0
+        )
+
+    rows.filter(date__gte=on_date).update(
+        shares=F('shares') + shares,
+        amount=F('amount') + amount
+    )
+
+
+def apply_transaction_change(before, after):
+    """
+    Update the ledger for a created, edited or deleted transaction, and
+    invalidate the company's cached roster snapshots once it commits.
+
+    Called by StockTransaction.save() inside the same database transaction
+    as the write.
+
+    Args:
+        before: snapshot_transaction() of the row before the write (None on create)
+        after: snapshot_transaction() of the row after the write (None on delete)
+    """
+    apply_transaction_changes([(before, after)])
+
+
+def apply_transaction_changes(changes):
+    """
+    Apply many (before, after) snapshot pairs at once.
+
+    Deltas are summed per (company_holding, stock_type, date) first, so a
+    bulk soft-delete or restore touches each ledger series once. The
+    affected CompanyShareholding rows are locked in primary key order
+    before any balance is written, which serialises writers of the same
+    holding even when its first balance row does not exist yet.
+    """
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    # 公司 -> 異動的最早交易日（之前日期的名冊快照不受影響）
+    affected = {}
+
+    for before, after in changes:
+        if before == after:
+            continue
+        for snapshot, sign in ((before, -1), (after, 1)):
+            if not snapshot:
+                continue
+            key = (snapshot['company_holding_id'], snapshot['stock_type'], snapshot['date'])
+            deltas[key][0] += sign * snapshot['shares']
+            deltas[key][1] += sign * snapshot['amount']
+            company_id = snapshot['company_id']
+            affected[company_id] = min(affected.get(company_id, snapshot['date']), snapshot['date'])
+
+    if not deltas:
+        return
+
+    with db_transaction.atomic():
+        # 鎖定上層的持股關係列（依主鍵順序）：餘額列可能尚未建立而無法鎖定，
+        # 同一持股關係的寫入在此排隊，第一筆餘額列不會被同時新增
+        holding_ids = sorted({holding_id for holding_id, _, _ in deltas})
+        list(
+            CompanyShareholding.all_objects.select_for_update()
+            .filter(pk__in=holding_ids).order_by('pk').values_list('pk', flat=True)
+        )
+        for (holding_id, stock_type, on_date), (shares, amount) in sorted(deltas.items()):
+            _apply_delta(holding_id, stock_type, on_date, shares, amount)
+
+    for company_id, since in affected.items():
+        invalidate_on_commit(company_id, since)
+
+
+# 會影響持股餘額的欄位；批次 update() 只在異動這些欄位時才需調整餘額帳
+LEDGER_FIELDS = frozenset({
+    'is_deleted', 'company_holding', 'company_holding_id', 'stock_type',
+    'transaction_date', 'quantity', 'stock_amount',
+})
+
+
+def _snapshots(pks):
+    return {
+        trans.pk: snapshot_transaction(trans)
+        for trans in StockTransaction.all_objects.filter(pk__in=pks).select_related('company_holding')
+    }
+
+
+def track_bulk_change(queryset, write):
+    """
+    Run write() (an update or delete of queryset) and move the ledger by the
+    difference it made to every matched transaction.
+
+    Used by StockTransactionQuerySet so admin actions, soft-delete and
+    restore keep the ledger in step with the raw transactions.
+
+    Returns:
+        Whatever write() returns
+    """
+    with db_transaction.atomic():
+        pks = list(queryset.select_for_update().values_list('pk', flat=True))
+        before = _snapshots(pks)
+        result = write()
+        after = _snapshots(pks)
+        apply_transaction_changes([(before.get(pk), after.get(pk)) for pk in pks])
+    return result
+
+
+def compute_ledger(company_id=None):
+    """
+    Recompute the ledger from raw transactions.
+
+    Args:
+        company_id: Optional company (BasicInformation) ID to limit the scope
+
+    Returns:
+        Dict keyed by (company_holding_id, stock_type, date):
+        {'shares': int, 'amount': Decimal}
+    """
+    transactions = StockTransaction.objects.filter(is_deleted=False)
+    if company_id:
+        transactions = transactions.filter(company_holding__company_id=company_id)
+
+    rows = transactions.values(
+        'company_holding_id', 'stock_type', 'transaction_date'
+    ).annotate(
+        day_shares=Sum('quantity'),
+        day_amount=Sum('stock_amount')
+    ).order_by('company_holding_id', 'stock_type', 'transaction_date')
+
+    ledger = {}
+    current_key = None
+    running_shares = 0
+    running_amount = Decimal('0')
+
+    for row in rows:
+        key = (row['company_holding_id'], row['stock_type'])
+        if key != current_key:
+            current_key = key
+            running_shares = 0
+            running_amount = Decimal('0')
+        running_shares += row['day_shares'] or 0
+        running_amount += row['day_amount'] or 0
+        ledger[key + (row['transaction_date'],)] = {
+            'shares': running_shares,
+            'amount': running_amount
+        }
+
+    return ledger
+
+
+def _stored_ledger(company_id=None):
+    balances = ShareholdingBalance.objects.all()
+    if company_id:
+        balances = balances.filter(company_holding__company_id=company_id)
+
+    return {
+        (b['company_holding_id'], b['stock_type'], b['date']): {
+            'shares': b['shares'],
+            'amount': b['amount']
+        }
+        for b in balances.values('company_holding_id', 'stock_type', 'date', 'shares', 'amount')
+    }
+
+
+def verify_ledger(company_id=None):
+    """
+    Compare the stored ledger with a recomputation from raw transactions.
+
+    Stored rows without transactions on their date are not drift as long as
+    they carry the previous balance forward.
+
+    Returns:
+        List of drift dicts:
+        [{'company_holding_id', 'stock_type', 'date', 'expected', 'actual'}, ...]
+    """
+    expected = compute_ledger(company_id)
+    stored = _stored_ledger(company_id)
+    zero = {'shares': 0, 'amount': Decimal('0')}
+
+    drift = []
+    last_expected = {}
+    for key in sorted(set(expected) | set(stored)):
+        series = key[:2]
+        if key in expected:
+            last_expected[series] = expected[key]
+        want = last_expected.get(series, zero)
+        have = stored.get(key)
+        if have is None or have['shares'] != want['shares'] or have['amount'] != want['amount']:
+            drift.append({
+                'company_holding_id': key[0],
+                'stock_type': key[1],
+                'date': key[2],
+                'expected': want,
+                'actual': have,
+            })
+
+    return drift
+
+
+def rebuild_ledger(company_id=None):
+    """
+    Replace the stored ledger with a recomputation from raw transactions.
+
+    Returns:
+        int: number of ledger rows written
+    """
+    expected = compute_ledger(company_id)
+
+    with db_transaction.atomic():
+        balances = ShareholdingBalance.objects.all()
+        if company_id:
+            balances = balances.filter(company_holding__company_id=company_id)
+        balances.delete()
+
+        ShareholdingBalance.objects.bulk_create([
+            ShareholdingBalance(
+                company_holding_id=holding_id,
+                stock_type=stock_type,
+                date=on_date,
+                shares=values['shares'],
+                amount=values['amount']
+            )
+            for (holding_id, stock_type, on_date), values in expected.items()
+        ], batch_size=1000)
+
+    clear_snapshots(company_id)
+    return len(expected)
@@ -1,9 +1,32 @@
 """
 Shareholder utilities for calculations and roster generation
 """
-from django.db.models import Sum
+from django.db.models import (
+    Case, Count, DecimalField, F, IntegerField, OuterRef, Q, RowRange, Subquery, Sum, Value, When, Window
+)
+from django.db.models.functions import Abs
 from datetime import date
-from registration.models import Shareholder, StockTransaction, CompanyShareholding
+from decimal import Decimal
+from core.navigation import keyset_page, keyset_through
+from registration.models import Shareholder, StockTransaction, CompanyShareholding, ShareholdingBalance
+from .snapshot_cache import get_cached_snapshot
+
+
+def _latest_balances(target_date, **filters):
+    """
+    Ledger rows holding the balance as of target_date, one per
+    (company_holding, stock_type), resolved through the ledger index.
+    """
+    latest_date = ShareholdingBalance.objects.filter(
+        company_holding=OuterRef('company_holding'),
+        stock_type=OuterRef('stock_type'),
+        date__lte=target_date
+    ).order_by('-date').values('date')[:1]
+    
+    return ShareholdingBalance.objects.filter(
+        date=Subquery(latest_date),
+        **filters
+    )
 
 
 def get_shareholder_balance(company_holding_id, target_date=None, stock_type=None):
@@ -21,24 +44,49 @@ def get_shareholder_balance(company_holding_id, target_date=None, stock_type=Non
     if target_date is None:
         target_date = date.today()
     
-    filters = {
-        'company_holding_id': company_holding_id,
-        'transaction_date__lte': target_date
-    }
+    filters = {'company_holding_id': company_holding_id}
     
     if stock_type:
         filters['stock_type'] = stock_type
     
-    transactions = StockTransaction.objects.filter(**filters)
+    shares = 0
+    amount = 0
+    for row in _latest_balances(target_date, **filters).values('shares', 'amount'):
+        shares += row['shares']
+        amount += row['amount']
     
-    result = transactions.aggregate(
-        total_shares=Sum('quantity'),
-        total_amount=Sum('stock_amount')
-    )
+    return {
+        'shares': shares,
+        'amount': amount
+    }
+
+
+def get_company_balances(company_id, target_date=None):
+    """
+    Look up every holding's balance for a company in a single ledger query.
+    
+    Args:
+        company_id: ID of the company (BasicInformation)
+        target_date: Date to calculate balances as of (default: today)
+    
+    Returns:
+        Dict keyed by (company_holding_id, stock_type):
+        {(holding_id, 'common'): {'shares': int, 'amount': Decimal}, ...}
+    """
+    if target_date is None:
+        target_date = date.today()
+    
+    rows = _latest_balances(
+        target_date,
+        company_holding__company_id=company_id
+    ).values('company_holding_id', 'stock_type', 'shares', 'amount')
     
     return {
-        'shares': result['total_shares'] or 0,
-        'amount': result['total_amount'] or 0
+        (row['company_holding_id'], row['stock_type']): {
+            'shares': row['shares'],
+            'amount': row['amount']
+        }
+        for row in rows
     }
 
 
@@ -46,6 +94,10 @@ def get_company_roster(company_id, target_date=None):
     """
     Get the shareholder roster for a company as of a specific date, broken down by stock type.
     
+    Balances for all holdings are read from the ledger in one query
+    (see get_company_balances), so the query count does not grow with
+    the number of shareholders.
+    
     Args:
         company_id: ID of the company (BasicInformation)
         target_date: Date to calculate roster as of (default: today)
@@ -67,6 +119,8 @@ def get_company_roster(company_id, target_date=None):
     if target_date is None:
         target_date = date.today()
     
+    balances = get_company_balances(company_id, target_date)
+    
     # Get all shareholdings for this company
     company_holdings = CompanyShareholding.objects.filter(
         company_id=company_id
@@ -83,7 +137,9 @@ def get_company_roster(company_id, target_date=None):
     
     for holding in company_holdings:
         for s_type, s_type_display in stock_types:
-            result = get_shareholder_balance(holding.id, target_date, stock_type=s_type)
+            result = balances.get((holding.id, s_type))
+            if not result:
+                continue
             balance = result['shares']
             amount = result['amount']
             
@@ -109,35 +165,180 @@ def get_company_roster(company_id, target_date=None):
     return roster
 
 
-def get_shareholder_transaction_history(company_holding_id):
+def build_roster_snapshot(company_id, target_date):
     """
-    Get transaction history for a company holding with running balance.
-    
-    Args:
-        company_holding_id: ID of the CompanyShareholding
+    Build the serializable roster snapshot used by the timeline API.
     
     Returns:
-        List of dicts with transaction info and running balance:
-        [
-            {
-                'transaction': StockTransaction object,
-                'running_balance': int (cumulative shares)
-            },
-            ...
-        ]
+        Dict: {'roster': [...], 'total_shares': int, 'total_capital': Decimal}
     """
-    transactions = StockTransaction.objects.filter(
-        company_holding_id=company_holding_id
-    ).order_by('transaction_date', 'created_at')
+    roster = get_company_roster(company_id, target_date)
     
-    history = []
-    running_balance = 0
-    
-    for transaction in transactions:
-        running_balance += transaction.quantity
-        history.append({
-            'transaction': transaction,
-            'running_balance': running_balance
+    roster_data = []
+    for item in roster:
+        roster_data.append({
+            'id': item['shareholder'].id,
+            'name': item['shareholder'].name,
+            'identifier': item['shareholder'].identifier,
+            'phone': item['shareholder'].phone,
+            'email': item['shareholder'].email,
+            'stock_type': item['stock_type_display'],
+            'balance': item['balance'],
+            'amount': item['amount'],
+            'percentage': item['percentage']
         })
     
-    return history
+    return {
+        'roster': roster_data,
+        'total_shares': sum(item['balance'] for item in roster_data),
+        'total_capital': sum(item['amount'] for item in roster_data),
+    }
+
+
+def get_roster_snapshot(company_id, target_date):
+    """
+    Get the roster snapshot for (company_id, target_date), served from the
+    snapshot cache when possible. Transaction and holding writes invalidate
+    the company's snapshots (see snapshot_cache.invalidate_on_commit).
+    """
+    return get_cached_snapshot(company_id, target_date, build_roster_snapshot)
+
+
+TIMELINE_PAGE_SIZE = 50
+
+
+def get_company_timeline(company_id, cursor=None, limit=TIMELINE_PAGE_SIZE):
+    """
+    Company transaction timeline, one event per (date, transaction type),
+    newest first, grouped and totalled in the database.
+
+    Pagination is keyset based: cursor is the (date, transaction_type) of the
+    last event of the previous page, so each page reads only the events
+    older than it instead of offsetting through the whole history.
+
+    Args:
+        company_id: Company (BasicInformation) ID
+        cursor: (date, transaction_type) to continue after, or None
+        limit: Events per page
+
+    Returns:
+        tuple: (events, next_cursor) where events is a list of dicts with
+        transaction_date, transaction_type, transaction_count, holders,
+        net_shares and shares_moved; next_cursor is None on the last page
+    """
+    transactions = StockTransaction.objects.filter(company_holding__company_id=company_id)
+    if cursor:
+        cursor_date, cursor_type = cursor
+        transactions = transactions.filter(
+            Q(transaction_date__lt=cursor_date)
+            | Q(transaction_date=cursor_date, transaction_type__lt=cursor_type)
+        )
+
+    events = list(
+        transactions.order_by().values('transaction_date', 'transaction_type').annotate(
+            transaction_count=Count('pk'),
+            holders=Count('company_holding', distinct=True),
+            net_shares=Sum('quantity'),
+            shares_moved=Sum(Abs('quantity')),
+        ).order_by('-transaction_date', '-transaction_type')[:limit + 1]
+    )
+
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = (events[-1]['transaction_date'], events[-1]['transaction_type'])
+    return events, next_cursor
+
+
+HISTORY_PAGE_SIZE = 100
+HISTORY_ORDERING = ('transaction_date', 'created_at', 'pk')
+
+
+def get_stock_type_totals(transactions):
+    """
+    Shares and stock amount per stock type, summed in the database.
+
+    Args:
+        transactions: StockTransaction queryset
+
+    Returns:
+        dict: {stock_type: {'shares': int, 'amount': Decimal}}
+    """
+    rows = transactions.order_by().values('stock_type').annotate(
+        shares=Sum('quantity'),
+        amount=Sum('stock_amount'),
+    )
+    return {row['stock_type']: {'shares': row['shares'], 'amount': row['amount']} for row in rows}
+
+
+def get_shareholder_transaction_history(company_holding_id, date_from=None, date_to=None,
+                                        cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Get transaction history for a company holding with running balances.
+
+    The page is selected by keyset and its running balances are computed
+    with window functions over just those rows; the rows before it (earlier
+    pages, or before date_from) are folded into an opening balance by one
+    aggregate query, so a page deep into a long history never loads the
+    earlier rows.
+
+    Args:
+        company_holding_id: ID of the CompanyShareholding
+        date_from: Optional first transaction date to include
+        date_to: Optional last transaction date to include
+        cursor: Cursor returned with the previous page, or None
+        limit: Transactions per page
+
+    Returns:
+        tuple: (transactions, next_cursor, opening) where transactions are
+        StockTransaction objects in date order annotated with
+        running_balance / running_amount (all stock types) and
+        stock_type_balance / stock_type_amount (running subtotal of the row's
+        stock type); opening is get_stock_type_totals() of the rows before
+        the page; next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    transactions = StockTransaction.objects.filter(company_holding_id=company_holding_id)
+
+    if cursor:
+        before = keyset_through(StockTransaction, cursor, HISTORY_ORDERING)
+    elif date_from:
+        before = Q(transaction_date__lt=date_from)
+    else:
+        before = None
+    opening = get_stock_type_totals(transactions.filter(before)) if before is not None else {}
+
+    opening_shares = sum(total['shares'] for total in opening.values())
+    opening_amount = sum((total['amount'] for total in opening.values()), Decimal(0))
+    # 各股票類型的期初餘額，依資料列的股票類型帶入
+    type_shares = Case(
+        *[When(stock_type=key, then=Value(total['shares'])) for key, total in opening.items()],
+        default=Value(0), output_field=IntegerField()
+    )
+    type_amount = Case(
+        *[When(stock_type=key, then=Value(total['amount'])) for key, total in opening.items()],
+        default=Value(Decimal(0)), output_field=DecimalField(max_digits=15, decimal_places=2)
+    )
+
+    running = {'order_by': list(HISTORY_ORDERING), 'frame': RowRange(start=None, end=0)}
+    by_type = {**running, 'partition_by': [F('stock_type')]}
+
+    page = transactions
+    if date_from:
+        page = page.filter(transaction_date__gte=date_from)
+    if date_to:
+        page = page.filter(transaction_date__lte=date_to)
+    # 先以 keyset 取出本頁的資料列，視窗函數只計算這一頁
+    keys, next_cursor = keyset_page(
+        page.values('transaction_date', 'created_at', 'id'), HISTORY_ORDERING, cursor, limit
+    )
+
+    rows = list(transactions.filter(pk__in=[key['id'] for key in keys]).annotate(
+        running_balance=Window(Sum('quantity'), **running) + opening_shares,
+        running_amount=Window(Sum('stock_amount'), **running) + opening_amount,
+        stock_type_balance=Window(Sum('quantity'), **by_type) + type_shares,
+        stock_type_amount=Window(Sum('stock_amount'), **by_type) + type_amount,
+    ).order_by(*HISTORY_ORDERING))
+    return rows, next_cursor, opening
@@ -0,0 +1,160 @@
+"""
+Point-in-time roster snapshot cache
+
+Snapshots are stored per company as one cache entry mapping
+target_date -> serialized roster, so dropping a company's snapshots never
+depends on a separately evictable index. The cache alias is bounded
+(MAX_ENTRIES companies, LRU culling), each company keeps at most
+SNAPSHOTS_PER_COMPANY dates, evicting the least recently used one, and
+entries expire after SNAPSHOT_TIMEOUT seconds.
+
+Every snapshot is tagged with the company's generation, kept in the
+shared cache alias so all workers see the same value. A write replaces the
+generation once it commits and records the earliest transaction date it
+touched: snapshots of earlier dates, tagged with the generation it
+replaced, are still valid and are re-tagged when read; later ones are
+rebuilt. Only the latest write is tracked, so a snapshot that missed more
+than one write is rebuilt. The generation is read before a snapshot is
+built and checked again before it is stored, so a snapshot built while a
+write was committing is never cached as current.
+
+Each lookup, hit or miss, reads the generation from the shared alias with
+one get_many. With the default DatabaseCache that is a query on the cache
+table; a shared in-memory backend (Redis, Memcached) makes hits cheap.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from django.core.cache import caches
+from django.db import transaction as db_transaction
+
+CACHE_ALIAS = 'roster'
+GENERATION_ALIAS = 'shared'
+SNAPSHOTS_PER_COMPANY = 64
+SNAPSHOT_TIMEOUT = 600
+
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _company_key(company_id):
+    return f'roster_snapshot:{company_id}'
+
+
+def _generation_key(company_id=None):
+    # 未指定公司時為全體共用的世代（clear_snapshots() 清除全部時更換）
+    return f'roster_generation:{company_id or "*"}'
+
+
+def _new_generation(since=None, base=None):
+    # since/base：base 世代中早於 since 的快照仍有效
+    return {'token': uuid.uuid4().hex, 'since': since.isoformat() if since else None, 'base': base}
+
+
+def _generation(company_id):
+    """Current (global token, company generation) of company_id, read in one lookup."""
+    shared = caches[GENERATION_ALIAS]
+    keys = [_generation_key(), _generation_key(company_id)]
+    values = shared.get_many(keys)
+    for key, initial in zip(keys, (uuid.uuid4().hex, _new_generation())):
+        if key not in values:
+            shared.add(key, initial, None)
+            values[key] = shared.get(key)
+    return values[keys[0]], values[keys[1]]
+
+
+def _current_tag(generation):
+    return generation[0], generation[1]['token']
+
+
+def _is_current(tag, date_key, generation):
+    """Whether a snapshot tagged tag is still valid for date_key under generation."""
+    global_token, company = generation
+    if tag == _current_tag(generation):
+        return True
+    # 上一個世代的快照：日期早於最近一次寫入的最早交易日時仍有效
+    return (
+        company['since'] is not None
+        and tag == (global_token, company['base'])
+        and date_key < company['since']
+    )
+
+
+def get_cached_snapshot(company_id, target_date, builder):
+    """
+    Return the roster snapshot for (company_id, target_date), building and
+    caching it with builder(company_id, target_date) on a miss.
+    """
+    key = _company_key(company_id)
+    date_key = target_date.isoformat()
+    generation = _generation(company_id)
+    tag = _current_tag(generation)
+
+    with _lock:
+        entry = _cache().get(key)
+        if entry is not None and date_key in entry:
+            snapshot_tag, data = entry[date_key]
+            if _is_current(snapshot_tag, date_key, generation):
+                entry[date_key] = (tag, data)
+                entry.move_to_end(date_key)
+                _cache().set(key, entry, SNAPSHOT_TIMEOUT)
+                return data
+
+    data = builder(company_id, target_date)
+
+    # compare-and-set：建立期間提交的寫入若影響此日期，不可再存入
+    generation = _generation(company_id)
+    if not _is_current(tag, date_key, generation):
+        return data
+
+    with _lock:
+        entry = _cache().get(key) or OrderedDict()
+        entry[date_key] = (_current_tag(generation), data)
+        entry.move_to_end(date_key)
+        while len(entry) > SNAPSHOTS_PER_COMPANY:
+            entry.popitem(last=False)
+        _cache().set(key, entry, SNAPSHOT_TIMEOUT)
+
+    return data
+
+
+def invalidate_snapshots(company_id=None, since=None):
+    """
+    Invalidate cached snapshots in all workers.
+
+    Args:
+        company_id: Company whose snapshots are invalidated, or None for all companies
+        since: Earliest transaction date changed by the write; snapshots of
+            earlier dates stay valid. None invalidates every date.
+    """
+    shared = caches[GENERATION_ALIAS]
+    if not company_id:
+        shared.set(_generation_key(), uuid.uuid4().hex, None)
+        _cache().clear()
+        return
+
+    key = _generation_key(company_id)
+    current = shared.get(key)
+    generation = _new_generation(since, current['token'] if since and current else None)
+    shared.set(key, generation, None)
+    # 共用快取沒有原子的讀改寫：同時有另一筆寫入覆蓋時，改為全部失效
+    if since and shared.get(key) != generation:
+        shared.set(key, _new_generation(), None)
+    if not since:
+        _cache().delete(_company_key(company_id))
+
+
+def invalidate_on_commit(company_id, since=None):
+    """
+    Invalidate once the surrounding transaction commits, so the new
+    generation is only visible together with the write.
+    """
+    db_transaction.on_commit(lambda: invalidate_snapshots(company_id, since))
+
+
+def clear_snapshots(company_id=None):
+    """Drop every cached snapshot of company_id, or of all companies."""
+    invalidate_snapshots(company_id)
@@ -7,50 +7,89 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.db import transaction as db_transaction
-from django.db.models import Q
+from django.db.models import F
+from datetime import date
 from registration.models import StockTransaction, Shareholder, CompanyShareholding
-from admin_module.models import BasicInformation
+from core.navigation import keyset_page
+from core.search import ranked_search
+
+
+TRANSACTION_PAGE_SIZE = 100
+TRANSACTION_ORDERING = ('-transaction_date', '-pk')
 
 
 class StockTransactionListView(View):
-    """股權交易列表視圖"""
+    """股權交易列表視圖（資料由 transaction_list_api 分頁載入）"""
     
     def get(self, request):
-        """顯示所有股權交易"""
-        transactions = StockTransaction.objects.all().select_related(
-            'company_holding__shareholder',
-            'company_holding__company'
-        ).order_by('-transaction_date', '-created_at')
-        
-        # 準備數據
-        transaction_data = []
-        for trans in transactions:
-            transaction_data.append({
-                'id': trans.id,
-                'date': trans.transaction_date,
-                'description': trans.description,
-                'type': trans.get_transaction_type_display(),
-                'company_name': trans.company_holding.company.companyName,
-                'company_id': trans.company_holding.company.companyId,
-                'shareholder_name': trans.company_holding.shareholder.name,
-                'identifier': trans.company_holding.shareholder.identifier,
-                'stock_type': trans.get_stock_type_display(),
-                'par_value': trans.par_value,
-                'quantity': trans.quantity,
-                'stock_amount': trans.stock_amount,
-                'amount': trans.amount if trans.amount else '',
-                'note': trans.note or '',
-            })
-        
+        """顯示股權交易列表頁面"""
         context = {
-            'transactions': transaction_data,
-            'companies': BasicInformation.objects.all(),
-            'shareholders': Shareholder.objects.all(),
+            'transaction_type_choices': StockTransaction.TRANSACTION_TYPE_CHOICES,
         }
         
         return render(request, 'shareholders/transaction_list.html', context)
 
 
+def _filter_transactions(params):
+    """依公司、股東、日期區間、交易類型過濾股權交易"""
+    transactions = StockTransaction.objects.all()
+    
+    if params.get('company'):
+        transactions = transactions.filter(company_holding__company_id=params['company'])
+    if params.get('shareholder'):
+        transactions = transactions.filter(company_holding__shareholder_id=params['shareholder'])
+    if params.get('date_from'):
+        transactions = transactions.filter(transaction_date__gte=date.fromisoformat(params['date_from']))
+    if params.get('date_to'):
+        transactions = transactions.filter(transaction_date__lte=date.fromisoformat(params['date_to']))
+    if params.get('type'):
+        transactions = transactions.filter(transaction_type=params['type'])
+    return transactions
+
+
+@require_http_methods(["GET"])
+def transaction_list_api(request):
+    """API: 股權交易列表（keyset 分頁，依日期由新到舊）"""
+    try:
+        transactions = _filter_transactions(request.GET).values(
+            'id', 'transaction_date', 'description', 'transaction_type', 'stock_type',
+            'par_value', 'quantity', 'stock_amount', 'amount', 'note',
+            company_name=F('company_holding__company__companyName'),
+            company_id=F('company_holding__company__companyId'),
+            shareholder_name=F('company_holding__shareholder__name'),
+            identifier=F('company_holding__shareholder__identifier'),
+        )
+        rows, next_cursor = keyset_page(
+            transactions, TRANSACTION_ORDERING, request.GET.get('cursor'), TRANSACTION_PAGE_SIZE
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': '無效的篩選或分頁參數'}, status=400)
+    
+    type_labels = dict(StockTransaction.TRANSACTION_TYPE_CHOICES)
+    stock_type_labels = dict(StockTransaction.STOCK_TYPE_CHOICES)
+    
+    return JsonResponse({
+        'success': True,
+        'transactions': [{
+            'id': row['id'],
+            'date': row['transaction_date'].isoformat(),
+            'description': row['description'],
+            'type': type_labels.get(row['transaction_type'], row['transaction_type']),
+            'company_name': row['company_name'],
+            'company_id': row['company_id'],
+            'shareholder_name': row['shareholder_name'],
+            'identifier': row['identifier'],
+            'stock_type': stock_type_labels.get(row['stock_type'], row['stock_type']),
+            'par_value': str(row['par_value']),
+            'quantity': row['quantity'],
+            'stock_amount': str(row['stock_amount']),
+            'amount': str(row['amount']) if row['amount'] else '',
+            'note': row['note'] or '',
+        } for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+
 @require_http_methods(["GET"])
 def get_transaction_api(request, pk):
     """API: 取得單筆交易"""
@@ -94,10 +133,12 @@ def create_transaction_api(request):
             shareholder_id = request.POST.get('shareholder_id')
             
             # 獲取或創建公司持股關係
-            company_holding, created = CompanyShareholding.objects.get_or_create(
+            company_holding, created = CompanyShareholding.all_objects.get_or_create(
                 company_id=company_id,
                 shareholder_id=shareholder_id
             )
+            if company_holding.is_deleted:
+                company_holding.restore()
             
             # 創建交易
             trans = StockTransaction.objects.create(
@@ -135,10 +176,12 @@ def update_transaction_api(request, pk):
             
             if (str(trans.company_holding.company.id) != company_id or 
                 str(trans.company_holding.shareholder.id) != shareholder_id):
-                company_holding, created = CompanyShareholding.objects.get_or_create(
+                company_holding, created = CompanyShareholding.all_objects.get_or_create(
                     company_id=company_id,
                     shareholder_id=shareholder_id
                 )
+                if company_holding.is_deleted:
+                    company_holding.restore()
                 trans.company_holding = company_holding
             
             # 更新其他欄位
@@ -152,6 +195,7 @@ def update_transaction_api(request, pk):
             trans.amount = request.POST.get('amount') or None
             trans.note = request.POST.get('note', '')
             
+            # save() 會同步更新持股餘額帳
             trans.save()
             
             return JsonResponse({
@@ -172,10 +216,8 @@ def search_shareholders_api(request):
     if not query:
         return JsonResponse({'shareholders': []})
     
-    # Search by name or identifier
-    shareholders = Shareholder.objects.filter(
-        Q(name__icontains=query) | Q(identifier__icontains=query)
-    )[:20]  # Limit to 20 results
+    # Search by name or identifier (exact identifier first)
+    shareholders = ranked_search(Shareholder.objects.all(), query, 'name', 'identifier')
     
     data = {
         'shareholders': [
@@ -186,7 +228,9 @@ def search_shareholders_api(request):
                 'birthday': s.birthday.strftime('%Y-%m-%d') if s.birthday else None,
             }
             for s in shareholders
-        ]
+        ],
+        # 包含比對逾時，只有身分證字號與前綴相符的結果
+        'partial': shareholders.partial,
     }
     
     return JsonResponse(data)
@@ -23,6 +23,7 @@ urlpatterns = [
 
     # Stock Transaction management
     path('transactions/', transaction_views.StockTransactionListView.as_view(), name='transaction_list'),
+    path('api/transactions/', transaction_views.transaction_list_api, name='api_transaction_list'),
     path('api/transaction/get/<int:pk>/', transaction_views.get_transaction_api, name='api_get_transaction'),
     path('api/transaction/create/', transaction_views.create_transaction_api, name='api_create_transaction'),
     path('api/transaction/update/<int:pk>/', transaction_views.update_transaction_api, name='api_update_transaction'),
@@ -5,10 +5,13 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.db import IntegrityError
+from django.utils.http import urlencode
 from datetime import date
 from admin_module.models import BasicInformation
 from registration.models import Shareholder, CompanyShareholding, StockTransaction
-from .services import get_company_roster, get_shareholder_transaction_history
+from .services import (
+    get_company_timeline, get_roster_snapshot, get_shareholder_transaction_history, get_stock_type_totals
+)
 
 
 class ShareholderRosterView(View):
@@ -42,22 +45,48 @@ class ShareholderHistoryView(View):
         company = get_object_or_404(BasicInformation, id=company_id)
         shareholder = get_object_or_404(Shareholder, id=shareholder_id)
         
-        # Get transactions
-        transactions = StockTransaction.objects.filter(
-            company_holding__company=company,
-            company_holding__shareholder=shareholder
-        ).order_by('transaction_date', 'created_at')
-
-        # Calculate totals
-        current_shares = sum(t.quantity for t in transactions)
-        current_amount = sum(t.stock_amount for t in transactions)
+        holding_id = CompanyShareholding.objects.filter(
+            company=company, shareholder=shareholder
+        ).values_list('pk', flat=True).first()
+
+        filter_error = ''
+        try:
+            date_from = date.fromisoformat(request.GET['date_from']) if request.GET.get('date_from') else None
+            date_to = date.fromisoformat(request.GET['date_to']) if request.GET.get('date_to') else None
+            transactions, next_cursor, opening = get_shareholder_transaction_history(
+                holding_id, date_from, date_to, request.GET.get('cursor')
+            )
+        except ValueError:
+            filter_error = '無效的日期或分頁參數，已顯示全部交易'
+            date_from = date_to = None
+            transactions, next_cursor, opening = get_shareholder_transaction_history(holding_id)
+
+        # 目前持股：依股票類型於資料庫加總
+        subtotals = get_stock_type_totals(StockTransaction.objects.filter(company_holding_id=holding_id))
+        stock_type_labels = dict(StockTransaction.STOCK_TYPE_CHOICES)
+
+        filter_params = {}
+        if date_from:
+            filter_params['date_from'] = date_from.isoformat()
+        if date_to:
+            filter_params['date_to'] = date_to.isoformat()
 
         context = {
             'company': company,
             'shareholder': shareholder,
             'transactions': transactions,
-            'current_shares': current_shares,
-            'current_amount': current_amount,
+            'current_shares': sum(total['shares'] for total in subtotals.values()),
+            'current_amount': sum(total['amount'] for total in subtotals.values()),
+            'stock_type_subtotals': [
+                {'label': stock_type_labels.get(key, key), **total} for key, total in subtotals.items()
+            ],
+            'opening_shares': sum(total['shares'] for total in opening.values()),
+            'date_from': date_from,
+            'date_to': date_to,
+            'filter_query': urlencode(filter_params),
+            'next_query': urlencode({**filter_params, 'cursor': next_cursor}) if next_cursor else '',
+            'is_first_page': not request.GET.get('cursor') or bool(filter_error),
+            'filter_error': filter_error,
         }
         return render(request, 'shareholders/history.html', context)
 
@@ -78,33 +107,35 @@ class ShareholderListView(View):
 
 @require_http_methods(["GET"])
 def get_company_transactions_api(request, company_id):
-    """API: 取得公司的股權交易歷史 (Timeline)，合併同一天同一類型的交易"""
+    """API: 取得公司的股權交易歷程 (Timeline)，同一天同一類型的交易合併為一個事件（分頁）"""
+    cursor = None
+    if request.GET.get('cursor'):
+        # cursor 格式：YYYY-MM-DD|交易類型
+        cursor_date, _, cursor_type = request.GET['cursor'].partition('|')
+        try:
+            cursor = (date.fromisoformat(cursor_date), cursor_type)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': '無效的分頁參數'}, status=400)
+
     try:
-        # Get all transactions for this company
-        transactions = StockTransaction.objects.filter(
-            company_holding__company_id=company_id
-        ).select_related('company_holding__shareholder').order_by('-transaction_date', '-created_at')
-        
-        # Group transactions by date and type
-        timeline_data = []
-        seen_events = set()
-        
-        for tx in transactions:
-            event_key = f"{tx.transaction_date}_{tx.transaction_type}"
-            
-            if event_key not in seen_events:
-                timeline_data.append({
-                    'id': f"group_{tx.transaction_date}_{tx.transaction_type}", # Use a group key
-                    'date': tx.transaction_date.isoformat(),
-                    'type': tx.get_transaction_type_display(),
-                    # 'amount': tx.amount, # Amount might be ambiguous if summed, showing basic info
-                    'description': tx.transaction_type
-                })
-                seen_events.add(event_key)
-            
+        events, next_cursor = get_company_timeline(company_id, cursor)
+        type_labels = dict(StockTransaction.TRANSACTION_TYPE_CHOICES)
+
+        timeline_data = [{
+            'id': f"group_{event['transaction_date']}_{event['transaction_type']}",
+            'date': event['transaction_date'].isoformat(),
+            'type': type_labels.get(event['transaction_type'], event['transaction_type']),
+            'description': event['transaction_type'],
+            'transaction_count': event['transaction_count'],
+            'holders': event['holders'],
+            'net_shares': event['net_shares'] or 0,
+            'shares_moved': event['shares_moved'] or 0,
+        } for event in events]
+
         return JsonResponse({
             'success': True,
-            'timeline': timeline_data
+            'timeline': timeline_data,
+            'next_cursor': f"{next_cursor[0].isoformat()}|{next_cursor[1]}" if next_cursor else None,
         })
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
@@ -115,31 +146,13 @@ def get_roster_snapshot_api(request, company_id, target_date):
     """API: 取得特定日期的股東名冊快照"""
     try:
         date_obj = date.fromisoformat(target_date)
-        roster = get_company_roster(company_id, date_obj)
-        
-        # Serialize for JSON
-        roster_data = []
-        for item in roster:
-            roster_data.append({
-                'id': item['shareholder'].id,
-                'name': item['shareholder'].name,
-                'identifier': item['shareholder'].identifier,
-                'phone': item['shareholder'].phone,
-                'email': item['shareholder'].email,
-                'stock_type': item['stock_type_display'], 
-                'balance': item['balance'],
-                'amount': item['amount'],
-                'percentage': item['percentage']
-            })
-            
-        total_shares = sum(item['balance'] for item in roster_data)
-        total_capital = sum(item['amount'] for item in roster_data)
+        snapshot = get_roster_snapshot(company_id, date_obj)
         
         return JsonResponse({
             'success': True,
-            'roster': roster_data,
-            'total_shares': total_shares,
-            'total_capital': total_capital,
+            'roster': snapshot['roster'],
+            'total_shares': snapshot['total_shares'],
+            'total_capital': snapshot['total_capital'],
             'target_date': target_date
         })
     except ValueError:
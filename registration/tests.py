@@ -1,3 +1,648 @@
-from django.test import TestCase
+import threading
+from datetime import date, timedelta
+from unittest import mock
+from django.core import mail
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from admin_module.models import BasicInformation
+from core.mail import dispatch_pending
+from core.models import OutboundEmail, Sequence
+from .models import (
+    Shareholder, CompanyShareholding, StockTransaction, ShareholdingBalance, RegistrationProgress
+)
+from .progress.services import (
+    annotate_deadlines, calculate_remaining_days, flag_overdue_cases, scan_open_cases, send_progress_notification
+)
+from .shareholders.ledger import verify_ledger
+from .shareholders.services import (
+    build_roster_snapshot, get_company_roster, get_company_timeline, get_roster_snapshot,
+    get_shareholder_transaction_history
+)
+from .shareholders.snapshot_cache import get_cached_snapshot, invalidate_snapshots
 
-# Create your tests here.
+
+def create_company(company_id='12345678', name='測試公司'):
+    return BasicInformation.objects.create(
+        companyId=company_id,
+        companyName=name,
+        contact='聯絡人',
+        registration_address='台北市'
+    )
+
+
+def create_holding(company, identifier, name=None):
+    shareholder = Shareholder.objects.create(identifier=identifier, name=name or identifier)
+    return CompanyShareholding.objects.create(shareholder=shareholder, company=company)
+
+
+def create_transaction(holding, quantity, on_date=date(2024, 1, 1), stock_type='common'):
+    return StockTransaction.objects.create(
+        company_holding=holding,
+        transaction_date=on_date,
+        transaction_type='founding',
+        stock_type=stock_type,
+        quantity=quantity,
+        stock_amount=quantity * 10
+    )
+
+
+class ShareholdingLedgerTests(TestCase):
+    """持股餘額帳需隨交易的各種寫入路徑同步"""
+
+    def setUp(self):
+        self.company = create_company()
+        self.holding = create_holding(self.company, 'A123456789')
+        create_transaction(self.holding, 1000)
+        self.sale = create_transaction(self.holding, -400, date(2024, 3, 1))
+
+    def roster_balance(self):
+        return sum(item['balance'] for item in get_company_roster(self.company.id))
+
+    def test_save_updates_ledger(self):
+        self.sale.quantity = -300
+        self.sale.stock_amount = -3000
+        self.sale.save()
+
+        self.assertEqual(verify_ledger(), [])
+        self.assertEqual(self.roster_balance(), 700)
+
+    def stored_balances(self):
+        return list(
+            ShareholdingBalance.objects.filter(company_holding=self.holding)
+            .order_by('date').values_list('date', 'shares')
+        )
+
+    def test_soft_delete_and_restore(self):
+        # 軟刪除的交易保留在資料庫，但不計入餘額
+        self.sale.delete()
+        self.assertTrue(StockTransaction.all_objects.filter(pk=self.sale.pk, is_deleted=True).exists())
+        self.assertEqual(verify_ledger(), [])
+        self.assertEqual(self.roster_balance(), 1000)
+        self.assertEqual(self.stored_balances(), [(date(2024, 1, 1), 1000), (date(2024, 3, 1), 1000)])
+        self.assertEqual(build_roster_snapshot(self.company.id, date(2024, 12, 31))['total_shares'], 1000)
+
+        self.sale.restore()
+        self.assertEqual(verify_ledger(), [])
+        self.assertEqual(self.roster_balance(), 600)
+        self.assertEqual(self.stored_balances(), [(date(2024, 1, 1), 1000), (date(2024, 3, 1), 600)])
+
+    def test_queryset_delete_restore_and_update(self):
+        transactions = StockTransaction.all_objects.filter(company_holding=self.holding)
+
+        transactions.delete()
+        self.assertEqual(verify_ledger(), [])
+        self.assertEqual(self.roster_balance(), 0)
+
+        transactions.restore()
+        self.assertEqual(verify_ledger(), [])
+        self.assertEqual(self.roster_balance(), 600)
+
+        transactions.filter(pk=self.sale.pk).update(transaction_date=date(2023, 12, 1))
+        self.assertEqual(verify_ledger(), [])
+
+        transactions.filter(pk=self.sale.pk).hard_delete()
+        self.assertEqual(verify_ledger(), [])
+        self.assertEqual(self.roster_balance(), 1000)
+
+
+class ShareholdingLedgerConcurrencyTests(TransactionTestCase):
+    """同一持股關係同時新增第一筆交易時，餘額列不會重複建立"""
+
+    # SQLite 的記憶體測試資料庫無法同時寫入，需於 PostgreSQL 執行
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_parallel_first_inserts(self):
+        holding = create_holding(create_company(), 'A123456789')
+        threads_count = 6
+        errors = []
+        start = threading.Barrier(threads_count)
+
+        def insert(index):
+            try:
+                start.wait()
+                create_transaction(holding, 100 + index, date(2024, 1, 1 + index % 2))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=insert, args=(index,)) for index in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(verify_ledger(), [])
+
+
+class CompanyRosterQueryCountTests(TestCase):
+    """股東名冊的查詢次數不隨股東人數增加"""
+
+    def setUp(self):
+        invalidate_snapshots()
+
+    def create_company_with_holders(self, company_id, holders):
+        company = create_company(company_id)
+        for index in range(holders):
+            holding = create_holding(company, f'{company_id}{index:04d}')
+            create_transaction(holding, 1000 + index)
+            create_transaction(holding, 100, stock_type='preferred')
+        return company
+
+    def test_roster_query_count_is_constant(self):
+        for company_id, holders in (('11111111', 3), ('22222222', 60)):
+            company = self.create_company_with_holders(company_id, holders)
+            with self.subTest(holders=holders), self.assertNumQueries(2):
+                roster = get_company_roster(company.id)
+            self.assertEqual(len(roster), holders * 2)
+            self.assertEqual(roster[0]['balance'], 1000 + holders - 1)
+
+    def test_roster_snapshot_api_query_count_is_constant(self):
+        query_counts = []
+        for company_id, holders in (('33333333', 3), ('44444444', 60)):
+            company = self.create_company_with_holders(company_id, holders)
+            # 寫入提交後會更換世代（TestCase 不執行 on_commit，這裡直接呼叫）
+            invalidate_snapshots(company.id)
+            url = reverse('registration:shareholders:api_roster_snapshot', args=[company.id, '2024-12-31'])
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            query_counts.append(len(queries))
+            data = response.json()
+            self.assertTrue(data['success'])
+            self.assertEqual(len(data['roster']), holders * 2)
+            self.assertEqual(data['total_shares'], sum(1100 + index for index in range(holders)))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+
+class RosterSnapshotCacheTests(TestCase):
+    """名冊快照快取：寫入提交後失效，建立期間的寫入不會被快取"""
+
+    def setUp(self):
+        caches['roster'].clear()
+        self.company = create_company()
+        self.holding = create_holding(self.company, 'A123456789')
+        create_transaction(self.holding, 1000)
+        self.sale = create_transaction(self.holding, -400, date(2024, 3, 1))
+        self.target_date = date(2024, 12, 31)
+
+    def total_shares(self):
+        return get_roster_snapshot(self.company.id, self.target_date)['total_shares']
+
+    def test_hit_only_checks_generation(self):
+        self.assertEqual(self.total_shares(), 600)
+        # 命中時只查詢一次共用快取的世代
+        with self.assertNumQueries(1):
+            self.assertEqual(self.total_shares(), 600)
+
+    def test_transaction_soft_delete_and_restore_invalidate(self):
+        self.assertEqual(self.total_shares(), 600)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sale.delete()
+        self.assertEqual(self.total_shares(), 1000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StockTransaction.all_objects.filter(pk=self.sale.pk).restore()
+        self.assertEqual(self.total_shares(), 600)
+
+    def test_holding_soft_delete_invalidates(self):
+        self.assertEqual(self.total_shares(), 600)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.holding.delete()
+        self.assertEqual(self.total_shares(), 0)
+
+    def test_write_committed_while_building_is_not_cached(self):
+        builds = []
+
+        def builder(company_id, target_date):
+            builds.append(target_date)
+            data = build_roster_snapshot(company_id, target_date)
+            # 模擬建立快照期間另一個請求的寫入已提交
+            invalidate_snapshots(company_id)
+            return data
+
+        get_cached_snapshot(self.company.id, self.target_date, builder)
+        get_cached_snapshot(self.company.id, self.target_date, builder)
+        self.assertEqual(len(builds), 2)
+
+    def counting_builder(self, builds):
+        def builder(company_id, target_date):
+            builds.append(target_date)
+            return build_roster_snapshot(company_id, target_date)
+        return builder
+
+    def test_write_only_invalidates_later_dates(self):
+        builds = []
+        builder = self.counting_builder(builds)
+        early, late = date(2024, 2, 1), date(2024, 12, 31)
+        get_cached_snapshot(self.company.id, early, builder)
+        get_cached_snapshot(self.company.id, late, builder)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_transaction(self.holding, 50, date(2024, 6, 1))
+
+        builds.clear()
+        self.assertEqual(get_cached_snapshot(self.company.id, early, builder)['total_shares'], 1000)
+        self.assertEqual(get_cached_snapshot(self.company.id, late, builder)['total_shares'], 650)
+        self.assertEqual(builds, [late])
+
+        # 早於寫入的快照讀取後改標為新世代，下一次寫入後仍可沿用
+        with self.captureOnCommitCallbacks(execute=True):
+            create_transaction(self.holding, 50, date(2024, 7, 1))
+        builds.clear()
+        get_cached_snapshot(self.company.id, early, builder)
+        self.assertEqual(builds, [])
+
+    def test_snapshot_missing_several_writes_is_rebuilt(self):
+        builds = []
+        builder = self.counting_builder(builds)
+        early = date(2024, 2, 1)
+        get_cached_snapshot(self.company.id, early, builder)
+
+        for on_date in (date(2024, 6, 1), date(2024, 7, 1)):
+            with self.captureOnCommitCallbacks(execute=True):
+                create_transaction(self.holding, 50, on_date)
+
+        # 只記錄最近一次寫入的日期，較舊的快照一律重建
+        builds.clear()
+        self.assertEqual(get_cached_snapshot(self.company.id, early, builder)['total_shares'], 1000)
+        self.assertEqual(builds, [early])
+
+    def test_backdated_write_invalidates_every_later_date(self):
+        self.assertEqual(self.total_shares(), 600)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_transaction(self.holding, 100, date(2023, 12, 1))
+        self.assertEqual(self.total_shares(), 700)
+
+
+class TransactionHistoryPaginationTests(TestCase):
+    """交易明細分頁：每一頁的累計餘額與一次取完整份明細相同"""
+
+    def setUp(self):
+        self.holding = create_holding(create_company(), 'A123456789')
+        for quantity, on_date, stock_type in (
+            (1000, date(2024, 1, 1), 'common'),
+            (200, date(2024, 1, 1), 'preferred'),
+            (-100, date(2024, 2, 1), 'common'),
+            (50, date(2024, 2, 1), 'preferred'),
+            (300, date(2024, 2, 1), 'common'),
+            (-20, date(2024, 3, 1), 'preferred'),
+            (-250, date(2024, 4, 1), 'common'),
+            (75, date(2024, 5, 1), 'common'),
+        ):
+            create_transaction(self.holding, quantity, on_date, stock_type)
+
+    def balances(self, rows):
+        return [
+            (row.pk, row.running_balance, row.running_amount, row.stock_type_balance, row.stock_type_amount)
+            for row in rows
+        ]
+
+    def full_walk(self):
+        rows, next_cursor, opening = get_shareholder_transaction_history(self.holding.id, limit=100)
+        self.assertIsNone(next_cursor)
+        self.assertEqual(opening, {})
+        return rows
+
+    def test_pages_match_full_walk(self):
+        expected = self.balances(self.full_walk())
+        # 每頁 2 筆：2024-02-01 的三筆交易跨越頁界
+        pages = []
+        cursor = None
+        while True:
+            rows, cursor, _ = get_shareholder_transaction_history(self.holding.id, cursor=cursor, limit=2)
+            pages.append(self.balances(rows))
+            if cursor is None:
+                break
+        self.assertEqual(len(pages), 4)
+        self.assertEqual([row for page in pages for row in page], expected)
+
+    def test_second_page_opening_balance(self):
+        _, cursor, _ = get_shareholder_transaction_history(self.holding.id, limit=3)
+        rows, _, opening = get_shareholder_transaction_history(self.holding.id, cursor=cursor, limit=3)
+        self.assertEqual(self.balances(rows), self.balances(self.full_walk())[3:6])
+        self.assertEqual(opening['common']['shares'], 900)
+        self.assertEqual(opening['preferred']['shares'], 200)
+
+    def test_date_from_matches_full_walk(self):
+        date_from = date(2024, 2, 1)
+        expected = [
+            row for row, obj in zip(self.balances(self.full_walk()), self.full_walk())
+            if obj.transaction_date >= date_from
+        ]
+        rows, next_cursor, opening = get_shareholder_transaction_history(self.holding.id, date_from=date_from)
+        self.assertIsNone(next_cursor)
+        self.assertEqual(self.balances(rows), expected)
+        self.assertEqual(opening['common']['shares'], 1000)
+
+    def test_date_range_and_cursor(self):
+        date_from, date_to = date(2024, 2, 1), date(2024, 4, 1)
+        expected = [
+            row for row, obj in zip(self.balances(self.full_walk()), self.full_walk())
+            if date_from <= obj.transaction_date <= date_to
+        ]
+        first, cursor, _ = get_shareholder_transaction_history(
+            self.holding.id, date_from=date_from, date_to=date_to, limit=2
+        )
+        second, cursor, _ = get_shareholder_transaction_history(
+            self.holding.id, date_from=date_from, date_to=date_to, cursor=cursor, limit=10
+        )
+        self.assertIsNone(cursor)
+        self.assertEqual(self.balances(first + second), expected)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            get_shareholder_transaction_history(self.holding.id, cursor='not-a-cursor')
+
+
+class CompanyTimelinePaginationTests(TestCase):
+    """公司交易歷程依 (日期, 交易類型) 分頁，逐頁取完與一次取完相同"""
+
+    def setUp(self):
+        self.company = create_company()
+        holdings = [create_holding(self.company, f'A12345678{index}') for index in range(3)]
+        for holding, on_date, transaction_type, quantity in (
+            (holdings[0], date(2024, 1, 1), 'founding', 1000),
+            (holdings[1], date(2024, 1, 1), 'founding', 500),
+            (holdings[0], date(2024, 6, 1), 'trade', -100),
+            (holdings[1], date(2024, 6, 1), 'trade', 100),
+            (holdings[2], date(2024, 6, 1), 'gift', 30),
+            (holdings[1], date(2024, 6, 1), 'capital_reduction', -50),
+            (holdings[2], date(2024, 6, 1), 'transfer_in', 20),
+            (holdings[0], date(2024, 9, 1), 'transfer_out', -20),
+        ):
+            StockTransaction.objects.create(
+                company_holding=holding, transaction_date=on_date, transaction_type=transaction_type,
+                stock_type='common', quantity=quantity, stock_amount=quantity * 10
+            )
+
+    def walk(self, limit):
+        events, cursor = [], None
+        pages = 0
+        while True:
+            page, cursor = get_company_timeline(self.company.id, cursor, limit=limit)
+            events.extend(page)
+            pages += 1
+            if cursor is None:
+                return events, pages
+
+    def test_pages_match_unpaginated_query(self):
+        expected, _ = get_company_timeline(self.company.id, limit=100)
+        self.assertEqual(len(expected), 6)
+        # 每頁 2 個事件：2024-06-01 的 4 個事件跨越兩個頁界
+        events, pages = self.walk(limit=2)
+        self.assertEqual(pages, 3)
+        self.assertEqual(events, expected)
+
+        trades = next(event for event in expected if event['transaction_type'] == 'trade')
+        self.assertEqual(
+            (trades['transaction_count'], trades['holders'], trades['net_shares'], trades['shares_moved']),
+            (2, 2, 0, 200)
+        )
+
+    def test_api_walk_and_invalid_cursor(self):
+        url = reverse('registration:shareholders:api_company_transactions', args=[self.company.id])
+        expected, _ = get_company_timeline(self.company.id, limit=100)
+
+        ids, params = [], {}
+        while True:
+            data = self.client.get(url, params).json()
+            ids.extend(event['id'] for event in data['timeline'])
+            if not data['next_cursor']:
+                break
+            params = {'cursor': data['next_cursor']}
+        self.assertEqual(
+            ids, [f"group_{event['transaction_date']}_{event['transaction_type']}" for event in expected]
+        )
+
+        response = self.client.get(url, {'cursor': '2024-13-01|trade'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TransactionListApiTests(TestCase):
+    """股權交易列表 API：keyset 分頁、各篩選參數與無效參數"""
+
+    def setUp(self):
+        self.company = create_company()
+        self.other_company = create_company('87654321', '其他公司')
+        self.holding = create_holding(self.company, 'A123456789')
+        self.other_holding = create_holding(self.other_company, 'B123456789')
+        self.other_shareholder_holding = create_holding(self.company, 'C123456789')
+        self.transactions = {}
+        for name, holding, on_date, transaction_type in (
+            ('founding', self.holding, date(2024, 1, 1), 'founding'),
+            ('other_founding', self.other_holding, date(2024, 1, 1), 'founding'),
+            ('trade_a', self.holding, date(2024, 6, 1), 'trade'),
+            ('trade_b', self.other_shareholder_holding, date(2024, 6, 1), 'trade'),
+            ('trade_c', self.other_holding, date(2024, 6, 1), 'trade'),
+            ('gift', self.holding, date(2024, 9, 1), 'gift'),
+        ):
+            self.transactions[name] = StockTransaction.objects.create(
+                company_holding=holding, transaction_date=on_date, transaction_type=transaction_type,
+                stock_type='common', quantity=100, stock_amount=1000
+            ).pk
+        self.url = reverse('registration:shareholders:api_transaction_list')
+
+    def ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['transactions']]
+
+    def expected(self, *names):
+        # 依日期由新到舊，同日依主鍵由大到小
+        pks = [self.transactions[name] for name in names]
+        dates = dict(StockTransaction.objects.filter(pk__in=pks).values_list('pk', 'transaction_date'))
+        return sorted(pks, key=lambda pk: (dates[pk], pk), reverse=True)
+
+    def test_pages_across_boundary_within_a_date(self):
+        walked, params = [], {}
+        with mock.patch('registration.shareholders.transaction_views.TRANSACTION_PAGE_SIZE', 2):
+            while True:
+                data = self.client.get(self.url, params).json()
+                walked.append([row['id'] for row in data['transactions']])
+                if not data['next_cursor']:
+                    break
+                params = {'cursor': data['next_cursor']}
+        # 2024-06-01 的三筆交易跨越頁界
+        self.assertEqual([len(page) for page in walked], [2, 2, 2])
+        self.assertEqual([pk for page in walked for pk in page], self.expected(*self.transactions))
+
+    def test_cursor_keeps_filters(self):
+        with mock.patch('registration.shareholders.transaction_views.TRANSACTION_PAGE_SIZE', 1):
+            first = self.client.get(self.url, {'company': self.company.id}).json()
+            second = self.client.get(self.url, {'company': self.company.id, 'cursor': first['next_cursor']}).json()
+        self.assertEqual(
+            [row['id'] for row in first['transactions'] + second['transactions']],
+            self.expected('gift', 'trade_a', 'trade_b', 'founding')[:2]
+        )
+
+    def test_filters(self):
+        shareholder_id = self.holding.shareholder_id
+        cases = [
+            ({'company': self.company.id}, ('founding', 'trade_a', 'trade_b', 'gift')),
+            ({'shareholder': shareholder_id}, ('founding', 'trade_a', 'gift')),
+            ({'date_from': '2024-06-01'}, ('trade_a', 'trade_b', 'trade_c', 'gift')),
+            ({'date_to': '2024-06-01'}, ('founding', 'other_founding', 'trade_a', 'trade_b', 'trade_c')),
+            ({'date_from': '2024-02-01', 'date_to': '2024-08-31'}, ('trade_a', 'trade_b', 'trade_c')),
+            ({'type': 'trade'}, ('trade_a', 'trade_b', 'trade_c')),
+            ({'company': self.company.id, 'type': 'trade', 'shareholder': shareholder_id}, ('trade_a',)),
+        ]
+        for params, names in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.ids(**params), self.expected(*names))
+
+    def test_excludes_soft_deleted(self):
+        StockTransaction.objects.filter(pk=self.transactions['gift']).delete()
+        self.assertNotIn(self.transactions['gift'], self.ids())
+
+    def test_invalid_parameters_return_400(self):
+        for params in (
+            {'cursor': 'not-a-cursor'},
+            {'date_from': '2024-13-01'},
+            {'date_to': 'yesterday'},
+            {'company': 'abc'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+
+class CaseDeadlineScanTests(TestCase):
+    """案件期限在資料庫端計算，結果與逐筆的 Python 計算一致"""
+
+    def setUp(self):
+        self.today = date(2025, 6, 30)
+        accepted = self.today - timedelta(days=20)
+        self.on_time = RegistrationProgress.objects.create(
+            acceptance_date=accepted, due_date=self.today + timedelta(days=5), status='documentation'
+        )
+        self.late = RegistrationProgress.objects.create(
+            acceptance_date=accepted, due_date=self.today - timedelta(days=3), status='new_case'
+        )
+        self.closed = RegistrationProgress.objects.create(
+            acceptance_date=accepted, due_date=self.today - timedelta(days=10), status='closed'
+        )
+        self.undated = RegistrationProgress.objects.create(acceptance_date=accepted, status='discussion')
+
+    def test_annotations(self):
+        cases = {case.pk: case for case in annotate_deadlines(RegistrationProgress.objects.all(), self.today)}
+
+        self.assertEqual((cases[self.on_time.pk].remaining_days, cases[self.on_time.pk].overdue), (5, False))
+        self.assertEqual((cases[self.late.pk].remaining_days, cases[self.late.pk].overdue), (-3, True))
+        self.assertFalse(cases[self.closed.pk].overdue)
+        self.assertIsNone(cases[self.undated.pk].remaining_days)
+        self.assertEqual(cases[self.undated.pk].days_open, 20)
+
+    def test_matches_python_helper(self):
+        case = annotate_deadlines(RegistrationProgress.objects.filter(pk=self.on_time.pk)).get()
+        expected_days = (self.on_time.due_date - self.on_time.acceptance_date).days
+        self.assertEqual(case.remaining_days, calculate_remaining_days(self.on_time.acceptance_date, expected_days))
+
+    def test_scan_open_cases_in_one_query(self):
+        with self.assertNumQueries(1):
+            cases = list(scan_open_cases(self.today))
+
+        self.assertEqual([case.pk for case in cases], [self.late.pk, self.on_time.pk, self.undated.pk])
+
+    def test_flag_overdue_cases(self):
+        RegistrationProgress.objects.update(is_overdue=False)
+        RegistrationProgress.objects.filter(pk=self.on_time.pk).update(is_overdue=True)
+
+        self.assertEqual(flag_overdue_cases(self.today), {'flagged': 1, 'cleared': 1})
+        self.assertEqual(
+            list(RegistrationProgress.objects.filter(is_overdue=True).values_list('pk', flat=True)), [self.late.pk]
+        )
+        self.assertEqual(flag_overdue_cases(self.today), {'flagged': 0, 'cleared': 0})
+
+
+class ProgressNavigationTests(TestCase):
+    """案件編輯頁的上一筆/下一筆：與列表同順序（建立時間相同時依主鍵），沿用狀態與逾期篩選"""
+
+    def setUp(self):
+        now = timezone.now()
+        self.cases = {}
+        for name, status, overdue, created_at in (
+            ('oldest', 'documentation', True, now - timedelta(days=1)),
+            ('tie_1', 'new_case', False, now),
+            ('tie_2', 'documentation', True, now),
+            ('tie_3', 'new_case', False, now),
+            ('newest', 'new_case', True, now + timedelta(days=1)),
+        ):
+            case = RegistrationProgress.objects.create(acceptance_date=date(2025, 1, 1), status=status)
+            RegistrationProgress.objects.filter(pk=case.pk).update(created_at=created_at, is_overdue=overdue)
+            self.cases[name] = case.pk
+        self.client.force_login(get_user_model().objects.create_user('staff', password='x'))
+
+    def navigation(self, name, **params):
+        response = self.client.get(reverse('registration:progress:edit', args=[self.cases[name]]), params)
+        self.assertEqual(response.status_code, 200)
+        names = {pk: name for name, pk in self.cases.items()}
+        return (
+            names.get(response.context['previous_case']),
+            names.get(response.context['next_case']),
+            response.context['navigation_query'],
+        )
+
+    def test_ties_on_created_at_ordered_by_pk(self):
+        # 列表順序：newest, tie_3, tie_2, tie_1, oldest
+        self.assertEqual(self.navigation('newest')[:2], (None, 'tie_3'))
+        self.assertEqual(self.navigation('tie_3')[:2], ('newest', 'tie_2'))
+        self.assertEqual(self.navigation('tie_2')[:2], ('tie_3', 'tie_1'))
+        self.assertEqual(self.navigation('tie_1')[:2], ('tie_2', 'oldest'))
+        self.assertEqual(self.navigation('oldest')[:2], ('tie_1', None))
+
+    def test_status_filter_is_carried_over(self):
+        self.assertEqual(self.navigation('tie_3', status='new_case'), ('newest', 'tie_1', 'status=new_case'))
+        self.assertEqual(self.navigation('tie_1', status='new_case'), ('tie_3', None, 'status=new_case'))
+
+    def test_overdue_filter_is_carried_over(self):
+        self.assertEqual(self.navigation('tie_2', overdue='1'), ('newest', 'oldest', 'overdue=1'))
+        self.assertEqual(
+            self.navigation('newest', overdue='1', status='new_case'), (None, None, 'status=new_case&overdue=1')
+        )
+
+    def test_list_links_carry_filters(self):
+        response = self.client.get(reverse('registration:progress:list'), {'overdue': '1', 'page': '2'})
+        self.assertEqual(response.context['navigation_query'], 'overdue=1')
+
+
+class CaseNumberTests(TestCase):
+    """案件文號：計數器不存在時由既有案件（含已刪除）的最大序號接續"""
+
+    def test_seed_from_existing_cases(self):
+        first = RegistrationProgress.objects.create()
+        second = RegistrationProgress.objects.create()
+        self.assertEqual(int(second.case_number[-3:]), int(first.case_number[-3:]) + 1)
+
+        second.delete()
+        # 模擬計數器建立前已存在的案件
+        Sequence.objects.all().delete()
+
+        third = RegistrationProgress.objects.create()
+        self.assertEqual(int(third.case_number[-3:]), int(second.case_number[-3:]) + 1)
+
+
+class ProgressNotificationTests(TestCase):
+    """進度通知寫入郵件佇列，交易提交後才喚醒背景寄送，不在請求中連線 SMTP"""
+
+    def test_notification_is_queued(self):
+        with mock.patch('core.mail.wake_worker') as wake_worker:
+            with self.captureOnCommitCallbacks(execute=True):
+                email = send_progress_notification(42, 'client@example.com', '案件已送件')
+                wake_worker.assert_not_called()
+            wake_worker.assert_called_once()
+
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(email.status, OutboundEmail.Status.PENDING)
+        self.assertEqual(email.recipients, ['client@example.com'])
+
+        self.assertEqual(dispatch_pending()['sent'], 1)
+        self.assertEqual(mail.outbox[0].subject, '案件進度更新通知 - 案號 #42')
+        self.assertEqual(mail.outbox[0].to, ['client@example.com'])
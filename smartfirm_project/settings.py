@@ -96,6 +96,36 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# 'roster' 存放股東名冊時間軸快照，LocMemCache 依 LRU 淘汰，最多 MAX_ENTRIES 家公司
+# 'shared' 存放需跨 worker 一致的版本號（例如名冊快照世代、系統參數版本），使用資料庫快取，
+# 所有 worker 共用同一份；資料表由 core 的 migration 以 createcachetable 建立
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # 各 worker 共用的世代與系統參數；名冊快照每次讀取都會查詢一次，
+    # 正式環境可改用 Redis / Memcached 以免每次命中都查詢快取資料表
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'core_shared_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'roster': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'roster-snapshots',
+        'OPTIONS': {
+            'MAX_ENTRIES': 500,
+            'CULL_FREQUENCY': 500,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -3,6 +3,7 @@
 
 // 從 HTML data 屬性讀取 Django 資料
 let customers = [];
+let customersReady = Promise.resolve();
 let contentTypes = [];
 let itemCounter = 0;
 
@@ -17,16 +18,25 @@ function loadDjangoData() {
     // 從隱藏的 div 的 data 屬性中讀取 Django 傳遞的資料
     const dataElement = document.getElementById('djangoData');
     if (dataElement) {
-        const customersData = dataElement.getAttribute('data-customers');
+        const customersUrl = dataElement.getAttribute('data-customers-url');
         const contentTypesData = dataElement.getAttribute('data-content-types');
 
-        if (customersData) {
-            try {
-                customers = JSON.parse(customersData);
-            } catch (e) {
-                console.error('無法解析客戶資料:', e);
-                customers = [];
-            }
+        if (customersUrl) {
+            // 客戶目錄網址帶版本號，未變更時由瀏覽器快取提供
+            customersReady = fetch(customersUrl, { credentials: 'same-origin' })
+                .then(function (response) {
+                    if (!response.ok) {
+                        throw new Error(response.status);
+                    }
+                    return response.json();
+                })
+                .then(function (data) {
+                    customers = data.customers || [];
+                })
+                .catch(function (e) {
+                    console.error('無法載入客戶資料:', e);
+                    customers = [];
+                });
         }
 
         if (contentTypesData) {
@@ -50,7 +60,10 @@ function attachEventListeners() {
     // 新增明細按鈕
     const addItemBtn = document.getElementById('addItemBtn');
     if (addItemBtn) {
-        addItemBtn.addEventListener('click', addItem);
+        addItemBtn.addEventListener('click', function () {
+            // 等客戶目錄載入後再產生客戶選單
+            customersReady.then(addItem);
+        });
     }
 }
 